@@ -5,6 +5,7 @@ from agno.models.google import Gemini
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from typing import Optional
+from RAG.query_classification import QueryClassification, query_classifier
 
 load_dotenv()
 
@@ -117,6 +118,10 @@ Response: {
             )
 
 
+    def classify_query(self, query: str) -> QueryClassification:
+        """Evaluate the query once and return the request-level classification shared downstream."""
+        return query_classifier.classify(query, guardrails_result=self.evaluate_query(query))
+
     def is_agriculture_query(self, query: str) -> bool:
         result = self.evaluate_query(query)
         return result.is_agriculture_related
@@ -10,6 +10,7 @@ import concurrent.futures
 import threading
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
+from RAG.query_classification import QueryClassification, query_classifier
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -56,6 +57,7 @@ class WorkflowState(TypedDict):
     execution_id: str
     current_iteration: int
     max_iterations: int
+    classification: QueryClassification
 
 class AgriculturalPlanningAgent:
     def __init__(self):
@@ -100,11 +102,21 @@ For each user query, analyze and return:
 
 Output only the tools list, task descriptions, and priorities that directly address the user's query."""
 
-    def create_plan(self, user_query: str) -> ResearchPlan:
+    def create_plan(self, user_query: str, classification: QueryClassification = None) -> ResearchPlan:
+        if classification is None:
+            classification = query_classifier.classify(user_query)
         try:
+            entities = classification.entities
             planning_query = f"""
             User Query: {user_query}
             
+            Query analysis (already computed, do not re-derive):
+            - Intent: {classification.intent}
+            - Complexity: {classification.complexity:.2f}
+            - Crops: {', '.join(entities.crops) or 'none'}
+            - States: {', '.join(entities.states) or 'none'}
+            - Commodities: {', '.join(entities.commodities) or 'none'}
+            
             Create a comprehensive task plan that addresses this agricultural query.
             Break down the objective into specific, actionable tasks.
             Assign the most appropriate tool for each task.
@@ -116,7 +128,7 @@ Output only the tools list, task descriptions, and priorities that directly addr
                 schema_result = response.content
                 plan = self._create_plan_from_schema(user_query, schema_result)
             else:
-                plan = self._create_fallback_plan(user_query)
+                plan = self._create_fallback_plan(user_query, classification)
             
             plan.execution_order = [task.task_id for task in sorted(plan.tasks, key=lambda t: t.priority, reverse=True)]
             plan.tools_list = [task.tool_assignment for task in plan.tasks]
@@ -125,7 +137,7 @@ Output only the tools list, task descriptions, and priorities that directly addr
             
         except Exception as e:
             logger.error(f"Error creating plan: {str(e)}")
-            return self._create_fallback_plan(user_query)
+            return self._create_fallback_plan(user_query, classification)
 
     def _create_plan_from_schema(self, user_query: str, schema: ToolAssignmentSchema) -> ResearchPlan:
         tasks = []
@@ -148,17 +160,24 @@ Output only the tools list, task descriptions, and priorities that directly addr
             execution_order=[task.task_id for task in sorted(tasks, key=lambda t: t.priority, reverse=True)]
         )
 
-    def _create_fallback_plan(self, user_query: str) -> ResearchPlan:
+    def _create_fallback_plan(self, user_query: str, classification: QueryClassification = None) -> ResearchPlan:
         query_lower = user_query.lower()
+        intent = classification.intent if classification else None
         
         fallback_tasks = []
         
         if any(word in query_lower for word in ['fertilizer', 'nutrient', 'soil health']):
             fallback_tasks.append({"name": "Get Fertilizer Recommendations", "tool": "Fertilizer Recommendation Tool", "priority": 5})
         
-        if any(word in query_lower for word in ['price', 'cost', 'market', 'sell']):
+        if any(word in query_lower for word in ['price', 'cost', 'market', 'sell']) or intent == 'market':
             fallback_tasks.append({"name": "Check Market Prices", "tool": "Market Price Tool", "priority": 4})
         
+        if intent == 'diagnostic':
+            fallback_tasks.append({"name": "Diagnose Crop Problems", "tool": "Crop Disease Tool", "priority": 5})
+        
+        if intent == 'predictive':
+            fallback_tasks.append({"name": "Predict Crop Yield", "tool": "Crop Yield Prediction Tool", "priority": 4})
+        
         if any(word in query_lower for word in ['weather', 'rain', 'climate', 'forecast']):
             fallback_tasks.append({"name": "Get Weather Information", "tool": "Weather Forecast Tool", "priority": 4})
         
@@ -369,7 +388,7 @@ class AgriculturalWorkflow:
         return workflow.compile(checkpointer=MemorySaver())
 
     def _plan_tasks_node(self, state: WorkflowState) -> WorkflowState:
-        research_plan = self.planner.create_plan(state["user_query"])
+        research_plan = self.planner.create_plan(state["user_query"], state.get("classification"))
         state["research_plan"] = research_plan
         state["current_iteration"] = 1
         return state
@@ -487,9 +506,10 @@ class AgriculturalWorkflow:
         state["final_results"] = state["agent_results"]
         return state
 
-    def execute_workflow(self, user_query: str) -> WorkflowState:
+    def execute_workflow(self, user_query: str, classification: QueryClassification = None) -> WorkflowState:
         initial_state = WorkflowState(
             user_query=user_query,
+            classification=classification or query_classifier.classify(user_query),
             execution_id=f"WF{datetime.now().strftime('%Y%m%d%H%M%S')}",
             current_iteration=1,
             max_iterations=self.max_iterations,
@@ -506,9 +526,9 @@ class AgriculturalWorkflow:
         final_state = self.workflow.invoke(initial_state, config)
         return final_state
 
-    def execute_workflow_as_string(self, user_query: str) -> str:
+    def execute_workflow_as_string(self, user_query: str, classification: QueryClassification = None) -> str:
         """Execute workflow and return results as a formatted string"""
-        final_state = self.execute_workflow(user_query)
+        final_state = self.execute_workflow(user_query, classification)
         return self.format_results_as_string(final_state)
 
     def format_results_as_string(self, final_state: WorkflowState) -> str:
@@ -578,9 +598,9 @@ CONSOLIDATED RECOMMENDATIONS
         
         return result_string
 
-    def get_simple_answer(self, user_query: str) -> str:
+    def get_simple_answer(self, user_query: str, classification: QueryClassification = None) -> str:
         """Get a simple, consolidated answer from all agents"""
-        final_state = self.execute_workflow(user_query)
+        final_state = self.execute_workflow(user_query, classification)
         
         # Collect all successful responses
         successful_responses = []
@@ -609,9 +629,10 @@ Please consult with local agricultural experts for region-specific advice.
         
         return consolidated.strip()
 
-    def get_executive_summary(self, user_query: str) -> str:
-        """Get an executive summary of the workflow results"""
-        final_state = self.execute_workflow(user_query)
+    def get_executive_summary(self, user_query: str, classification: QueryClassification = None, final_state: WorkflowState = None) -> str:
+        """Get an executive summary of the workflow results (of final_state when already executed)"""
+        if final_state is None:
+            final_state = self.execute_workflow(user_query, classification)
         
         successful_count = len([r for r in final_state["final_results"] if r.status == "success"])
         high_grade_count = len([r for r in final_state["final_results"] if r.grade == "yes"])
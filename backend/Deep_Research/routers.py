@@ -5,6 +5,7 @@ from datetime import datetime
 import logging
 
 from .orchastrator import AgriculturalWorkflow
+from Agents.Guardrails.agent import AgriculturalGuardrailsAgent
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,6 +13,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/deep-research", tags=["Deep Research"])
 
 workflow_instance = None
+guardrails_agent = AgriculturalGuardrailsAgent()
 
 def get_workflow_instance() -> AgriculturalWorkflow:
     """Dependency to get workflow instance"""
@@ -89,16 +91,18 @@ async def get_agricultural_guidance(
         # Set max iterations on workflow instance
         workflow.max_iterations = request.max_iterations
         
+        # One guardrails classification per request; the planner reuses its intent and entities.
+        classification = guardrails_agent.classify_query(request.query)
+        
         # Process based on response format
         if request.response_format == "simple":
-            response_text = workflow.get_simple_answer(request.query)
+            response_text = workflow.get_simple_answer(request.query, classification)
             metadata = None
             
         elif request.response_format == "executive":
-            response_text = workflow.get_executive_summary(request.query)
-            
-            # Get basic metrics for executive format
-            final_state = workflow.execute_workflow(request.query)
+            # Get basic metrics for executive format from the same run
+            final_state = workflow.execute_workflow(request.query, classification)
+            response_text = workflow.get_executive_summary(request.query, final_state=final_state)
             metadata = {
                 "total_agents_used": len(final_state.get("final_results", [])),
                 "successful_responses": len([r for r in final_state.get("final_results", []) if r.grade == "yes"]),
@@ -107,10 +111,9 @@ async def get_agricultural_guidance(
             }
             
         else:  # detailed format
-            response_text = workflow.execute_workflow_as_string(request.query)
-            
-            # Get detailed metadata
-            final_state = workflow.execute_workflow(request.query)
+            # Get detailed metadata from the same run
+            final_state = workflow.execute_workflow(request.query, classification)
+            response_text = workflow.format_results_as_string(final_state)
             metadata = {
                 "execution_id": final_state.get("execution_id", "unknown"),
                 "total_agents": len(final_state.get("final_results", [])),
@@ -0,0 +1,124 @@
+import os
+import weakref
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+from agno.agent import Agent
+
+
+class AgentPool:
+    """
+    Process-wide pool of preconfigured RAG agents (graders, rewriter, abstractor, search, ...).
+
+    Agents are keyed by class and constructor arguments. agno agents keep per-run state, so an
+    instance is checked out to one caller at a time and returned when the call finishes; idle
+    instances are handed to the next caller instead of building a new Gemini client. Concurrent
+    callers get extra instances, so the pool grows to the peak concurrency per key and no further.
+
+    agno also keeps each run's messages in the Agent's memory, so a released instance has the
+    memory of every Agent it holds cleared, and is retired after max_uses checkouts
+    (RAG_AGENT_POOL_MAX_USES, 100) in case a version keeps history elsewhere.
+    """
+
+    def __init__(self, max_idle_per_key: int = 8, max_uses: int = None):
+        self.max_idle_per_key = max_idle_per_key
+        if max_uses is None:
+            max_uses = int(os.getenv("RAG_AGENT_POOL_MAX_USES", "100"))
+        self.max_uses = max_uses
+        self._uses = weakref.WeakKeyDictionary()
+        self._idle: Dict[Tuple, List[Any]] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def _key(agent_class, args, kwargs) -> Tuple:
+        # Non-hashable arguments (e.g. a cache object) are keyed by identity.
+        def hashable(value):
+            try:
+                hash(value)
+                return value
+            except TypeError:
+                return id(value)
+        return (agent_class, tuple(hashable(a) for a in args), tuple(sorted((k, hashable(v)) for k, v in kwargs.items())))
+
+    def _counters(self, agent_class) -> Dict[str, int]:
+        return self._stats.setdefault(
+            agent_class.__name__, {"constructed": 0, "checkouts": 0, "reused": 0, "in_use": 0, "idle": 0, "retired": 0}
+        )
+
+    def checkout(self, agent_class, *args, **kwargs):
+        key = self._key(agent_class, args, kwargs)
+        with self._lock:
+            counters = self._counters(agent_class)
+            counters["checkouts"] += 1
+            counters["in_use"] += 1
+            idle = self._idle.get(key)
+            if idle:
+                counters["reused"] += 1
+                counters["idle"] -= 1
+                return idle.pop()
+            counters["constructed"] += 1
+        try:
+            return agent_class(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                counters["in_use"] -= 1
+                counters["constructed"] -= 1
+            raise
+
+    @staticmethod
+    def _reset(agent):
+        """Drop the run history of every agno Agent the wrapper holds."""
+        for value in vars(agent).values():
+            if not isinstance(value, Agent):
+                continue
+            memory = getattr(value, "memory", None)
+            if memory is not None and hasattr(memory, "clear"):
+                memory.clear()
+            if hasattr(value, "run_response"):
+                value.run_response = None
+
+    def release(self, agent, *args, **kwargs):
+        agent_class = type(agent)
+        key = self._key(agent_class, args, kwargs)
+        try:
+            self._reset(agent)
+            reusable = True
+        except Exception as e:
+            print(f"Warning: Could not reset pooled {agent_class.__name__}, retiring it: {e}")
+            reusable = False
+        with self._lock:
+            counters = self._counters(agent_class)
+            counters["in_use"] -= 1
+            uses = self._uses.get(agent, 0) + 1
+            self._uses[agent] = uses
+            if not reusable or uses >= self.max_uses:
+                counters["retired"] += 1
+                return
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_key:
+                idle.append(agent)
+                counters["idle"] += 1
+
+    @contextmanager
+    def agent(self, agent_class, *args, **kwargs):
+        """with agent_pool.agent(Grader, model_id, llm_cache=cache) as grader: ..."""
+        instance = self.checkout(agent_class, *args, **kwargs)
+        try:
+            yield instance
+        finally:
+            self.release(instance, *args, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(counters) for name, counters in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._idle.clear()
+            for counters in self._stats.values():
+                counters["idle"] = 0
+
+
+agent_pool = AgentPool()
@@ -12,7 +12,8 @@ class GradeAnswer(BaseModel):
     )    
     
 class AnswerGrader:
-    def __init__(self, model_id="gemini-2.0-flash"):
+    def __init__(self, model_id="gemini-2.0-flash", llm_cache=None):
+        self.llm_cache = llm_cache
         self.agent = Agent(
             model=Gemini(id=model_id),
             response_model=GradeAnswer,
@@ -34,7 +35,10 @@ class AnswerGrader:
     
     def grade_answer(self, question, generation):
         prompt = f"User question: {question}\n\nLLM generation: {generation}\n\nDoes this answer address and resolve the question? Respond with 'yes' or 'no'."
-        response = self.agent.run(prompt).content
+        if self.llm_cache is not None:
+            response = self.llm_cache.run_agent(self.agent, prompt, "answer_grader", key_text=question, context=str(generation))
+        else:
+            response = self.agent.run(prompt).content
         return response.binary_score
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import os
+from typing import List
 from pydantic import BaseModel, Field
 from agno.agent import Agent
 from agno.models.google import Gemini
@@ -13,7 +14,8 @@ class GradeDocuments(BaseModel):
     )        
 
 class Grader:
-    def __init__(self, model_id="gemini-2.0-flash"):
+    def __init__(self, model_id="gemini-2.0-flash", llm_cache=None):
+        self.llm_cache = llm_cache
         self.agent = Agent(
             model=Gemini(id=model_id),
             response_model=GradeDocuments,
@@ -35,9 +37,52 @@ class Grader:
         
     def grade_documents(self, question, document):
         prompt = f"Retrieved document: \n\n {document} \n\n User question: {question}\n\nIs this document relevant to the question? Respond with 'yes' or 'no'."
-        response = self.agent.run(prompt).content
+        if self.llm_cache is not None:
+            response = self.llm_cache.run_agent(self.agent, prompt, "document_grader", key_text=question, context=str(document))
+        else:
+            response = self.agent.run(prompt).content
         return response.binary_score
 
+class DocumentGrade(BaseModel):
+    index: int = Field(description="Index of the document as numbered in the prompt")
+    binary_score: str = Field(description="Document is relevant to the question, 'yes' or 'no'")
+
+class GradeDocumentBatch(BaseModel):
+    """Binary relevance scores for several retrieved documents graded in one call."""
+    grades: List[DocumentGrade]
+
+class BatchGrader:
+    def __init__(self, model_id="gemini-2.0-flash", llm_cache=None):
+        self.llm_cache = llm_cache
+        self.agent = Agent(
+            model=Gemini(id=model_id),
+            response_model=GradeDocumentBatch,
+            instructions="""You are a grader assessing relevance of several retrieved documents to a user question.
+
+            Each document is numbered. Grade every document independently and return one grade per index.
+
+            Scoring criteria:
+            - 'yes': The document contains relevant information, keywords, or concepts related to the question
+            - 'no': The document is completely unrelated or irrelevant to the question
+
+            It does not need to be a stringent test - the goal is to filter out erroneous retrievals.
+            """
+        )
+
+    def grade_documents(self, question, documents):
+        """Return one 'yes'/'no' per document, in order. Documents the model skipped count as 'yes'."""
+        numbered = "\n\n".join(f"[{i}] {document}" for i, document in enumerate(documents))
+        prompt = f"User question: {question}\n\nRetrieved documents:\n\n{numbered}\n\nGrade each document's relevance with 'yes' or 'no'."
+        if self.llm_cache is not None:
+            response = self.llm_cache.run_agent(self.agent, prompt, "batch_document_grader", key_text=question, context=numbered)
+        else:
+            response = self.agent.run(prompt).content
+        scores = ["yes"] * len(documents)
+        for grade in response.grades:
+            if 0 <= grade.index < len(documents):
+                scores[grade.index] = grade.binary_score.strip().lower()
+        return scores
+
 if __name__ == "__main__":
     grader = Grader()
     
@@ -12,7 +12,8 @@ class GradeHallucinations(BaseModel):
     )    
     
 class HallucinationGrader:
-    def __init__(self, model_id="gemini-2.0-flash"):
+    def __init__(self, model_id="gemini-2.0-flash", llm_cache=None):
+        self.llm_cache = llm_cache
         self.agent = Agent(
             model=Gemini(id=model_id),
             response_model=GradeHallucinations,
@@ -36,7 +37,10 @@ class HallucinationGrader:
         
     def grade_hallucinations(self, documents, generation):
         prompt = f"Set of facts: \n\n {documents} \n\n LLM generation: {generation}\n\nIs this generation grounded in and supported by the set of facts? Respond with 'yes' or 'no'."
-        response = self.agent.run(prompt).content
+        if self.llm_cache is not None:
+            response = self.llm_cache.run_agent(self.agent, prompt, "hallucination_grader", key_text=str(generation), context=str(documents))
+        else:
+            response = self.agent.run(prompt).content
         return response.binary_score
 
 if __name__ == "__main__":
@@ -7,8 +7,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class Search:
-    def __init__(self, k=3, model_id="gemini-2.0-flash"):
+    def __init__(self, k=3, model_id="gemini-2.0-flash", search_cache=None):
         self.k = k
+        self.search_cache = search_cache
+        # Results depend on the tool, the model summarizing them and k.
+        self.provider = f"tavily:{model_id}:k={k}"
         self.agent = Agent(
             model=Gemini(id=model_id),
             tools=[TavilyTools()],
@@ -25,11 +28,16 @@ class Search:
             Always use the search tool to find the most current and accurate information for user queries."""
         )
     
-    def web_search(self, question):
+    def _web_search(self, question):
         prompt = f"Search for information about: {question}"
         response = self.agent.run(prompt)
         return response.content
     
+    def web_search(self, question):
+        if self.search_cache is not None:
+            return self.search_cache.cached_search(self.provider, question, self._web_search)
+        return self._web_search(question)
+    
     def search_and_format(self, question):
         prompt = f"Search for detailed information about: {question}. Provide a comprehensive summary of the findings."
         response = self.agent.run(prompt)
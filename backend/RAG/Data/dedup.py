@@ -0,0 +1,235 @@
+import os
+import re
+import json
+import time
+import zlib
+import hashlib
+import threading
+from pathlib import Path
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+dedup_cache_dir = Path(__file__).resolve().parent.parent / "cache" / "dedup"
+manifest_path = dedup_cache_dir / "dedup_manifest.json"
+
+# 2^31 - 1 keeps (a * x + b) inside uint64 for 31-bit a and x.
+_PRIME = np.uint64((1 << 31) - 1)
+_token_re = re.compile(r'\w+')
+
+
+class CorpusDeduplicator:
+    """
+    Ingest-time near-duplicate detection over the chunk CSVs with MinHash + LSH.
+
+    Every CSV row is shingled on word trigrams of the same values LoadDocuments turns into
+    a Document. Rows of the same file sharing an LSH bucket are verified pairwise with exact
+    Jaccard similarity; the first row of a group (in file order) stays as the canonical copy
+    and every other member is within the threshold of that canonical row. Duplicates are
+    listed in the manifest so the loader skips them and records their sources on the
+    canonical Document.
+
+    Dedup stays within a file: indexes are built per file, so dropping a row because its copy
+    lives in another file would make it unretrievable whenever only this file is selected.
+    """
+
+    def __init__(self, csv_dir=None, threshold=0.85, num_perm=64, bands=16, seed=42):
+        self.csv_dir = Path(csv_dir) if csv_dir else Path(__file__).parent / "CSV"
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        rng = np.random.RandomState(seed)
+        self.perm_a = rng.randint(1, int(_PRIME), size=num_perm).astype(np.uint64)
+        self.perm_b = rng.randint(0, int(_PRIME), size=num_perm).astype(np.uint64)
+
+    def params(self):
+        # scope is part of the fingerprint so manifests from the old cross-file pass are rebuilt.
+        return {"threshold": self.threshold, "num_perm": self.num_perm, "bands": self.bands, "scope": "file"}
+
+    def csv_files(self):
+        return sorted(self.csv_dir.glob("*.csv"))
+
+    def fingerprint(self):
+        hasher = hashlib.md5(json.dumps(self.params(), sort_keys=True).encode())
+        for file_path in self.csv_files():
+            stat = file_path.stat()
+            hasher.update(f"{file_path.name}:{stat.st_size}:{stat.st_mtime}".encode())
+        return hasher.hexdigest()
+
+    @staticmethod
+    def row_text(row, columns):
+        return " ".join(str(row[col]) for col in columns if pd.notna(row[col]))
+
+    @staticmethod
+    def shingles(text):
+        tokens = _token_re.findall(text.lower())
+        if len(tokens) < 3:
+            grams = tokens
+        else:
+            grams = [" ".join(tokens[i:i + 3]) for i in range(len(tokens) - 2)]
+        return {zlib.crc32(gram.encode()) for gram in grams}
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        hashes = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set)) % _PRIME
+        return ((self.perm_a[:, None] * hashes[None, :] + self.perm_b[:, None]) % _PRIME).min(axis=1)
+
+    @staticmethod
+    def jaccard(a, b):
+        if not a and not b:
+            return 1.0
+        return len(a & b) / len(a | b)
+
+    def _load_rows(self):
+        keys, shingle_sets, file_ids = [], [], []
+        for file_id, file_path in enumerate(self.csv_files()):
+            try:
+                df = pd.read_csv(file_path)
+            except Exception as e:
+                print(f"   ❌ Could not read {file_path.name}: {e}")
+                continue
+            columns = list(df.columns)
+            for row_index, row in zip(df.index, df.to_dict("records")):
+                keys.append(f"{file_path.name}#{row_index}")
+                shingle_sets.append(self.shingles(self.row_text(row, columns)))
+                file_ids.append(file_id)
+        return keys, shingle_sets, file_ids
+
+    def find_groups(self, shingle_sets, file_ids):
+        """Groups of row indices, canonical (lowest) index first; rows only group within their file."""
+        buckets = defaultdict(list)
+        for idx, shingle_set in enumerate(shingle_sets):
+            signature = self.signature(shingle_set)
+            for band in range(self.bands):
+                band_slice = signature[band * self.rows_per_band:(band + 1) * self.rows_per_band]
+                buckets[(file_ids[idx], band, band_slice.tobytes())].append(idx)
+
+        # Every pair sharing a bucket is verified, not just pairs with the bucket's first row.
+        neighbours = defaultdict(set)
+        checked = set()
+        for members in buckets.values():
+            for position, i in enumerate(members):
+                for j in members[position + 1:]:
+                    if (i, j) in checked:
+                        continue
+                    checked.add((i, j))
+                    if self.jaccard(shingle_sets[i], shingle_sets[j]) >= self.threshold:
+                        neighbours[i].add(j)
+
+        # Greedy in row order instead of union-find: a row joins the group of an earlier canonical
+        # row it was verified against, so A~B and B~C never pull in a C that is not close to A.
+        assigned = set()
+        groups = []
+        for i in sorted(neighbours):
+            if i in assigned:
+                continue
+            # neighbours[i] only holds later rows, none of which has been a canonical row yet.
+            members = [j for j in sorted(neighbours[i]) if j not in assigned]
+            if members:
+                assigned.update(members)
+                groups.append([i] + members)
+        return groups
+
+    def build_manifest(self):
+        print(f"Deduplicating CSV rows in {self.csv_dir}")
+        start_time = time.time()
+        keys, shingle_sets, file_ids = self._load_rows()
+        groups = self.find_groups(shingle_sets, file_ids)
+
+        duplicates = defaultdict(dict)
+        merged = defaultdict(dict)
+        for members in groups:
+            canonical_key = keys[members[0]]
+            canonical_file, canonical_row = canonical_key.rsplit("#", 1)
+            merged[canonical_file][canonical_row] = [keys[idx] for idx in members[1:]]
+            for idx in members[1:]:
+                file_name, row_index = keys[idx].rsplit("#", 1)
+                duplicates[file_name][row_index] = canonical_key
+
+        file_versions = {}
+        for file_name in set(duplicates) | set(merged):
+            payload = json.dumps([duplicates.get(file_name, {}), merged.get(file_name, {})], sort_keys=True)
+            file_versions[file_name] = hashlib.md5(payload.encode()).hexdigest()[:8]
+
+        total_rows = len(keys)
+        duplicate_rows = sum(len(rows) for rows in duplicates.values())
+        canonical_rows = total_rows - duplicate_rows
+        stats = {
+            "total_rows": total_rows,
+            "canonical_rows": canonical_rows,
+            "duplicate_rows": duplicate_rows,
+            "duplicate_groups": len(groups),
+            "compression_ratio": total_rows / canonical_rows if canonical_rows else 1.0,
+            "build_seconds": time.time() - start_time
+        }
+        manifest = {
+            "fingerprint": self.fingerprint(),
+            "params": self.params(),
+            "stats": stats,
+            "duplicates": duplicates,
+            "merged": merged,
+            "file_versions": file_versions
+        }
+
+        dedup_cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+        print(f"   Rows: {total_rows} -> {canonical_rows} canonical ({duplicate_rows} near-duplicates in {len(groups)} groups)")
+        print(f"   Compression ratio: {stats['compression_ratio']:.2f}x ({stats['build_seconds']:.1f}s)")
+        return manifest
+
+
+_manifest_lock = threading.Lock()
+_manifest_cache = {"mtime": None, "manifest": None}
+
+
+def load_dedup_manifest():
+    """Current dedup manifest (re-read only when the file changes), or None if no pass has run."""
+    with _manifest_lock:
+        if not manifest_path.exists():
+            return None
+        mtime = manifest_path.stat().st_mtime
+        if _manifest_cache["mtime"] != mtime:
+            try:
+                with open(manifest_path, 'r') as f:
+                    _manifest_cache["manifest"] = json.load(f)
+                _manifest_cache["mtime"] = mtime
+            except Exception as e:
+                print(f"Warning: Could not read dedup manifest: {e}")
+                return None
+        return _manifest_cache["manifest"]
+
+
+def ensure_dedup_manifest(csv_dir=None):
+    """Rebuild the manifest when the CSV set (or dedup parameters) changed since the last pass."""
+    deduplicator = CorpusDeduplicator(csv_dir)
+    manifest = load_dedup_manifest()
+    if manifest is None or manifest.get("fingerprint") != deduplicator.fingerprint():
+        manifest = deduplicator.build_manifest()
+        with _manifest_lock:
+            _manifest_cache["mtime"] = manifest_path.stat().st_mtime
+            _manifest_cache["manifest"] = manifest
+    return manifest
+
+
+def dedup_version(file_name):
+    """Short per-file digest of the dedup decisions, empty when the file has none."""
+    manifest = load_dedup_manifest()
+    if manifest is None:
+        return ""
+    return manifest.get("file_versions", {}).get(file_name, "")
+
+
+def main():
+    manifest = CorpusDeduplicator().build_manifest()
+    print(json.dumps(manifest["stats"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
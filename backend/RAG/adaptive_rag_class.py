@@ -10,11 +10,12 @@ os.makedirs(cache_base_dir, exist_ok=True)
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain_core.documents import Document
-from agno.models.google import Gemini
+from google import genai
 from typing import List
-from langchain_community.vectorstores import FAISS
 from langchain.retrievers import EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
+from .sparse_bm25 import SparseBM25Index, SparseBM25Retriever
+from .doc_store import DocumentStore, LazyDocuments, SQLiteDocstore
+from .retrieval_cache import retrieval_cache
 from langchain import hub
 from langchain_groq import ChatGroq
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -22,16 +23,27 @@ from langchain_core.output_parsers import StrOutputParser
 from .Agents.search_agent import Search
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.retrievers.contextual_compression import ContextualCompressionRetriever
-from langchain_cohere import CohereRerank
+from .rerankers import get_reranker
+from .document_scorer import load_sentence_model
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import threading
+import time
+import random
 from langchain_community.llms import Cohere
 from .Agents.answer_grader_agent import AnswerGrader
 from .Agents.hallucinator_agent import HallucinationGrader
-from .Agents.grader_agent import Grader
+from .Agents.grader_agent import Grader, BatchGrader
 from .Agents.question_rewriter import QuestionRewriter
 from .Agents.abstractor_agent import Abstractor
 from pprint import pprint
-from langgraph.graph import END
 from .Agents.reflectionAgent import IntrospectiveAgent
+from .Agents.agent_pool import agent_pool
+from .query_classification import compute_query_complexity, split_sub_questions
+from .Data.dedup import load_dedup_manifest
+from .chunking import EmbeddingReuseChunker, get_chunking_mode
+from .embedding_store import get_embedding_store, migrate_json_cache
+from .local_embeddings import LocalEmbeddings
+from .vector_index import build_vectorstore, load_vectorstore, save_vectorstore, describe_index, mapped_memory
 # Additional imports for document loading
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredWordDocumentLoader
 import json
@@ -39,38 +51,29 @@ import pandas as pd
 import pathlib
 import hashlib
 import pickle
-from gptcache import Cache
-from langchain.globals import set_llm_cache
-from gptcache.manager.factory import manager_factory
-from gptcache.processor.pre import get_prompt
-from langchain_community.cache import GPTCache
+import uuid
+from .llm_cache import semantic_llm_cache, install_langchain_cache
+from .search_cache import web_search_cache
 import re
 import math
 import numpy as np
 from collections import Counter
 
-def get_hashed_name(name):
-    return hashlib.sha256(name.encode()).hexdigest()
+install_langchain_cache()
 
+# Reciprocal rank fusion constant (Cormack et al.); larger values flatten rank differences.
+RRF_K = 60
 
-def init_gptcache(cache_obj: Cache, llm: str):
-    hashed_llm = get_hashed_name(llm)
-    cache_dir = os.path.join(cache_base_dir, "llm_cache", f"map_cache_{hashed_llm}")
-    os.makedirs(cache_dir, exist_ok=True)
-    
-    cache_obj.init(
-        pre_embedding_func=get_prompt,
-        data_manager=manager_factory(manager="map", data_dir=cache_dir),
-    )
-
-
-set_llm_cache(GPTCache(init_gptcache))
+# Shared by every ADAPTIVE_RAG instance for the hallucination/answer grader pair.
+_generation_grading_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="generation-grader")
 
 
 class LoadDocuments:
-    def __init__(self, file_path):
+    def __init__(self, file_path, apply_dedup=True, csv_chunksize=5000):
         self.file_path = file_path
         self.file_extension = pathlib.Path(file_path).suffix.lower()
+        self.apply_dedup = apply_dedup
+        self.csv_chunksize = csv_chunksize
 
     def load_documents(self):
         """Load documents based on file extension"""
@@ -89,31 +92,59 @@ class LoadDocuments:
 
     def _load_csv(self):
         """Load CSV files with general format handling"""
-        df = pd.read_csv(self.file_path)
         documents = []
         questions = []
         translations = []
-
-        for _, row in df.iterrows():
-            content_parts = []
-            for col in df.columns:
-                val = row[col]
-                if pd.notna(val):
-                    if isinstance(val, list):
-                        val_str = ", ".join(str(v) for v in val)
-                    else:
-                        val_str = str(val)
-                    content_parts.append(f"{col}: {val_str}")
-            content = "\n".join(content_parts)
-            documents.append(Document(
-                page_content=content,
-                metadata={"row_index": row.name, "source": self.file_path}
-            ))
+        for document, translation in self.iter_csv_documents():
+            documents.append(document)
             questions.append("General information query")
-            translations.append(content[:200] + "..." if len(content) > 200 else content)
-
+            translations.append(translation)
         return documents, questions, translations
 
+    @staticmethod
+    def _format_csv_chunk(chunk):
+        """Vectorized "col: value" lines per row, skipping missing values (same text as the row-by-row loader)."""
+        content = None
+        for col in chunk.columns:
+            values = chunk[col]
+            formatted = (f"{col}: " + values.astype(str)).where(values.notna(), "")
+            if content is None:
+                content = formatted
+            else:
+                separator = pd.Series(np.where((content != "") & (formatted != ""), "\n", ""), index=chunk.index, dtype=object)
+                content = content + separator + formatted
+        return content if content is not None else pd.Series("", index=chunk.index)
+
+    def iter_csv_documents(self):
+        """
+        Stream (Document, translation) pairs: the CSV is read csv_chunksize rows at a time and
+        each chunk's content strings are built with column operations instead of iterrows.
+        """
+        # Near-duplicate rows found by the ingest dedup pass are dropped; their
+        # canonical row carries where the copies came from.
+        file_name = pathlib.Path(self.file_path).name
+        dedup_manifest = (load_dedup_manifest() or {}) if self.apply_dedup else {}
+        duplicate_rows = dedup_manifest.get("duplicates", {}).get(file_name, {})
+        merged_sources = dedup_manifest.get("merged", {}).get(file_name, {})
+
+        for chunk in pd.read_csv(self.file_path, chunksize=self.csv_chunksize):
+            if duplicate_rows:
+                chunk = chunk[~chunk.index.astype(str).isin(list(duplicate_rows))]
+            if chunk.empty:
+                continue
+            contents = self._format_csv_chunk(chunk)
+            ellipsis = pd.Series(np.where(contents.str.len() > 200, "...", ""), index=contents.index, dtype=object)
+            translations = contents.str.slice(0, 200) + ellipsis
+            for row_index, content, translation in zip(chunk.index, contents, translations):
+                metadata = {"row_index": row_index, "source": self.file_path}
+                if str(row_index) in merged_sources:
+                    metadata["duplicate_sources"] = merged_sources[str(row_index)]
+                    metadata["duplicate_count"] = len(merged_sources[str(row_index)])
+                yield Document(page_content=content, metadata=metadata), translation
+
+        if duplicate_rows:
+            print(f"Skipped {len(duplicate_rows)} near-duplicate rows in {file_name}")
+
     def _load_pdf(self):
         """Load PDF files"""
         loader = PyPDFLoader(self.file_path)
@@ -220,75 +251,120 @@ class LoadDocuments:
 
         return documents, questions, translations
     
-class MyEmbeddings:
-    def __init__(self, model: str = "gemini-1"):
-        self.embedder = Gemini(model=model)
-        # Create embedding cache directory
-        self.cache_dir = os.path.join(cache_base_dir, "embedding_cache")
-        os.makedirs(self.cache_dir, exist_ok=True)
-        self.cache_file = os.path.join(self.cache_dir, "embedding_cache.json")
-        self._cache = self._load_cache()
+DEFAULT_GEMINI_EMBEDDING_MODEL = "gemini-embedding-001"
+# embedding_cache.json was written by the earlier agno Gemini embedder; its vectors only belong in that model's store.
+LEGACY_JSON_CACHE_MODEL = "gemini-1"
 
-    def _load_cache(self):
-        """Load cache from file if it exists"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
 
-    def _save_cache(self):
-        """Save cache to file"""
-        try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self._cache, f)
-        except Exception as e:
-            print(f"Warning: Could not save embedding cache: {e}")
+class MyEmbeddings:
+    """
+    Gemini embeddings cached by text hash in the model's append-only EmbeddingStore.
+    embed_documents sends uncached texts in real batched embed_content requests, several
+    batches at a time, retrying 429/5xx responses with exponential backoff; results come
+    back in input order.
+    """
+    # HTTP statuses worth retrying: rate limiting and transient server errors.
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, model: str = None, batch_size: int = None, max_concurrency: int = None, max_retries: int = None):
+        self.model = model or os.getenv("RAG_GEMINI_EMBEDDING_MODEL", DEFAULT_GEMINI_EMBEDDING_MODEL)
+        self.client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+        # embed_content accepts up to 100 texts per request.
+        self.batch_size = min(batch_size or int(os.getenv("RAG_EMBED_BATCH_SIZE", "100")), 100)
+        self.max_concurrency = max_concurrency or int(os.getenv("RAG_EMBED_CONCURRENCY", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("RAG_EMBED_MAX_RETRIES", "5"))
+        # Shared append-only store per model; one small append per miss instead of a full rewrite.
+        self.store = get_embedding_store(self.model)
+        legacy_cache_file = os.path.join(cache_base_dir, "embedding_cache", "embedding_cache.json")
+        if self.model == LEGACY_JSON_CACHE_MODEL and os.path.exists(legacy_cache_file):
+            migrate_json_cache(legacy_cache_file, self.store)
 
     def __call__(self, text):
         """Make the class callable for FAISS compatibility"""
         return self.embed_query(text)
 
+    def describe(self):
+        return {"backend": "gemini", "model": self.model}
+
+    def _is_retryable(self, error):
+        status = getattr(error, "code", None)
+        return status in self.RETRYABLE_STATUS or isinstance(error, (ConnectionError, TimeoutError))
+
+    def _request_batch(self, texts: List[str]) -> List[List[float]]:
+        """One embed_content request for texts, retried with jittered exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.models.embed_content(model=self.model, contents=texts)
+                embeddings = [list(embedding.values) for embedding in response.embeddings]
+                if len(embeddings) != len(texts):
+                    raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+                return embeddings
+            except Exception as e:
+                if attempt == self.max_retries or not self._is_retryable(e):
+                    raise
+                delay = min(2 ** attempt, 30) * (0.5 + random.random() / 2)
+                print(f"Embedding batch of {len(texts)} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        embeddings = []
-        uncached_texts = []
-        uncached_indices = []
-        
-        # Check cache first
-        for i, text in enumerate(texts):
-            text_hash = hashlib.md5(text.encode()).hexdigest()
-            if text_hash in self._cache:
-                embeddings.append(self._cache[text_hash])
-            else:
-                uncached_texts.append(text)
-                uncached_indices.append(i)
-                embeddings.append(None)
-        
-        # Batch process uncached texts
-        if uncached_texts:
-            # Process in smaller batches to avoid timeout
-            batch_size = 5
-            for i in range(0, len(uncached_texts), batch_size):
-                batch = uncached_texts[i:i+batch_size]
-                for j, text in enumerate(batch):
-                    embedding = self.embedder.get_embedding(text)
-                    text_hash = hashlib.md5(text.encode()).hexdigest()
-                    self._cache[text_hash] = embedding
-                    embeddings[uncached_indices[i+j]] = embedding
+        start_time = time.time()
+        hashes = [hashlib.md5(text.encode()).hexdigest() for text in texts]
+        
+        # Check cache first; repeated texts are requested once.
+        cached = self.store.get_many(set(hashes))
+        uncached = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached and text_hash not in uncached:
+                uncached[text_hash] = text
+        
+        if uncached:
+            pending_hashes = list(uncached)
+            batches = [pending_hashes[i:i + self.batch_size] for i in range(0, len(pending_hashes), self.batch_size)]
+            
+            def embed_batch(batch_hashes):
+                embeddings = self._request_batch([uncached[text_hash] for text_hash in batch_hashes])
+                self.store.put_many(zip(batch_hashes, embeddings))
+                return dict(zip(batch_hashes, embeddings))
+            
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                # Iterating re-raises the first batch that failed after its retries.
+                for batch_embeddings in executor.map(embed_batch, batches):
+                    cached.update(batch_embeddings)
         
+        embeddings = [cached[text_hash] for text_hash in hashes]
+        
+        elapsed = time.time() - start_time
+        if uncached:
+            print(f"Embedded {len(uncached)} new texts ({len(texts) - len(uncached)} cached) in "
+                  f"{elapsed:.2f}s: {len(uncached) / max(elapsed, 1e-9):.1f} texts/s")
         return embeddings
 
     def embed_query(self, query: str) -> List[float]:
         query_hash = hashlib.md5(query.encode()).hexdigest()
-        if query_hash in self._cache:
-            return self._cache[query_hash]
+        cached = self.store.get(query_hash)
+        if cached is not None:
+            return cached
         
-        embedding = self.embedder.get_embedding(query)
-        self._cache[query_hash] = embedding
-        self._save_cache()  # Save cache after each update
+        embedding = self._request_batch([query])[0]
+        self.store.put(query_hash, embedding)
         return embedding
+
+
+def get_embeddings():
+    """Embedding backend per RAG_EMBEDDING_BACKEND: gemini (default) or local."""
+    backend = os.getenv("RAG_EMBEDDING_BACKEND", "gemini").lower()
+    if backend == "local":
+        return LocalEmbeddings()
+    if backend != "gemini":
+        print(f"Warning: Unknown RAG_EMBEDDING_BACKEND '{backend}', using 'gemini'")
+    return MyEmbeddings()
+
+
+def vectorstore_dir_name(embedding) -> str:
+    """faiss_db for the default Gemini model (where existing caches live), faiss_db_<backend>_<model> otherwise."""
+    if embedding["backend"] == "gemini" and embedding["model"] == DEFAULT_GEMINI_EMBEDDING_MODEL:
+        return "faiss_db"
+    return "faiss_db_" + re.sub(r"[^A-Za-z0-9._-]+", "_", f"{embedding['backend']}_{embedding['model']}")
     
         
 class ADAPTIVE_RAG:
@@ -310,48 +386,36 @@ class ADAPTIVE_RAG:
         
         os.makedirs(self.cache_base_dir, exist_ok=True)
         
-        self.vectorstore_dir = os.path.join(self.cache_base_dir, "vectorstore", "faiss_db")
+        # Indexes are keyed by embedding model, so switching RAG_EMBEDDING_BACKEND builds a
+        # separate index instead of rebuilding over the one other workers may still be using.
+        self.embd = get_embeddings()
+        self.vectorstore_dir = os.path.join(self.cache_base_dir, "vectorstore", vectorstore_dir_name(self.embd.describe()))
         os.makedirs(self.vectorstore_dir, exist_ok=True)
         
         # Fix paths to match actual structure: faiss_index subdirectory exists
         self.faiss_index_path = os.path.join(self.vectorstore_dir, "faiss_index")
         self.faiss_pkl_path = os.path.join(self.vectorstore_dir, "faiss_vectorstore.pkl")
-        self.bm25_index_path = os.path.join(self.vectorstore_dir, "bm25_retriever.pkl")
+        self.bm25_index_dir = os.path.join(self.vectorstore_dir, "bm25_index")
+        self.doc_store_path = os.path.join(self.vectorstore_dir, "doc_store.sqlite")
+        # Only read to migrate caches created before the doc store
         self.doc_splits_path = os.path.join(self.vectorstore_dir, "doc_splits.pkl")
+        # Build id of the current indexes; retrieval cache entries are keyed on it.
+        self.index_meta_path = os.path.join(self.vectorstore_dir, "index_meta.json")
+        self.index_version = None
         
         if self._vectorstore_exists():
             print("Loading existing vectorstore...")
-            self.embd = MyEmbeddings()
             self._load_existing_retrievers()
         else:
             print("Creating new vectorstore...")
-            self.documents, self.questions, self.translations = self.load_documents.load_documents()
-            self.embd = MyEmbeddings()
-            self.text_splitter = SemanticChunker(self.embd)
-            self.doc_splits = self.text_splitter.split_documents(self.documents)
-            
-            doc_texts = [doc.page_content for doc in self.doc_splits]
-            
-            self.bm25_retriever = BM25Retriever.from_texts(
-                doc_texts, 
-                metadatas=[doc.metadata for doc in self.doc_splits]
-            )
-            self.bm25_retriever.k = min(k, 3)
-            
-            self.faiss_vectorstore = FAISS.from_documents(
-                documents=self.doc_splits,
-                embedding=self.embd
-            )
-            self.faiss_retriever = self.faiss_vectorstore.as_retriever(search_kwargs={"k": min(k, 3)})
-            
-            self._save_retrievers()
+            self._index_documents()
         
         self.ensemble_retriever = EnsembleRetriever(
             retrievers=[self.bm25_retriever, self.faiss_retriever],
             weights=[0.5, 0.5]  
         )
         
-        self.compressor = CohereRerank(model="rerank-english-v3.0")
+        self.compressor = get_reranker(top_n=3)
         
         self.compression_retriever = ContextualCompressionRetriever(
             base_compressor=self.compressor, 
@@ -381,31 +445,125 @@ class ADAPTIVE_RAG:
             ]
         )
         self.rag_chain = self.rag_prompt | self.llm | StrOutputParser()
-        self.recursion_limit = 2
-        self.recursion_counter = 0
+        # Per-query budget for the generate -> grade -> transform_query loop.
+        self.max_attempts = int(os.getenv("RAG_MAX_ATTEMPTS", "3"))
+        self.time_budget = float(os.getenv("RAG_QUERY_TIME_BUDGET", "60"))
 
-        self.introspective_agent = IntrospectiveAgent(
-            model_id=self.model,
-        )
+        # Sub-agents (graders, rewriter, abstractor, search, introspective agent) are checked out
+        # of the process-wide agent_pool per call, so they are built once per concurrent use
+        # rather than per document, call or workflow.
+        
+        # Document grading: an embedding prefilter drops clearly unrelated documents,
+        # the rest are graded together in one structured call.
+        self.grade_prefilter_threshold = float(os.getenv("RAG_GRADE_PREFILTER", "0.15"))
+        self.max_graded_documents = 3
+        self.max_relevant_documents = 2
+        
+        # Generation graders run side by side. A grader abandoned by a short-circuit stays
+        # checked out until its call finishes, so it is never reused while still in flight.
+        self.last_generation_grade = None
 
     def _vectorstore_exists(self):
         # Check for the actual file structure: faiss_index/index.faiss
         faiss_index_file = os.path.join(self.vectorstore_dir, "faiss_index", "index.faiss")
         return (os.path.exists(faiss_index_file) or 
-                os.path.exists(self.faiss_pkl_path)) and os.path.exists(self.bm25_index_path)
+                os.path.exists(self.faiss_pkl_path)) and (
+                DocumentStore.exists(self.doc_store_path) or os.path.exists(self.doc_splits_path))
+    
+    def _index_documents(self):
+        """Chunk the source file and build the doc store, BM25 index and FAISS index from scratch."""
+        self.documents, self.questions, self.translations = self.load_documents.load_documents()
+        self.chunking_mode = get_chunking_mode()
+        chunk_embeddings = None
+        if self.chunking_mode == "semantic":
+            self.text_splitter = SemanticChunker(self.embd)
+            self.doc_splits = self.text_splitter.split_documents(self.documents)
+        else:
+            # Sentence embeddings are computed once and pooled into the chunk embeddings.
+            self.text_splitter = EmbeddingReuseChunker(self.embd)
+            self.doc_splits, chunk_embeddings = self.text_splitter.split_documents_with_embeddings(self.documents)
+        if not self.doc_splits:
+            raise ValueError(f"No indexable content in {self.load_documents.file_path}")
+        # doc_id lets FAISS and BM25 hits be mapped back to doc store rows.
+        for doc_id, doc in enumerate(self.doc_splits):
+            doc.metadata["doc_id"] = doc_id
+        
+        self.doc_store = DocumentStore.create(self.doc_store_path, self.doc_splits)
+        self.bm25_retriever = self._build_bm25_retriever([doc.page_content for doc in self.doc_splits])
+        
+        texts = [doc.page_content for doc in self.doc_splits]
+        if chunk_embeddings is None:
+            chunk_embeddings = self.embd.embed_documents(texts)
+        # Flat, HNSW or IVF-PQ per RAG_VECTOR_INDEX (see vector_index.get_index_params).
+        # Docstore ids are the chunk ids, so a reload can resolve hits from the doc store.
+        self.faiss_vectorstore, self.vector_index_info = build_vectorstore(
+            texts, chunk_embeddings, [doc.metadata for doc in self.doc_splits], self.embd,
+            ids=[str(doc_id) for doc_id in range(len(self.doc_splits))]
+        )
+        self.vector_index_info["docstore"] = "doc_store"
+        self.faiss_retriever = self.faiss_vectorstore.as_retriever(search_kwargs={"k": min(self.k, 3)})
+        
+        self._save_retrievers()
+        self._write_index_meta()
+    
+    def _write_index_meta(self):
+        if self.index_version:
+            retrieval_cache.invalidate(self.index_version)
+        self.index_version = uuid.uuid4().hex
+        try:
+            with open(self.index_meta_path, 'w') as f:
+                json.dump({
+                    "build_id": self.index_version,
+                    "built_at": time.time(),
+                    "chunking_mode": getattr(self, "chunking_mode", None),
+                    "embedding": self.embd.describe(),
+                    "vector_index": getattr(self, "vector_index_info", None)
+                }, f)
+        except Exception as e:
+            print(f"Warning: Could not save index metadata: {e}")
+    
+    def _read_index_meta(self):
+        try:
+            with open(self.index_meta_path, 'r') as f:
+                index_meta = json.load(f)
+            self.index_version = index_meta["build_id"]
+            return index_meta
+        except Exception:
+            # Indexes built before index_meta.json existed came from an earlier embedder; the caller rebuilds them.
+            return {}
+    
+    def _open_doc_store(self):
+        if not DocumentStore.exists(self.doc_store_path):
+            # Caches from before the doc store keep doc_splits as a pickle; convert it once.
+            with open(self.doc_splits_path, 'rb') as f:
+                legacy_splits = pickle.load(f)
+            DocumentStore.create(self.doc_store_path, legacy_splits).close()
+            os.remove(self.doc_splits_path)
+            print(f"Migrated {len(legacy_splits)} chunks from doc_splits.pkl to the doc store.")
+        self.doc_store = DocumentStore(self.doc_store_path)
+        self.doc_splits = LazyDocuments(self.doc_store)
+    
+    def _bm25_retriever(self, index):
+        return SparseBM25Retriever(
+            index=index,
+            get_documents=lambda doc_ids: self.doc_store.get(doc_ids),
+            k=min(self.k, 3)
+        )
+    
+    def _build_bm25_retriever(self, texts):
+        index = SparseBM25Index.build(texts, self.bm25_index_dir)
+        return self._bm25_retriever(index)
+    
+    def _load_bm25_retriever(self):
+        # Caches from before the sparse index only have the chunks; index them once.
+        if SparseBM25Index.exists(self.bm25_index_dir):
+            return self._bm25_retriever(SparseBM25Index.load(self.bm25_index_dir))
+        return self._build_bm25_retriever(list(self.doc_store.texts()))
     
     def _save_retrievers(self):
         try:
-            self.faiss_vectorstore.save_local(self.faiss_index_path)
+            save_vectorstore(self.faiss_vectorstore, self.faiss_index_path)
             print("FAISS vectorstore saved using native method.")
-            
-            with open(self.bm25_index_path, 'wb') as f:
-                pickle.dump(self.bm25_retriever, f)
-            
-            with open(self.doc_splits_path, 'wb') as f:
-                pickle.dump(self.doc_splits, f)
-                
-            print("BM25 retriever and documents saved successfully.")
         except Exception as e:
             print(f"Warning: Could not save retrievers: {e}")
     
@@ -413,57 +571,59 @@ class ADAPTIVE_RAG:
         try:
             # Check for index.faiss in the faiss_index subdirectory
             faiss_index_file = os.path.join(self.vectorstore_dir, "faiss_index", "index.faiss")
+            self._open_doc_store()
+            index_meta = self._read_index_meta()
+            # Directories are keyed by model, so this catches indexes built before that: with another
+            # RAG_GEMINI_EMBEDDING_MODEL, or with no recorded embedder at all (every index from before
+            # the embedding model was recorded). The rebuild swaps files in atomically.
+            built_with = index_meta.get("embedding")
+            current = self.embd.describe()
+            if not built_with or built_with.get("backend") != current["backend"] or built_with.get("model") != current["model"]:
+                raise ValueError(f"Index was built with {built_with or 'an unrecorded embedder'}, current embeddings are {current}")
             if os.path.exists(faiss_index_file):
-                self.faiss_vectorstore = FAISS.load_local(
-                    self.faiss_index_path, 
-                    self.embd,
-                    allow_dangerous_deserialization=True
-                )
-                print("FAISS vectorstore loaded using native method.")
+                # The index file is memory-mapped read-only, so workers loading the same cache
+                # share its pages; hits resolve from the doc store instead of an unpickled copy.
+                if (index_meta.get("vector_index") or {}).get("docstore") == "doc_store":
+                    self.faiss_vectorstore, self.vector_index_memory = load_vectorstore(
+                        self.faiss_index_path, self.embd,
+                        docstore=SQLiteDocstore(self.doc_store)
+                    )
+                else:
+                    self.faiss_vectorstore, self.vector_index_memory = load_vectorstore(self.faiss_index_path, self.embd)
+                print(f"FAISS vectorstore loaded ({'memory-mapped' if self.vector_index_memory['mmap'] else 'in memory'}, "
+                      f"{self.vector_index_memory['file_mb']:.1f} MB).")
             elif os.path.exists(self.faiss_pkl_path):
                 with open(self.faiss_pkl_path, 'rb') as f:
                     self.faiss_vectorstore = pickle.load(f)
                 print("FAISS vectorstore loaded from pickle backup.")
             else:
                 raise FileNotFoundError("No FAISS vectorstore found")
-                
-            self.faiss_retriever = self.faiss_vectorstore.as_retriever(search_kwargs={"k": min(self.k, 3)})
+            # Last line of defence: query vectors must have the index's dimension.
+            store_dim = getattr(getattr(self.embd, "store", None), "dim", None)
+            if store_dim and self.faiss_vectorstore.index.d != store_dim:
+                raise ValueError(f"Index dimension {self.faiss_vectorstore.index.d} does not match embedding dimension {store_dim}")
             
-            with open(self.bm25_index_path, 'rb') as f:
-                self.bm25_retriever = pickle.load(f)
+            self.faiss_retriever = self.faiss_vectorstore.as_retriever(search_kwargs={"k": min(self.k, 3)})
             
-            if os.path.exists(self.doc_splits_path):
-                with open(self.doc_splits_path, 'rb') as f:
-                    self.doc_splits = pickle.load(f)
+            self.bm25_retriever = self._load_bm25_retriever()
             
             print("Existing retrievers loaded successfully.")
         except Exception as e:
             print(f"Error loading existing retrievers: {e}")
-            self.documents, self.questions, self.translations = self.load_documents.load_documents()
-            self.text_splitter = SemanticChunker(self.embd)
-            self.doc_splits = self.text_splitter.split_documents(self.documents)
-            
-            doc_texts = [doc.page_content for doc in self.doc_splits]
-            
-            self.bm25_retriever = BM25Retriever.from_texts(
-                doc_texts, 
-                metadatas=[doc.metadata for doc in self.doc_splits]
-            )
-            self.bm25_retriever.k = min(self.k, 3)
-            
-            self.faiss_vectorstore = FAISS.from_documents(
-                documents=self.doc_splits,
-                embedding=self.embd
-            )
-            self.faiss_retriever = self.faiss_vectorstore.as_retriever(search_kwargs={"k": min(self.k, 3)})
-            
-            self._save_retrievers()
+            if getattr(self, "doc_store", None) is not None:
+                self.doc_store.close()
+            self._index_documents()
     
     def save_vectorstore_manually(self):
         self._save_retrievers()
         
     def clear_vectorstore_cache(self):
         import shutil
+        if getattr(self, "doc_store", None) is not None:
+            self.doc_store.close()
+        if self.index_version:
+            retrieval_cache.invalidate(self.index_version)
+            self.index_version = None
         if os.path.exists(self.vectorstore_dir):
             shutil.rmtree(self.vectorstore_dir)
             print("Vectorstore cache cleared.")
@@ -474,8 +634,12 @@ class ADAPTIVE_RAG:
         faiss_index_file = os.path.join(self.vectorstore_dir, "faiss_index", "index.faiss")
         info = {
             "faiss_exists": os.path.exists(faiss_index_file) or os.path.exists(self.faiss_pkl_path),
-            "bm25_exists": os.path.exists(self.bm25_index_path),
-            "doc_splits_exists": os.path.exists(self.doc_splits_path),
+            "bm25_exists": SparseBM25Index.exists(self.bm25_index_dir),
+            "doc_store_exists": DocumentStore.exists(self.doc_store_path),
+            "embedding": self.embd.describe(),
+            "vector_index_type": describe_index(self.faiss_vectorstore.index) if hasattr(self, "faiss_vectorstore") else None,
+            # Current mapped/resident MB of the index file in this process (empty when not mapped).
+            "vector_index_memory": mapped_memory(path=os.path.join(self.faiss_index_path, "index.faiss")),
             "vectorstore_dir": self.vectorstore_dir,
             "num_documents": len(self.doc_splits) if hasattr(self, 'doc_splits') else 0
         }
@@ -483,12 +647,125 @@ class ADAPTIVE_RAG:
         
     def retrieve(self, state):
         question = state["question"]
-        documents = self.compression_retriever.invoke(question)   
-        return {"documents": documents, "question": question}
+        # The first retrieve starts the query's time budget; transform_query loops keep it.
+        started_at = state.get("started_at") or time.time()
+        query_variants = state.get("query_variants") or []
+        if len(query_variants) > 1:
+            # After transform_query every reformulation so far is retrieved in one fused pass.
+            result = self.multi_retrieve(query_variants)
+            return {"documents": result["documents"], "question": question, "started_at": started_at,
+                    "retrieval_diagnostics": result["variants"]}
+        cached = retrieval_cache.get(self.index_version, question, self.k) if self.index_version else None
+        if cached is not None:
+            print("---RETRIEVE: cache hit---")
+            return {"documents": self._materialize_cached(cached), "question": question, "started_at": started_at}
+        
+        documents = self.compression_retriever.invoke(question)
+        doc_ids = [doc.metadata.get("doc_id") for doc in documents]
+        # FAISS indexes built before doc_id was stored cannot be mapped back; skip caching those.
+        if self.index_version and all(doc_id is not None for doc_id in doc_ids):
+            retrieval_cache.put(
+                self.index_version, question, self.k,
+                [(doc_id, doc.metadata.get("relevance_score")) for doc_id, doc in zip(doc_ids, documents)]
+            )
+        return {"documents": documents, "question": question, "started_at": started_at}
+    
+    def _materialize_cached(self, cached):
+        documents = self.doc_store.get([doc_id for doc_id, _ in cached])
+        scores = dict(cached)
+        for doc in documents:
+            if scores.get(doc.metadata["doc_id"]) is not None:
+                doc.metadata["relevance_score"] = scores[doc.metadata["doc_id"]]
+        return documents
+    def _vector_search_batch(self, vectors, k):
+        """Search the FAISS index for all query vectors at once; returns one hit list per vector."""
+        store = self.faiss_vectorstore
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if getattr(store, "_normalize_L2", False):
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        _, positions = store.index.search(vectors, k)
+        results = []
+        for row in positions:
+            hits = []
+            for position in row:
+                if position == -1:
+                    continue
+                doc = store.docstore.search(store.index_to_docstore_id[int(position)])
+                if isinstance(doc, Document):
+                    hits.append(doc)
+            results.append(hits)
+        return results
+    
+    @staticmethod
+    def _fusion_key(doc):
+        # Chunks from indexes built before doc_id was stored are fused by their text.
+        doc_id = doc.metadata.get("doc_id")
+        return doc_id if doc_id is not None else doc.page_content
+    
+    def multi_retrieve(self, queries, k=None, rerank=True):
+        """
+        Retrieve for several query variants in one pass: the variants are embedded in one batch,
+        FAISS is searched for all of them together, each is scored against the sparse BM25 index,
+        and the ranked lists are merged with reciprocal rank fusion. With rerank the fused list is
+        reranked against the first query. Returns the documents and per-variant diagnostics.
+        """
+        start_time = time.time()
+        queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+        if not queries:
+            return {"documents": [], "variants": [], "elapsed": 0.0}
+        k = k or self.k
+        
+        vector_hits = self._vector_search_batch(self.embd.embed_documents(queries), k)
+        sparse_index = self.bm25_retriever.index
+        
+        fused_scores, docs_by_key, variant_keys = {}, {}, []
+        for query, vector_docs in zip(queries, vector_hits):
+            sparse_ids = sparse_index.top_k(query, k)
+            ranked_lists = [[self._fusion_key(doc) for doc in vector_docs], sparse_ids]
+            for doc in vector_docs:
+                docs_by_key.setdefault(self._fusion_key(doc), doc)
+            for ranked in ranked_lists:
+                for rank, key in enumerate(ranked):
+                    fused_scores[key] = fused_scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            variant_keys.append((query, ranked_lists))
+        
+        top_keys = sorted(fused_scores, key=fused_scores.get, reverse=True)[:k]
+        # Sparse-only hits and vector hits are both materialized from the doc store by id.
+        stored = {doc.metadata["doc_id"]: doc for doc in self.doc_store.get([key for key in top_keys if isinstance(key, int)])}
+        documents = []
+        for key in top_keys:
+            doc = stored.get(key)
+            if doc is None and key in docs_by_key:
+                # Copy so the fusion score is not written into FAISS's own docstore entry.
+                doc = Document(page_content=docs_by_key[key].page_content, metadata=dict(docs_by_key[key].metadata))
+            if doc is not None:
+                doc.metadata["rrf_score"] = fused_scores[key]
+                documents.append(doc)
+        
+        if rerank and len(documents) > 1:
+            documents = list(self.compressor.compress_documents(documents, queries[0]))
+        
+        selected = {self._fusion_key(doc) for doc in documents}
+        variants = []
+        for query, (vector_keys, sparse_ids) in variant_keys:
+            hits = set(vector_keys) | set(sparse_ids)
+            others = set().union(*[set(v) | set(s) for q, (v, s) in variant_keys if q != query])
+            variants.append({
+                "query": query,
+                "vector_hits": len(vector_keys),
+                "sparse_hits": len(sparse_ids),
+                "selected": len(hits & selected),
+                "unique_hits": len(hits - others)
+            })
+        elapsed = time.time() - start_time
+        print(f"---MULTI RETRIEVE: {len(queries)} variant(s), {len(fused_scores)} fused candidates, "
+              f"{len(documents)} kept in {elapsed:.2f}s---")
+        return {"documents": documents, "variants": variants, "elapsed": elapsed}
+    
     def abstraction(self, state):
         content = state["documents"]
-        abstractor = Abstractor(self.model)
-        extractions = abstractor.abstract(content)
+        with agent_pool.agent(Abstractor, self.model) as abstractor:
+            extractions = abstractor.abstract(content)
         print("extracted info: ", extractions)
         return {"documents": content, "question": state["question"], "extractions": extractions}
     def generate(self, state):
@@ -519,35 +796,80 @@ class ADAPTIVE_RAG:
             
         return {"documents": documents, "question": question, "generation": generation}
         
+    def _prefilter_documents(self, question, documents):
+        """Keep documents whose embedding similarity to the question clears the prefilter threshold."""
+        if not documents:
+            return []
+        model = load_sentence_model()
+        embeddings = model.encode(
+            [question] + [d.page_content for d in documents],
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        similarities = embeddings[1:] @ embeddings[0]
+        return [d for d, similarity in zip(documents, similarities) if similarity >= self.grade_prefilter_threshold]
+    
+    def _grade_concurrently(self, question, documents):
+        """Fallback when the batch call fails: one Grader per document on a bounded pool."""
+        def grade(document):
+            with agent_pool.agent(Grader, self.model, llm_cache=semantic_llm_cache) as grader:
+                return grader.grade_documents(question, document.page_content)
+        with ThreadPoolExecutor(max_workers=min(len(documents), 4)) as executor:
+            return list(executor.map(grade, documents))
+    
     def grade_documents(self, state):
         question = state["question"]
-        print("quest")
         documents = state["documents"]
-        filtered_docs = []
         
-        top_docs = documents[:3] if len(documents) > 3 else documents
+        top_docs = documents[:self.max_graded_documents]
+        try:
+            candidates = self._prefilter_documents(question, top_docs)
+        except Exception as e:
+            print(f"Warning: Embedding prefilter failed, grading all documents: {e}")
+            candidates = list(top_docs)
         
-        for d in top_docs:
-            if len(filtered_docs) >= 2:  # Early stopping - we have enough good docs
-                break
-            grader = Grader(self.model)
-            grade = grader.grade_documents(question, d.page_content)
-            if grade == "yes":
-                filtered_docs.append(d)
-                
-        return {"documents": filtered_docs, "question": question}
+        llm_calls = 0
+        if candidates:
+            try:
+                with agent_pool.agent(BatchGrader, self.model, llm_cache=semantic_llm_cache) as batch_grader:
+                    grades = batch_grader.grade_documents(question, [d.page_content for d in candidates])
+                llm_calls = 1
+            except Exception as e:
+                print(f"Warning: Batch grading failed, grading documents concurrently: {e}")
+                grades = self._grade_concurrently(question, candidates)
+                llm_calls = 1 + len(candidates)
+        else:
+            grades = []
+        
+        filtered_docs = [d for d, grade in zip(candidates, grades) if grade == "yes"][:self.max_relevant_documents]
+        
+        grading_stats = {
+            "retrieved": len(documents),
+            "prefiltered_out": len(top_docs) - len(candidates),
+            "graded": len(candidates),
+            "relevant": len(filtered_docs),
+            "llm_calls": llm_calls,
+            # Previously every graded document cost its own Gemini call.
+            "llm_calls_saved": max(len(top_docs) - llm_calls, 0)
+        }
+        print(f"---GRADE DOCUMENTS: {grading_stats['relevant']}/{len(top_docs)} relevant, "
+              f"{grading_stats['prefiltered_out']} prefiltered, {llm_calls} LLM call(s), "
+              f"{grading_stats['llm_calls_saved']} saved---")
+        return {"documents": filtered_docs, "question": question, "grading_stats": grading_stats}
         
     def transform_query(self, state):
         question = state["question"]
         documents = state["documents"]
-        questionRewriter = QuestionRewriter(self.model)
-        better_question = questionRewriter.re_write_question(question)
-        return {"documents": documents, "question": better_question}
+        with agent_pool.agent(QuestionRewriter, self.model) as questionRewriter:
+            better_question = questionRewriter.re_write_question(question)
+        # Newest reformulation first: multi_retrieve reranks against the first variant.
+        query_variants = [better_question] + (state.get("query_variants") or [question])
+        return {"documents": documents, "question": better_question, "query_variants": query_variants}
         
     def web_search(self, state):
         question = state["question"]
-        search = Search(self.k)
-        docs = search.web_search(question)
+        with agent_pool.agent(Search, self.k, search_cache=web_search_cache) as search:
+            docs = search.web_search(question)
         return {"documents": docs, "question": question}
         
     def decide_to_generate(self, state):
@@ -559,27 +881,134 @@ class ADAPTIVE_RAG:
         else:
             return "generate"
             
+    def _grade_hallucination(self, documents, generation):
+        with agent_pool.agent(HallucinationGrader, self.model, llm_cache=semantic_llm_cache) as grader:
+            return grader.grade_hallucinations(documents, generation)
+    
+    def _grade_answer(self, question, generation):
+        with agent_pool.agent(AnswerGrader, self.model, llm_cache=semantic_llm_cache) as grader:
+            return grader.grade_answer(question, generation)
+    
+    def grade_generation(self, question, documents, generation):
+        """
+        Run the hallucination and answer graders concurrently. The first 'no' decides and the
+        other grader is abandoned; a grader error counts as 'no'. Returns the grades (None for
+        a grader that did not finish), the decision and which grader made it.
+        """
+        start_time = time.time()
+        futures = {
+            _generation_grading_executor.submit(self._grade_hallucination, documents, generation): "hallucination",
+            _generation_grading_executor.submit(self._grade_answer, question, generation): "answer",
+        }
+        grades = {"hallucination": None, "answer": None}
+        decided_by = "both"
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                grader_name = futures[future]
+                try:
+                    grades[grader_name] = future.result()
+                except Exception as e:
+                    print(f"Error during {grader_name} grading: {e}")
+                    grades[grader_name] = "no"
+            failed = [name for name in ("hallucination", "answer") if grades[name] not in (None, "yes")]
+            if failed:
+                decided_by = failed[0]
+                for future in pending:
+                    future.cancel()
+                break
+        
+        if grades["hallucination"] not in (None, "yes"):
+            decision = "not supported"
+        elif grades["answer"] not in (None, "yes"):
+            decision = "not useful"
+        else:
+            decision = "useful"
+        
+        self.last_generation_grade = {
+            "hallucination_grade": grades["hallucination"],
+            "answer_grade": grades["answer"],
+            "decision": decision,
+            "decided_by": decided_by,
+            "elapsed": time.time() - start_time
+        }
+        return self.last_generation_grade
+    
+    @staticmethod
+    def _candidate_score(grade):
+        """Groundedness weighs more than usefulness; a grader that did not finish counts half."""
+        def value(g):
+            return 0.5 if g is None else float(g == "yes")
+        return 0.6 * value(grade["hallucination_grade"]) + 0.4 * value(grade["answer_grade"])
+    
     def grade_generation_v_documents_and_question(self, state):
+        """Graph node: grade the latest generation and record it as a scored candidate."""
         question = state["question"]
         documents = state["documents"]
         generation = state["generation"]
-        print("---CHECK HALLUCINATIONS---")
-        hallucinationGrader = HallucinationGrader(self.model)
-        grade = hallucinationGrader.grade_hallucinations(documents, generation)
-        if grade == "yes":
-            print("---DECISION: GENERATION IS GROUNDED IN DOCUMENTS---")
-            print("---GRADE GENERATION vs QUESTION---")
-            answerGrader = AnswerGrader(self.model)
-            grade = answerGrader.grade_answer(question, generation)
-            if grade == "yes":
-                print("---DECISION: GENERATION ADDRESSES QUESTION---")
-                return "useful"
-            else:
-                print("---DECISION: GENERATION DOES NOT ADDRESS QUESTION---")
-                return "not useful"
+        print("---CHECK HALLUCINATIONS AND ANSWER QUALITY---")
+        result = self.grade_generation(question, documents, generation)
+        if result["decision"] == "useful":
+            print("---DECISION: GENERATION IS GROUNDED AND ADDRESSES QUESTION---")
+        elif result["decision"] == "not useful":
+            print(f"---DECISION: GENERATION DOES NOT ADDRESS QUESTION (decided by {result['decided_by']} grader)---")
         else:
-            pprint("---DECISION: GENERATION IS NOT GROUNDED IN DOCUMENTS, RE-TRY---")
+            pprint(f"---DECISION: GENERATION IS NOT GROUNDED IN DOCUMENTS (decided by {result['decided_by']} grader)---")
+        
+        attempts = state.get("attempts", 0) + 1
+        candidate = {
+            "attempt": attempts,
+            "question": question,
+            "generation": generation,
+            "documents": documents,
+            "extractions": state.get("extractions"),
+            "score": self._candidate_score(result),
+            **result
+        }
+        return {
+            "candidates": (state.get("candidates") or []) + [candidate],
+            "attempts": attempts,
+            "grader_passed": result["decision"] == "useful"
+        }
+    
+    def _budget_exhausted(self, state):
+        elapsed = time.time() - (state.get("started_at") or time.time())
+        return state.get("attempts", 0) >= self.max_attempts or elapsed >= self.time_budget
+    
+    def decide_after_generation_grade(self, state):
+        """Accept a useful generation, retry with a rewritten query while the budget allows, else pick the best."""
+        decision = state["candidates"][-1]["decision"]
+        if decision == "useful":
+            return "useful"
+        if self._budget_exhausted(state):
+            print(f"---BUDGET EXHAUSTED after {state.get('attempts', 0)} attempt(s), selecting best candidate---")
+            return "budget exhausted"
+        return "retry"
+    
+    def select_best_candidate(self, state):
+        """Return the highest-scoring candidate so far (earliest on ties) with its scores."""
+        candidates = state.get("candidates") or []
+        best = max(candidates, key=lambda c: c["score"]) if candidates else None
+        if best is None:
+            return {"generation": state.get("generation"), "question": state["question"], "documents": state.get("documents", [])}
+        print(f"---BEST CANDIDATE: attempt {best['attempt']} with score {best['score']:.2f}---")
+        return {
+            "generation": best["generation"],
+            "question": best["question"],
+            "documents": best["documents"],
+            "extractions": best["extractions"],
+            "best_candidate": {key: value for key, value in best.items() if key not in ("documents", "extractions")},
+            "workflow_type": "moderate",
+            "grader_passed": False
+        }
+    
+    def decide_after_best_candidate(self, state):
+        """An ungrounded best candidate still goes to the introspective agent."""
+        best = state.get("best_candidate")
+        if best is not None and best["hallucination_grade"] == "no":
             return "not supported"
+        return "accept"
         
     def introspective_agent_response(self, state):
         question = state["question"]
@@ -590,51 +1019,29 @@ class ADAPTIVE_RAG:
             This is the question given by the user : {question}
             These are the most relevant retrieved documents : {retrieved_docs[0]} 
         """
-        response = self.introspective_agent.introspect_and_respond(final_prompt)
-        return {"generation": str(response), "question": question, "extractions": extracted_info, "documents": retrieved_docs}
+        with agent_pool.agent(IntrospectiveAgent, self.model) as introspective_agent:
+            response = introspective_agent.introspect_and_respond(final_prompt)
+        return {"generation": str(response), "question": question, "extractions": extracted_info, "documents": retrieved_docs,
+                "grader_passed": False}
         
-    def track_recursion_and_retrieve(self, state):
-        """
-        Track the number of recursions when going to 'transform_query'.
-        End the workflow if the recursion limit (2) is reached.
-        """
-        if not hasattr(self, "recursion_counter"):
-            self.recursion_counter = 0
-        if self.recursion_counter < 2:
-            self.recursion_counter += 1
-            return "retrieve"
-        else:
-            return "end_due_to_limit"
-
-    def end_due_to_limit(self, state):
-        """
-        End the workflow because the recursion limit was reached.
-        """
-        print("Recursion limit reached. Ending workflow.")
-        return END
-
     # === COMPLEXITY ANALYSIS METHODS ===
     
     def analyze_query_complexity(self, state):
         question = state["question"]
         documents = state["documents"]
-        
-        length_score = self._calculate_length_complexity(question)
-        linguistic_score = self._calculate_linguistic_complexity(question)
-        semantic_score = self._calculate_semantic_complexity(question)
-        structure_score = self._calculate_structural_complexity(question)
-        domain_score = self._calculate_domain_complexity(question)
-        intent_score = self._calculate_intent_complexity(question)
+        classification = state.get("classification")
+        
+        # The request-level classification already carries the query features; only a
+        # rewritten question (transform_query) needs them recomputed.
+        if classification is not None and classification.question == question:
+            complexity_vector = classification.complexity_vector
+            total_complexity = classification.total_complexity
+            normalized_complexity = classification.complexity
+        else:
+            complexity_vector, total_complexity, normalized_complexity = compute_query_complexity(question)
         
         doc_quality_score = self._calculate_document_quality(question, documents)
         
-        complexity_vector = np.array([length_score, linguistic_score, semantic_score, 
-                                    structure_score, domain_score, intent_score])
-        weights = np.array([0.1, 0.25, 0.2, 0.15, 0.15, 0.15])
-        
-        total_complexity = np.dot(complexity_vector, weights)
-        normalized_complexity = 1 / (1 + math.exp(-2 * (total_complexity - 2.5)))
-        
         print(f"Complexity scores: {complexity_vector}")
         print(f"Total complexity: {total_complexity:.3f}")
         print(f"Normalized complexity: {normalized_complexity:.3f}")
@@ -642,174 +1049,6 @@ class ADAPTIVE_RAG:
         
         return self._route_decision(normalized_complexity, doc_quality_score, question)
     
-    def _calculate_length_complexity(self, question):
-        words = question.split()
-        word_count = len(words)
-        char_count = len(question)
-        
-        length_factor = math.log(1 + word_count) / math.log(20)
-        avg_word_length = char_count / max(word_count, 1)
-        complexity_factor = math.tanh((avg_word_length - 4) / 2)
-        
-        return min(length_factor + complexity_factor, 1.0)
-    
-    def _calculate_structural_complexity(self, question):
-        clause_indicators = [',', ';', ':', ' and ', ' or ', ' but ', ' however ', ' therefore ']
-        clause_density = sum(question.lower().count(indicator) for indicator in clause_indicators) / len(question)
-        
-        question_marks = question.count('?')
-        parentheses = (question.count('(') + question.count(')')) / 2
-        quotes = (question.count('"') + question.count("'")) / 2
-        
-        structural_features = np.array([clause_density * 100, question_marks, parentheses, quotes])
-        feature_weights = np.array([0.4, 0.3, 0.15, 0.15])
-        
-        weighted_score = np.dot(structural_features, feature_weights)
-        return math.tanh(weighted_score / 2)
-    
-    def _calculate_linguistic_complexity(self, question):
-        question_lower = question.lower()
-        
-        high_complexity_patterns = [
-            r'\bexplain\b', r'\banalyze\b', r'\bevaluate\b', r'\bassess\b',
-            r'\bdiscuss\b', r'\bexamine\b', r'\bcritique\b', r'\bjustify\b',
-            r'\bdemonstrate\b', r'\bsynthesize\b', r'\binterpret\b'
-        ]
-        
-        medium_complexity_patterns = [
-            r'\bhow\b', r'\bwhy\b', r'\bcompare\b', r'\bcontrast\b',
-            r'\bdescribe\b', r'\bidentify\b', r'\bsummarize\b'
-        ]
-        
-        simple_patterns = [
-            r'\bwhat\b', r'\bwhen\b', r'\bwhere\b', r'\bwho\b', r'\bwhich\b'
-        ]
-        
-        high_matches = sum(1 for pattern in high_complexity_patterns if re.search(pattern, question_lower))
-        medium_matches = sum(1 for pattern in medium_complexity_patterns if re.search(pattern, question_lower))
-        simple_matches = sum(1 for pattern in simple_patterns if re.search(pattern, question_lower))
-        
-        complexity_score = (high_matches * 3 + medium_matches * 2 - simple_matches * 0.5)
-        
-        conditional_words = ['if', 'suppose', 'assuming', 'given that', 'provided that']
-        conditional_boost = sum(1 for word in conditional_words if word in question_lower) * 0.5
-        
-        comparative_patterns = [r'\bmore\b', r'\bless\b', r'\bbetter\b', r'\bworse\b', r'\bmost\b', r'\bleast\b']
-        comparative_boost = sum(1 for pattern in comparative_patterns if re.search(pattern, question_lower)) * 0.3
-        
-        total_score = complexity_score + conditional_boost + comparative_boost
-        return 1 / (1 + math.exp(-total_score + 1))
-    
-    def _calculate_domain_complexity(self, question):
-        question_lower = question.lower()
-        
-        agriculture_domains = {
-            'crop_science': ['crop', 'cultivation', 'planting', 'harvest', 'yield', 'seeds', 'germination'],
-            'soil_science': ['soil', 'fertility', 'nutrients', 'nitrogen', 'phosphorus', 'potassium', 'ph'],
-            'pest_management': ['pest', 'disease', 'insect', 'fungus', 'virus', 'bacteria', 'weed'],
-            'water_management': ['irrigation', 'water', 'drought', 'rainfall', 'precipitation'],
-            'climate_weather': ['climate', 'weather', 'temperature', 'humidity', 'frost'],
-            'technology_precision': ['precision agriculture', 'gps', 'remote sensing', 'drones', 'sensors'],
-            'economics_policy': ['subsidy', 'market', 'price', 'cost', 'profit', 'economics'],
-            'livestock_animal': ['livestock', 'cattle', 'dairy', 'poultry', 'pig', 'sheep'],
-            'post_harvest': ['storage', 'processing', 'packaging', 'transportation']
-        }
-        
-        domain_weights = {
-            'technology_precision': 3.0, 'soil_science': 2.5, 'pest_management': 2.5,
-            'climate_weather': 2.0, 'water_management': 2.0, 'economics_policy': 2.0,
-            'crop_science': 1.5, 'livestock_animal': 1.5, 'post_harvest': 1.5
-        }
-        
-        domain_scores = []
-        for domain, terms in agriculture_domains.items():
-            matches = sum(1 for term in terms if term in question_lower)
-            if matches > 0:
-                weight = domain_weights.get(domain, 1.0)
-                score = math.log(1 + matches) * weight
-                domain_scores.append(score)
-        
-        if not domain_scores:
-            return 0.0
-            
-        max_score = max(domain_scores)
-        diversity_penalty = len(domain_scores) / len(agriculture_domains)
-        
-        technical_terms = ['agroecology', 'biotechnology', 'genomics', 'phenotyping', 'bioinformatics']
-        tech_boost = sum(1 for term in technical_terms if term in question_lower) * 0.5
-        
-        total_score = max_score + diversity_penalty + tech_boost
-        return math.tanh(total_score / 3)
-    
-    def _calculate_semantic_complexity(self, question):
-        question_lower = question.lower()
-        words = question.split()
-        
-        technical_indicators = [
-            'physiological', 'biochemical', 'molecular', 'cellular', 'genetic',
-            'morphological', 'phenotypic', 'genotypic', 'metabolic', 'enzymatic'
-        ]
-        
-        tech_density = sum(1 for term in technical_indicators if term in question_lower) / len(words)
-        
-        measurement_patterns = [
-            r'\d+\s*(kg|ton|hectare|acre|liter|ml|ppm|ph|°c|°f)',
-            r'\d+%\s*(moisture|protein|fat|fiber)',
-            r'\d+\s*(days|weeks|months)\s*(after|before)'
-        ]
-        
-        measurement_count = sum(1 for pattern in measurement_patterns if re.search(pattern, question_lower))
-        measurement_factor = math.log(1 + measurement_count)
-        
-        proper_nouns = sum(1 for word in words if word[0].isupper() and len(word) > 3)
-        entity_density = proper_nouns / len(words)
-        
-        concept_separators = ['crop and soil', 'pest and disease', 'irrigation and fertilization']
-        concept_complexity = sum(1 for sep in concept_separators if sep in question_lower)
-        
-        feature_vector = np.array([tech_density * 10, measurement_factor, entity_density * 10, concept_complexity])
-        weights = np.array([0.4, 0.2, 0.2, 0.2])
-        
-        semantic_score = np.dot(feature_vector, weights)
-        return math.tanh(semantic_score)
-    
-    def _calculate_intent_complexity(self, question):
-        question_lower = question.lower()
-        
-        intent_patterns = {
-            'diagnostic': [r'diagnose\b', r'identify.*problem\b', r'symptoms\b', r'deficiency\b'],
-            'optimization': [r'optimize\b', r'maximize.*yield\b', r'improve.*productivity\b'],
-            'planning': [r'plan.*cultivation\b', r'schedule.*planting\b', r'timing\b'],
-            'comparative': [r'compare.*varieties\b', r'best.*cultivar\b', r'versus\b'],
-            'predictive': [r'predict.*yield\b', r'forecast.*weather\b', r'estimate.*production\b'],
-            'management': [r'manage\b', r'control\b', r'prevent\b', r'strategy\b']
-        }
-        
-        intent_weights = {
-            'diagnostic': 3.0, 'optimization': 2.8, 'predictive': 2.5,
-            'planning': 2.0, 'management': 1.8, 'comparative': 1.5
-        }
-        
-        intent_scores = []
-        for intent_type, patterns in intent_patterns.items():
-            matches = sum(1 for pattern in patterns if re.search(pattern, question_lower))
-            if matches > 0:
-                weight = intent_weights.get(intent_type, 1.0)
-                score = math.log(1 + matches) * weight
-                intent_scores.append(score)
-        
-        if not intent_scores:
-            return 0.0
-            
-        max_intent_score = max(intent_scores)
-        
-        process_words = ['preparation', 'planting', 'maintenance', 'harvesting', 'post-harvest']
-        process_complexity = sum(1 for word in process_words if word in question_lower)
-        process_factor = math.sqrt(process_complexity) * 0.3
-        
-        total_score = max_intent_score + process_factor
-        return math.tanh(total_score / 3)
-    
     def _calculate_document_quality(self, question, documents):
         if not documents:
             return 0.0
@@ -873,6 +1112,11 @@ class ADAPTIVE_RAG:
     # === ADAPTIVE WORKFLOW HANDLERS ===
     
     def adaptive_router(self, state):
+        # Retries stay on the graded moderate path, so their generations reach grade_generation
+        # and the candidate/budget logic instead of ending ungraded on the simple or complex path.
+        if state.get("attempts", 0) > 0:
+            print("---RETRY: MODERATE PATH---")
+            return "moderate_path"
         complexity_level = self.analyze_query_complexity(state)
         
         if complexity_level == "simple_fast":
@@ -916,10 +1160,10 @@ class ADAPTIVE_RAG:
         question = state["question"]
 
         # Step 1: Web search for additional context
-        search = Search(self.k)
         try:
             # The Search agent's web_search returns a string summary, not a list of Document objects.
-            web_search_result = search.web_search(question)
+            with agent_pool.agent(Search, self.k, search_cache=web_search_cache) as search:
+                web_search_result = search.web_search(question)
             # Wrap the result in a Document object for consistency
             from langchain_core.documents import Document
             if web_search_result and isinstance(web_search_result, str):
@@ -935,11 +1179,23 @@ class ADAPTIVE_RAG:
         # Step 2: Combine retrieved docs with web search results
         docs_list = state["documents"] if isinstance(state["documents"], list) else [state["documents"]]
         docs_list = [doc for doc in docs_list if doc and hasattr(doc, "page_content") and doc.page_content]
+        
+        # Compound questions: retrieve for every sub-question in one fused pass.
+        retrieval_diagnostics = state.get("retrieval_diagnostics")
+        sub_questions = split_sub_questions(question)
+        if sub_questions:
+            try:
+                result = self.multi_retrieve([question] + sub_questions)
+                seen = {self._fusion_key(doc) for doc in docs_list}
+                docs_list += [doc for doc in result["documents"] if self._fusion_key(doc) not in seen]
+                retrieval_diagnostics = result["variants"]
+            except Exception as e:
+                print(f"Error during multi-query retrieval: {e}")
         combined_docs = docs_list + web_docs[:3]  # Add up to 3 web results
 
-        abstractor = Abstractor(self.model)
         try:
-            extractions = abstractor.abstract(combined_docs)
+            with agent_pool.agent(Abstractor, self.model) as abstractor:
+                extractions = abstractor.abstract(combined_docs)
         except Exception as e:
             print(f"Error during abstraction: {e}")
             extractions = ""
@@ -951,7 +1207,7 @@ class ADAPTIVE_RAG:
         Use all provided context including web search results and extracted information.
 
         Question: {question}
-        Retrieved Documents: {docs_list[:2]}
+        Retrieved Documents: {docs_list[:2 + len(sub_questions)]}
         Web Search Results: {web_docs[:2] if web_docs else "None"}
         Extracted Key Information: {extractions}
         Chat History: {self.chat_memory}
@@ -965,24 +1221,16 @@ class ADAPTIVE_RAG:
             print(f"Error during LLM generation: {e}")
             initial_generation = "Error generating answer."
 
-        hallucinationGrader = HallucinationGrader(self.model)
-        try:
-            hallucination_grade = hallucinationGrader.grade_hallucinations(combined_docs, initial_generation)
-        except Exception as e:
-            print(f"Error during hallucination grading: {e}")
-            hallucination_grade = "no"
-
-        answerGrader = AnswerGrader(self.model)
-        try:
-            answer_grade = answerGrader.grade_answer(question, initial_generation)
-        except Exception as e:
-            print(f"Error during answer grading: {e}")
-            answer_grade = "no"
+        generation_grade = self.grade_generation(question, combined_docs, initial_generation)
+        # A grader abandoned by the short-circuit reports "not checked" to the introspective prompt.
+        hallucination_grade = generation_grade["hallucination_grade"] or "not checked"
+        answer_grade = generation_grade["answer_grade"] or "not checked"
 
         print(f"Initial generation grading - Hallucination: {hallucination_grade}, Answer quality: {answer_grade}")
 
-        if hallucination_grade == "no" or answer_grade == "no":
-            print("---USING INTROSPECTIVE AGENT FOR COMPLEX QUERY---")
+        needs_introspection = generation_grade["decision"] != "useful"
+        if needs_introspection:
+            print(f"---USING INTROSPECTIVE AGENT FOR COMPLEX QUERY (decided by {generation_grade['decided_by']} grader)---")
 
             introspective_prompt = f"""
             This is a complex agricultural question that requires careful analysis: {question}
@@ -1002,7 +1250,8 @@ class ADAPTIVE_RAG:
             """
 
             try:
-                introspective_response = self.introspective_agent.introspect_and_respond(introspective_prompt)
+                with agent_pool.agent(IntrospectiveAgent, self.model) as introspective_agent:
+                    introspective_response = introspective_agent.introspect_and_respond(introspective_prompt)
                 final_generation = str(introspective_response)
             except Exception as e:
                 print(f"Error during introspective agent response: {e}")
@@ -1023,5 +1272,8 @@ class ADAPTIVE_RAG:
             "extractions": extractions,
             "workflow_type": "complex",
             "initial_generation": initial_generation,
-            "used_introspective_agent": hallucination_grade == "no" or answer_grade == "no"
+            "used_introspective_agent": needs_introspection,
+            "grader_passed": not needs_introspection,
+            "generation_grade": generation_grade,
+            "retrieval_diagnostics": retrieval_diagnostics
         }
\ No newline at end of file
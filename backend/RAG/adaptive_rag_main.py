@@ -9,32 +9,11 @@ os.makedirs(cache_base_dir, exist_ok=True)
 from dotenv import load_dotenv
 from .workflow import Workflow
 import time
-import hashlib
-from gptcache import Cache
-from langchain.globals import set_llm_cache
-from gptcache.manager.factory import manager_factory
-from gptcache.processor.pre import get_prompt
-from langchain_community.cache import GPTCache
+from .llm_cache import install_langchain_cache
 
 load_dotenv()
 
-
-def get_hashed_name(name):
-    return hashlib.sha256(name.encode()).hexdigest()
-
-
-def init_gptcache(cache_obj: Cache, llm: str):
-    hashed_llm = get_hashed_name(llm)
-    cache_dir = os.path.join(cache_base_dir, "llm_cache", f"map_cache_{hashed_llm}")
-    os.makedirs(cache_dir, exist_ok=True)
-    
-    cache_obj.init(
-        pre_embedding_func=get_prompt,
-        data_manager=manager_factory(manager="map", data_dir=cache_dir),
-    )
-
-
-set_llm_cache(GPTCache(init_gptcache))
+install_langchain_cache()
 
   
 def main():
@@ -0,0 +1,132 @@
+"""
+Cost and quality of the embedding-reuse chunker against SemanticChunker + FAISS re-embedding.
+
+Both paths chunk the same sample of documents from a CSV (the largest in RAG/Data/CSV by
+default). Cost is the number of texts sent to the embedding model and wall time; quality is
+chunk-boundary agreement with SemanticChunker and the cosine similarity between each pooled
+chunk embedding and the chunk embedded directly. --backend local uses the sentence-transformer
+model and costs nothing; --backend gemini measures the real API path. Run from backend/:
+    python -m RAG.benchmarks.chunking_benchmark [--file PATH] [--limit N] [--backend local|gemini]
+"""
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+import numpy as np
+from langchain_experimental.text_splitter import SemanticChunker
+
+from RAG.adaptive_rag_class import LoadDocuments, MyEmbeddings
+from RAG.chunking import EmbeddingReuseChunker
+from RAG.document_scorer import load_sentence_model
+
+csv_dir = Path(__file__).resolve().parent.parent / "Data" / "CSV"
+
+
+class LocalEmbeddings:
+    def embed_documents(self, texts):
+        return load_sentence_model().encode(texts, batch_size=64).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class CountingEmbeddings:
+    """Counts the texts each path sends to the embedding model."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.texts = 0
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.texts += len(texts)
+        self.calls += 1
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.texts += 1
+        self.calls += 1
+        return self.embeddings.embed_query(text)
+
+
+def boundaries(chunks_by_source):
+    """Character offsets where chunks end, per source document."""
+    offsets = {}
+    for source, texts in chunks_by_source.items():
+        position, ends = 0, set()
+        for text in texts:
+            position += len(text) + 1
+            ends.add(position)
+        offsets[source] = ends
+    return offsets
+
+
+def group_by_source(documents):
+    grouped = {}
+    for doc in documents:
+        grouped.setdefault(doc.metadata.get("row_index"), []).append(doc.page_content)
+    return grouped
+
+
+def cosine(a, b):
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    return float(a @ b / max(np.linalg.norm(a) * np.linalg.norm(b), 1e-12))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking cost/quality benchmark")
+    parser.add_argument("--file", type=str, default=None)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--backend", choices=["local", "gemini"], default="local")
+    args = parser.parse_args()
+
+    file_path = args.file or str(max(csv_dir.glob("*.csv"), key=lambda path: path.stat().st_size))
+    documents = LoadDocuments(file_path, apply_dedup=False).load_documents()[0][:args.limit]
+    base = LocalEmbeddings() if args.backend == "local" else MyEmbeddings()
+    base.embed_documents(["warm up"])
+
+    # Current path: SemanticChunker embeds sentence windows, FAISS then embeds every chunk.
+    semantic = CountingEmbeddings(base)
+    start_time = time.perf_counter()
+    semantic_chunks = SemanticChunker(semantic).split_documents(documents)
+    direct_embeddings = semantic.embed_documents([doc.page_content for doc in semantic_chunks])
+    semantic_seconds = time.perf_counter() - start_time
+
+    reuse = CountingEmbeddings(base)
+    start_time = time.perf_counter()
+    reuse_chunks, pooled_embeddings = EmbeddingReuseChunker(reuse).split_documents_with_embeddings(documents)
+    reuse_seconds = time.perf_counter() - start_time
+
+    semantic_bounds = boundaries(group_by_source(semantic_chunks))
+    reuse_bounds = boundaries(group_by_source(reuse_chunks))
+    shared = sum(len(semantic_bounds[s] & reuse_bounds.get(s, set())) for s in semantic_bounds)
+    precision = shared / max(sum(len(b) for b in reuse_bounds.values()), 1)
+    recall = shared / max(sum(len(b) for b in semantic_bounds.values()), 1)
+    f1 = 2 * precision * recall / max(precision + recall, 1e-12)
+
+    # Pooled vs. direct embedding of the same chunk text (chunks both paths agree on).
+    direct_by_text = {doc.page_content: emb for doc, emb in zip(semantic_chunks, direct_embeddings)}
+    similarities = [
+        cosine(pooled, direct_by_text[doc.page_content])
+        for doc, pooled in zip(reuse_chunks, pooled_embeddings) if doc.page_content in direct_by_text
+    ]
+
+    print(f"File: {Path(file_path).name}, {len(documents)} documents, backend: {args.backend}")
+    print(f"{'path':<28}{'chunks':>8}{'avg chars':>11}{'texts embedded':>16}{'seconds':>10}")
+    for name, chunks, counter, seconds in (
+        ("SemanticChunker + FAISS", semantic_chunks, semantic, semantic_seconds),
+        ("embedding reuse", reuse_chunks, reuse, reuse_seconds),
+    ):
+        avg_chars = statistics.mean(len(doc.page_content) for doc in chunks) if chunks else 0
+        print(f"{name:<28}{len(chunks):>8}{avg_chars:>11.0f}{counter.texts:>16}{seconds:>10.2f}")
+    print(f"Embedding calls saved: {1 - reuse.texts / max(semantic.texts, 1):.1%}, "
+          f"build time saved: {1 - reuse_seconds / max(semantic_seconds, 1e-9):.1%}")
+    print(f"Boundary agreement: precision {precision:.2%}, recall {recall:.2%}, F1 {f1:.2%}")
+    if similarities:
+        print(f"Pooled vs. direct chunk embedding cosine over {len(similarities)} shared chunks: "
+              f"mean {statistics.mean(similarities):.4f}, min {min(similarities):.4f}")
+
+
+if __name__ == "__main__":
+    main()
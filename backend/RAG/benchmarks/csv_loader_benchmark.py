@@ -0,0 +1,81 @@
+"""
+Throughput of LoadDocuments' CSV path: the chunked, vectorized loader vs. the iterrows loader
+it replaced (kept below as the reference). Both run on the largest CSV in RAG/Data/CSV, or the
+file given, with dedup disabled so they see the same rows. Run from backend/:
+    python -m RAG.benchmarks.csv_loader_benchmark [--file PATH] [--repeat N]
+"""
+import time
+import argparse
+from pathlib import Path
+
+import pandas as pd
+from langchain_core.documents import Document
+
+from RAG.adaptive_rag_class import LoadDocuments
+
+csv_dir = Path(__file__).resolve().parent.parent / "Data" / "CSV"
+
+
+def legacy_load_csv(file_path):
+    df = pd.read_csv(file_path)
+    documents = []
+    questions = []
+    translations = []
+
+    for _, row in df.iterrows():
+        content_parts = []
+        for col in df.columns:
+            val = row[col]
+            if pd.notna(val):
+                if isinstance(val, list):
+                    val_str = ", ".join(str(v) for v in val)
+                else:
+                    val_str = str(val)
+                content_parts.append(f"{col}: {val_str}")
+        content = "\n".join(content_parts)
+        documents.append(Document(
+            page_content=content,
+            metadata={"row_index": row.name, "source": file_path}
+        ))
+        questions.append("General information query")
+        translations.append(content[:200] + "..." if len(content) > 200 else content)
+
+    return documents, questions, translations
+
+
+def best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV loader throughput benchmark")
+    parser.add_argument("--file", type=str, default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    file_path = args.file or str(max(csv_dir.glob("*.csv"), key=lambda path: path.stat().st_size))
+    loader = LoadDocuments(file_path, apply_dedup=False)
+
+    legacy_seconds, (legacy_docs, _, legacy_translations) = best_of(lambda: legacy_load_csv(file_path), args.repeat)
+    current_seconds, (current_docs, _, current_translations) = best_of(loader.load_documents, args.repeat)
+
+    if [d.page_content for d in legacy_docs] != [d.page_content for d in current_docs] or legacy_translations != current_translations:
+        raise AssertionError("Vectorized loader output differs from the iterrows loader")
+
+    rows = len(current_docs)
+    size_mb = Path(file_path).stat().st_size / (1024 * 1024)
+    print(f"File: {Path(file_path).name} ({rows} rows, {size_mb:.2f} MB), identical output")
+    print(f"{'loader':<22}{'seconds':>10}{'rows/s':>12}")
+    print(f"{'iterrows (legacy)':<22}{legacy_seconds:>10.4f}{rows / legacy_seconds:>12.0f}")
+    print(f"{'chunked vectorized':<22}{current_seconds:>10.4f}{rows / current_seconds:>12.0f}")
+    print(f"Speedup: {legacy_seconds / current_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Local embedding runtimes (torch, ONNX, ONNX int8) and optionally the Gemini API.
+
+Chunks come from one CSV via LoadDocuments; queries are the first --queries chunk texts cut to
+a question-like length. Every call bypasses the embedding store, so the numbers are raw model
+cost: single-query p50/p95 latency and batched document throughput. For the local runtimes the
+report also gives the mean cosine to the torch vectors, i.e. what int8 quantization costs in
+fidelity. Run from backend/:
+    python -m RAG.benchmarks.embedding_benchmark [--file PATH] [--limit 500] [--threads N] [--gemini]
+"""
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+import numpy as np
+
+from RAG.adaptive_rag_class import LoadDocuments, MyEmbeddings
+from RAG.local_embeddings import LocalEmbeddings, RUNTIMES
+
+csv_dir = Path(__file__).resolve().parent.parent / "Data" / "CSV"
+
+
+def measure(encode, texts, queries):
+    encode(queries[:2])  # warm-up (lazy session/graph initialisation)
+    latencies = []
+    for query in queries:
+        start_time = time.perf_counter()
+        encode([query])
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    start_time = time.perf_counter()
+    vectors = np.asarray(encode(texts), dtype=np.float32)
+    seconds = time.perf_counter() - start_time
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+        "throughput": len(texts) / seconds,
+        "vectors": vectors
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--file", type=str, default=None)
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--gemini", action="store_true", help="also measure the Gemini API path")
+    args = parser.parse_args()
+
+    file_path = args.file or str(sorted(csv_dir.glob("*.csv"))[0])
+    documents, _, _ = LoadDocuments(file_path).load_documents()
+    texts = [doc.page_content for doc in documents[:args.limit]]
+    queries = [" ".join(text.split()[:12]) for text in texts[:args.queries]]
+    print(f"File: {Path(file_path).name}, {len(texts)} texts, {len(queries)} queries, threads: {args.threads or 'default'}")
+
+    print(f"{'backend':<12}{'p50 ms':>10}{'p95 ms':>10}{'texts/s':>10}{'cos vs torch':>14}")
+    reference = None
+    for runtime in RUNTIMES:
+        embeddings = LocalEmbeddings(runtime=runtime, threads=args.threads)
+        result = measure(embeddings.encode, texts, queries)
+        if reference is None:
+            reference = result["vectors"]
+        # Vectors are normalized, so the row-wise dot product is the cosine.
+        agreement = float(np.mean(np.sum(result["vectors"] * reference, axis=1)))
+        print(f"{runtime:<12}{result['p50']:>10.2f}{result['p95']:>10.2f}{result['throughput']:>10.1f}{agreement:>14.4f}")
+    if args.gemini:
+        embeddings = MyEmbeddings()
+
+        def encode(batch):
+            return [vector for start in range(0, len(batch), embeddings.batch_size)
+                    for vector in embeddings._request_batch(batch[start:start + embeddings.batch_size])]
+        result = measure(encode, texts, queries)
+        print(f"{'gemini':<12}{result['p50']:>10.2f}{result['p95']:>10.2f}{result['throughput']:>10.1f}{'-':>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Micro-benchmark: precompiled query-feature extractor vs. the per-call regex implementation.
+
+The legacy functions below are the analyze_query_complexity features as they were before
+QueryFeatureExtractor, kept verbatim as the reference. The benchmark first checks both give
+the same complexity vector, then times them. Run from backend/:
+    python -m RAG.benchmarks.query_features_benchmark [--iterations N]
+"""
+import re
+import math
+import time
+import argparse
+
+import numpy as np
+
+from RAG.query_classification import compute_query_complexity, _query_features, normalize_query
+
+SAMPLE_QUESTIONS = [
+    "What is the best fertilizer for wheat?",
+    "How to diagnose nitrogen deficiency symptoms in rice if the soil pH is 5.5 and 20 kg urea was applied 10 days after sowing?",
+    "Explain and compare varieties of cotton, versus best cultivar; what about (GPS) precision agriculture and remote sensing drones?",
+    "Predict yield and forecast weather for Punjab paddy, plan cultivation timing with molecular and genetic analysis",
+    "Crop and soil, pest and disease management strategy to prevent and control fungus",
+    "What's the post-harvest storage and processing for mango in Maharashtra at 15% moisture?",
+    "optimize irrigation and fertilization to maximize the yield and improve overall productivity",
+    "When should I sow mustard in Rajasthan?",
+]
+
+
+LEGACY_INTENT_PATTERNS = {
+    'diagnostic': [r'diagnose\b', r'identify.*problem\b', r'symptoms\b', r'deficiency\b'],
+    'optimization': [r'optimize\b', r'maximize.*yield\b', r'improve.*productivity\b'],
+    'planning': [r'plan.*cultivation\b', r'schedule.*planting\b', r'timing\b'],
+    'comparative': [r'compare.*varieties\b', r'best.*cultivar\b', r'versus\b'],
+    'predictive': [r'predict.*yield\b', r'forecast.*weather\b', r'estimate.*production\b'],
+    'management': [r'manage\b', r'control\b', r'prevent\b', r'strategy\b']
+}
+
+LEGACY_INTENT_WEIGHTS = {
+    'diagnostic': 3.0, 'optimization': 2.8, 'predictive': 2.5,
+    'planning': 2.0, 'management': 1.8, 'comparative': 1.5
+}
+
+
+def legacy_length_complexity(question):
+    words = question.split()
+    word_count = len(words)
+    char_count = len(question)
+
+    length_factor = math.log(1 + word_count) / math.log(20)
+    avg_word_length = char_count / max(word_count, 1)
+    complexity_factor = math.tanh((avg_word_length - 4) / 2)
+
+    return min(length_factor + complexity_factor, 1.0)
+
+def legacy_structural_complexity(question):
+    clause_indicators = [',', ';', ':', ' and ', ' or ', ' but ', ' however ', ' therefore ']
+    clause_density = sum(question.lower().count(indicator) for indicator in clause_indicators) / len(question)
+
+    question_marks = question.count('?')
+    parentheses = (question.count('(') + question.count(')')) / 2
+    quotes = (question.count('"') + question.count("'")) / 2
+
+    structural_features = np.array([clause_density * 100, question_marks, parentheses, quotes])
+    feature_weights = np.array([0.4, 0.3, 0.15, 0.15])
+
+    weighted_score = np.dot(structural_features, feature_weights)
+    return math.tanh(weighted_score / 2)
+
+def legacy_linguistic_complexity(question):
+    question_lower = question.lower()
+
+    high_complexity_patterns = [
+        r'\bexplain\b', r'\banalyze\b', r'\bevaluate\b', r'\bassess\b',
+        r'\bdiscuss\b', r'\bexamine\b', r'\bcritique\b', r'\bjustify\b',
+        r'\bdemonstrate\b', r'\bsynthesize\b', r'\binterpret\b'
+    ]
+
+    medium_complexity_patterns = [
+        r'\bhow\b', r'\bwhy\b', r'\bcompare\b', r'\bcontrast\b',
+        r'\bdescribe\b', r'\bidentify\b', r'\bsummarize\b'
+    ]
+
+    simple_patterns = [
+        r'\bwhat\b', r'\bwhen\b', r'\bwhere\b', r'\bwho\b', r'\bwhich\b'
+    ]
+
+    high_matches = sum(1 for pattern in high_complexity_patterns if re.search(pattern, question_lower))
+    medium_matches = sum(1 for pattern in medium_complexity_patterns if re.search(pattern, question_lower))
+    simple_matches = sum(1 for pattern in simple_patterns if re.search(pattern, question_lower))
+
+    complexity_score = (high_matches * 3 + medium_matches * 2 - simple_matches * 0.5)
+
+    conditional_words = ['if', 'suppose', 'assuming', 'given that', 'provided that']
+    conditional_boost = sum(1 for word in conditional_words if word in question_lower) * 0.5
+
+    comparative_patterns = [r'\bmore\b', r'\bless\b', r'\bbetter\b', r'\bworse\b', r'\bmost\b', r'\bleast\b']
+    comparative_boost = sum(1 for pattern in comparative_patterns if re.search(pattern, question_lower)) * 0.3
+
+    total_score = complexity_score + conditional_boost + comparative_boost
+    return 1 / (1 + math.exp(-total_score + 1))
+
+def legacy_domain_complexity(question):
+    question_lower = question.lower()
+
+    agriculture_domains = {
+        'crop_science': ['crop', 'cultivation', 'planting', 'harvest', 'yield', 'seeds', 'germination'],
+        'soil_science': ['soil', 'fertility', 'nutrients', 'nitrogen', 'phosphorus', 'potassium', 'ph'],
+        'pest_management': ['pest', 'disease', 'insect', 'fungus', 'virus', 'bacteria', 'weed'],
+        'water_management': ['irrigation', 'water', 'drought', 'rainfall', 'precipitation'],
+        'climate_weather': ['climate', 'weather', 'temperature', 'humidity', 'frost'],
+        'technology_precision': ['precision agriculture', 'gps', 'remote sensing', 'drones', 'sensors'],
+        'economics_policy': ['subsidy', 'market', 'price', 'cost', 'profit', 'economics'],
+        'livestock_animal': ['livestock', 'cattle', 'dairy', 'poultry', 'pig', 'sheep'],
+        'post_harvest': ['storage', 'processing', 'packaging', 'transportation']
+    }
+
+    domain_weights = {
+        'technology_precision': 3.0, 'soil_science': 2.5, 'pest_management': 2.5,
+        'climate_weather': 2.0, 'water_management': 2.0, 'economics_policy': 2.0,
+        'crop_science': 1.5, 'livestock_animal': 1.5, 'post_harvest': 1.5
+    }
+
+    domain_scores = []
+    for domain, terms in agriculture_domains.items():
+        matches = sum(1 for term in terms if term in question_lower)
+        if matches > 0:
+            weight = domain_weights.get(domain, 1.0)
+            score = math.log(1 + matches) * weight
+            domain_scores.append(score)
+
+    if not domain_scores:
+        return 0.0
+
+    max_score = max(domain_scores)
+    diversity_penalty = len(domain_scores) / len(agriculture_domains)
+
+    technical_terms = ['agroecology', 'biotechnology', 'genomics', 'phenotyping', 'bioinformatics']
+    tech_boost = sum(1 for term in technical_terms if term in question_lower) * 0.5
+
+    total_score = max_score + diversity_penalty + tech_boost
+    return math.tanh(total_score / 3)
+
+def legacy_semantic_complexity(question):
+    question_lower = question.lower()
+    words = question.split()
+
+    technical_indicators = [
+        'physiological', 'biochemical', 'molecular', 'cellular', 'genetic',
+        'morphological', 'phenotypic', 'genotypic', 'metabolic', 'enzymatic'
+    ]
+
+    tech_density = sum(1 for term in technical_indicators if term in question_lower) / len(words)
+
+    measurement_patterns = [
+        r'\d+\s*(kg|ton|hectare|acre|liter|ml|ppm|ph|°c|°f)',
+        r'\d+%\s*(moisture|protein|fat|fiber)',
+        r'\d+\s*(days|weeks|months)\s*(after|before)'
+    ]
+
+    measurement_count = sum(1 for pattern in measurement_patterns if re.search(pattern, question_lower))
+    measurement_factor = math.log(1 + measurement_count)
+
+    proper_nouns = sum(1 for word in words if word[0].isupper() and len(word) > 3)
+    entity_density = proper_nouns / len(words)
+
+    concept_separators = ['crop and soil', 'pest and disease', 'irrigation and fertilization']
+    concept_complexity = sum(1 for sep in concept_separators if sep in question_lower)
+
+    feature_vector = np.array([tech_density * 10, measurement_factor, entity_density * 10, concept_complexity])
+    weights = np.array([0.4, 0.2, 0.2, 0.2])
+
+    semantic_score = np.dot(feature_vector, weights)
+    return math.tanh(semantic_score)
+
+def legacy_intent_complexity(question):
+    question_lower = question.lower()
+
+    intent_scores = []
+    for intent_type, patterns in LEGACY_INTENT_PATTERNS.items():
+        matches = sum(1 for pattern in patterns if re.search(pattern, question_lower))
+        if matches > 0:
+            weight = LEGACY_INTENT_WEIGHTS.get(intent_type, 1.0)
+            score = math.log(1 + matches) * weight
+            intent_scores.append(score)
+
+    if not intent_scores:
+        return 0.0
+
+    max_intent_score = max(intent_scores)
+
+    process_words = ['preparation', 'planting', 'maintenance', 'harvesting', 'post-harvest']
+    process_complexity = sum(1 for word in process_words if word in question_lower)
+    process_factor = math.sqrt(process_complexity) * 0.3
+
+    total_score = max_intent_score + process_factor
+    return math.tanh(total_score / 3)
+
+
+def legacy_query_complexity(question):
+    return [
+        legacy_length_complexity(question),
+        legacy_linguistic_complexity(question),
+        legacy_semantic_complexity(question),
+        legacy_structural_complexity(question),
+        legacy_domain_complexity(question),
+        legacy_intent_complexity(question)
+    ]
+
+
+def time_per_call(func, questions, iterations):
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        for question in questions:
+            func(question)
+    return (time.perf_counter() - start_time) / (iterations * len(questions)) * 1e6
+
+
+def uncached_query_complexity(question):
+    return _query_features.__wrapped__(normalize_query(question))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query feature extraction micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    for question in SAMPLE_QUESTIONS:
+        legacy = legacy_query_complexity(question)
+        current, _, _ = compute_query_complexity(question)
+        if not np.allclose(legacy, current, rtol=0, atol=1e-12):
+            raise AssertionError(f"Feature mismatch for {question!r}: {legacy} != {current}")
+    print(f"Feature vectors match on {len(SAMPLE_QUESTIONS)} questions")
+
+    legacy_us = time_per_call(legacy_query_complexity, SAMPLE_QUESTIONS, args.iterations)
+    single_pass_us = time_per_call(uncached_query_complexity, SAMPLE_QUESTIONS, args.iterations)
+    memoized_us = time_per_call(compute_query_complexity, SAMPLE_QUESTIONS, args.iterations)
+
+    print(f"{'implementation':<28}{'us/query':>10}{'speedup':>10}")
+    print(f"{'legacy re.search loops':<28}{legacy_us:>10.1f}{1.0:>9.1f}x")
+    print(f"{'precompiled single pass':<28}{single_pass_us:>10.1f}{legacy_us / single_pass_us:>9.1f}x")
+    print(f"{'memoized (repeat query)':<28}{memoized_us:>10.2f}{legacy_us / memoized_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare the local cross-encoder reranker against the Cohere path on logged queries.
+
+Queries are collected by running the RAG system with RAG_RERANK_LOG=true. Cohere's ranking
+is used as the reference: the report gives top-1 agreement, overlap@k and latency for each
+local backend. Run from backend/:  python -m RAG.benchmarks.rerank_benchmark [--limit N]
+"""
+import sys
+import json
+import time
+import argparse
+import statistics
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from RAG.rerankers import rerank_log_path, get_reranker
+
+load_dotenv()
+
+
+def load_logged_queries(limit):
+    entries = []
+    seen = set()
+    with open(rerank_log_path, 'r') as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["query"] in seen or len(entry["documents"]) < 2:
+                continue
+            seen.add(entry["query"])
+            entries.append(entry)
+            if len(entries) >= limit:
+                break
+    return entries
+
+
+def ranked_texts(reranker, query, texts):
+    start_time = time.perf_counter()
+    results = reranker.compress_documents([Document(page_content=text) for text in texts], query)
+    return [doc.page_content for doc in results], (time.perf_counter() - start_time) * 1000
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reranker quality/latency benchmark")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--top-n", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        entries = load_logged_queries(args.limit)
+    except FileNotFoundError:
+        print(f"No logged queries at {rerank_log_path}; run the RAG system with RAG_RERANK_LOG=true first.")
+        sys.exit(1)
+    if not entries:
+        print("The rerank log has no usable queries yet.")
+        sys.exit(1)
+
+    reference = get_reranker(top_n=args.top_n, backend="cohere")
+    candidates = {
+        "cross-encoder": get_reranker(top_n=args.top_n, backend="cross-encoder"),
+        "cross-encoder-onnx": get_reranker(top_n=args.top_n, backend="cross-encoder-onnx"),
+    }
+    # Warm the local models so load time is not counted as query latency.
+    for reranker in candidates.values():
+        ranked_texts(reranker, "warm up", ["warm up document", "another document"])
+
+    latencies = {"cohere": []}
+    agreement = {name: {"top1": 0, "overlap": [], "latency": []} for name in candidates}
+
+    for entry in entries:
+        query, texts = entry["query"], entry["documents"]
+        reference_ranking, reference_ms = ranked_texts(reference, query, texts)
+        latencies["cohere"].append(reference_ms)
+        for name, reranker in candidates.items():
+            ranking, elapsed_ms = ranked_texts(reranker, query, texts)
+            agreement[name]["latency"].append(elapsed_ms)
+            agreement[name]["top1"] += int(bool(ranking) and bool(reference_ranking) and ranking[0] == reference_ranking[0])
+            agreement[name]["overlap"].append(len(set(ranking) & set(reference_ranking)) / max(len(reference_ranking), 1))
+
+    print(f"Queries: {len(entries)} (reference: Cohere rerank-english-v3.0, top_n={args.top_n})")
+    print(f"{'backend':<22}{'top-1 agree':>12}{'overlap@k':>12}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'cohere':<22}{'-':>12}{'-':>12}{statistics.median(latencies['cohere']):>10.1f}{percentile(latencies['cohere'], 0.95):>10.1f}")
+    for name, stats in agreement.items():
+        print(
+            f"{name:<22}{stats['top1'] / len(entries):>12.2%}{statistics.mean(stats['overlap']):>12.2%}"
+            f"{statistics.median(stats['latency']):>10.1f}{percentile(stats['latency'], 0.95):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Flat vs. HNSW vs. IVF-PQ on the real corpus vectors.
+
+The vectors of every saved workflow FAISS index (RAG/parallel_cache/*/.../index.faiss and
+RAG/cache/...) are merged into one corpus, optionally grown --scale times with jittered copies
+to preview a larger merged corpus. Queries are held-out jittered corpus vectors. For each index
+type the report gives recall@k against exact flat search, build time, single-query p50/p95
+latency and serialized index size. Index parameters come from the same RAG_* variables the
+RAG build uses (see RAG/vector_index.py). Run from backend/:
+    python -m RAG.benchmarks.vector_index_benchmark [--k 10] [--queries 200] [--scale 1]
+"""
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from RAG.vector_index import create_faiss_index
+
+rag_dir = Path(__file__).resolve().parent.parent
+
+
+def load_corpus_vectors():
+    paths = sorted(rag_dir.glob("parallel_cache/*/vectorstore/faiss_db/faiss_index/index.faiss"))
+    paths += sorted(rag_dir.glob("cache/vectorstore/faiss_db/faiss_index/index.faiss"))
+    blocks = []
+    for path in paths:
+        index = faiss.read_index(str(path))
+        if index.ntotal:
+            blocks.append(index.reconstruct_n(0, index.ntotal))
+    if not blocks:
+        raise SystemExit("No saved FAISS indexes found; build the RAG caches first.")
+    dims = {block.shape[1] for block in blocks}
+    if len(dims) > 1:
+        raise SystemExit(f"Saved indexes mix embedding dimensions {sorted(dims)}; rebuild them with one model.")
+    return np.vstack(blocks).astype(np.float32), len(paths)
+
+
+def jitter(vectors, rng, scale=0.05):
+    noise = rng.standard_normal(vectors.shape).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True) / np.sqrt(vectors.shape[1])
+    return vectors + scale * norms * noise
+
+
+def measure(index_type, corpus, queries, exact, k):
+    start_time = time.perf_counter()
+    # min_vectors=0 so the requested type is built even for a small corpus.
+    index, info = create_faiss_index(corpus, index_type=index_type, min_vectors=0)
+    index.add(corpus)
+    build_seconds = time.perf_counter() - start_time
+
+    latencies = []
+    found = []
+    for query in queries:
+        start_time = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        found.append(ids[0])
+    recall = statistics.mean(len(set(ids) & set(truth)) / k for ids, truth in zip(found, exact))
+    size_mb = faiss.serialize_index(index).nbytes / (1024 * 1024)
+    latencies.sort()
+    return {
+        "recall": recall,
+        "build": build_seconds,
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+        "size_mb": size_mb,
+        "info": info
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS index type benchmark")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scale", type=int, default=1, help="grow the corpus with jittered copies")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    base, num_indexes = load_corpus_vectors()
+    corpus = np.vstack([base] + [jitter(base, rng) for _ in range(args.scale - 1)])
+    queries = jitter(corpus[rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)], rng)
+
+    flat = faiss.IndexFlatL2(corpus.shape[1])
+    flat.add(corpus)
+    _, exact = flat.search(queries, args.k)
+
+    print(f"Corpus: {len(corpus)} vectors (dim {corpus.shape[1]}) from {num_indexes} indexes, "
+          f"scale {args.scale}, {len(queries)} queries, k={args.k}")
+    print(f"{'index':<8}{'recall@k':>10}{'build s':>10}{'p50 ms':>10}{'p95 ms':>10}{'size MB':>10}  params")
+    for index_type in ("flat", "hnsw", "ivfpq"):
+        result = measure(index_type, corpus, queries, exact, args.k)
+        params = {key: value for key, value in result["info"].items()
+                  if key not in ("index_type", "requested_index_type", "dim", "train_seconds")}
+        print(f"{index_type:<8}{result['recall']:>10.3f}{result['build']:>10.2f}{result['p50']:>10.3f}"
+              f"{result['p95']:>10.3f}{result['size_mb']:>10.1f}  {params}")
+
+
+if __name__ == "__main__":
+    main()
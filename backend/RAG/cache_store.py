@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the store is then only safe within one process
+    fcntl = None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkflowCacheStore:
+    """
+    Manifest-backed store for the per-file workflow caches under RAG/parallel_cache.
+
+    Every workflow_<id> directory has a manifest entry with its size, last access time
+    and hit count. Totals are kept in the manifest so cache info never walks the tree,
+    and the least valuable entries are evicted once the disk budget is exceeded.
+
+    The manifest is shared by every worker process: each read-modify-write (and each
+    eviction) re-reads it under an exclusive flock on manifest.lock. Caches in use are
+    pinned in the manifest by process id, so no worker evicts a cache another one is
+    reading; pins of processes that have died are ignored.
+    """
+
+    MANIFEST_NAME = "manifest.json"
+    LOCK_NAME = "manifest.lock"
+
+    def __init__(self, base_dir, budget_mb: Optional[float] = None):
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        if budget_mb is None:
+            budget_mb = float(os.getenv("RAG_CACHE_BUDGET_MB", "2048"))
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.manifest_path = self.base_dir / self.MANIFEST_NAME
+        self.lock_path = self.base_dir / self.LOCK_NAME
+        self._lock = threading.RLock()
+        self._pid = str(os.getpid())
+        with self._locked():
+            pass
+
+    @contextmanager
+    def _locked(self):
+        """Thread and process exclusive section with self._manifest freshly read from disk."""
+        with self._lock:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                self._manifest = self._load_manifest()
+                yield self._manifest
+            finally:
+                os.close(fd)  # closing the descriptor releases the flock
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    manifest = json.load(f)
+                if "entries" in manifest:
+                    return manifest
+            except Exception as e:
+                print(f"Warning: Could not read cache manifest, rebuilding: {e}")
+        return self._rebuild_manifest()
+
+    def _rebuild_manifest(self) -> Dict[str, Any]:
+        """One-off scan used when no manifest exists yet (e.g. caches created before it)."""
+        entries = {}
+        total_size = 0
+        for cache_dir in self.base_dir.glob("workflow_*"):
+            if not cache_dir.is_dir():
+                continue
+            size = self._directory_size(cache_dir)
+            cache_id = cache_dir.name[len("workflow_"):]
+            mtime = cache_dir.stat().st_mtime
+            entries[cache_id] = {
+                "file_name": None,
+                "size_bytes": size,
+                "measured_at": time.time(),
+                "created_at": mtime,
+                "last_access": mtime,
+                "hits": 0,
+                "pins": {}
+            }
+            total_size += size
+        manifest = {"entries": entries, "total_size_bytes": total_size}
+        self._write_manifest(manifest)
+        return manifest
+
+    def _write_manifest(self, manifest=None):
+        manifest = manifest if manifest is not None else self._manifest
+        tmp_path = self.manifest_path.with_suffix(f".json.{self._pid}.tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception as e:
+            print(f"Warning: Could not save cache manifest: {e}")
+
+    @staticmethod
+    def _directory_size(path: Path) -> int:
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    @staticmethod
+    def _last_build(path: Path) -> float:
+        # Every index (re)build rewrites index_meta.json, so its mtime marks the last build.
+        return max((meta.stat().st_mtime for meta in path.glob("vectorstore/**/index_meta.json")), default=0.0)
+
+    def cache_dir(self, cache_id: str) -> Path:
+        return self.base_dir / f"workflow_{cache_id}"
+
+    def acquire(self, cache_id: str, file_name: str = None) -> str:
+        """Return the cache directory for cache_id, recording the access and pinning it against eviction."""
+        with self._locked() as manifest:
+            path = self.cache_dir(cache_id)
+            entries = manifest["entries"]
+            now = time.time()
+            entry = entries.get(cache_id)
+            if entry is not None and path.exists():
+                entry["hits"] += 1
+                entry["last_access"] = now
+                if file_name:
+                    entry["file_name"] = file_name
+            else:
+                if entry is not None:
+                    manifest["total_size_bytes"] -= entry["size_bytes"]
+                path.mkdir(parents=True, exist_ok=True)
+                entry = entries[cache_id] = {
+                    "file_name": file_name,
+                    "size_bytes": 0,
+                    "measured_at": 0.0,
+                    "created_at": now,
+                    "last_access": now,
+                    "hits": 0,
+                    "pins": {}
+                }
+            pins = entry.setdefault("pins", {})
+            pins[self._pid] = pins.get(self._pid, 0) + 1
+            self._write_manifest()
+            return str(path)
+
+    def release(self, cache_id: str):
+        """Unpin cache_id, re-measure it if its indexes were (re)built since the last measure, enforce the budget."""
+        with self._locked() as manifest:
+            entry = manifest["entries"].get(cache_id)
+            if entry is not None:
+                pins = entry.setdefault("pins", {})
+                count = pins.get(self._pid, 0) - 1
+                if count > 0:
+                    pins[self._pid] = count
+                else:
+                    pins.pop(self._pid, None)
+
+                path = self.cache_dir(cache_id)
+                if entry["size_bytes"] == 0 or self._last_build(path) > entry.get("measured_at", 0.0):
+                    size = self._directory_size(path)
+                    manifest["total_size_bytes"] += size - entry["size_bytes"]
+                    entry["size_bytes"] = size
+                    entry["measured_at"] = time.time()
+            self._enforce_budget(manifest)
+            self._write_manifest()
+
+    def _entry_value(self, entry: Dict[str, Any], now: float) -> float:
+        # Frequently hit entries are worth keeping; the value decays with time since last use.
+        hours_idle = max(now - entry["last_access"], 0) / 3600
+        return (entry["hits"] + 1) / (1 + hours_idle)
+
+    def _pinned(self, entry: Dict[str, Any]) -> bool:
+        pins = entry.setdefault("pins", {})
+        for pid in [pid for pid in pins if pid != self._pid and not _pid_alive(int(pid))]:
+            del pins[pid]
+        return bool(pins)
+
+    def enforce_budget(self):
+        with self._locked() as manifest:
+            evicted = self._enforce_budget(manifest)
+            if evicted:
+                self._write_manifest()
+            return evicted
+
+    def _enforce_budget(self, manifest: Dict[str, Any]):
+        if manifest["total_size_bytes"] <= self.budget_bytes:
+            return []
+        now = time.time()
+        entries = manifest["entries"]
+        candidates = sorted(
+            (cache_id for cache_id, entry in entries.items() if not self._pinned(entry)),
+            key=lambda cache_id: self._entry_value(entries[cache_id], now)
+        )
+        evicted = []
+        for cache_id in candidates:
+            if manifest["total_size_bytes"] <= self.budget_bytes:
+                break
+            self._evict(manifest, cache_id)
+            evicted.append(cache_id)
+        if evicted:
+            print(f"🗑️ Evicted {len(evicted)} workflow cache(s) to stay within {self.budget_bytes / (1024 * 1024):.0f} MB")
+        return evicted
+
+    def _evict(self, manifest: Dict[str, Any], cache_id: str):
+        entry = manifest["entries"].pop(cache_id)
+        manifest["total_size_bytes"] -= entry["size_bytes"]
+        shutil.rmtree(self.cache_dir(cache_id), ignore_errors=True)
+
+    def clear(self):
+        with self._locked() as manifest:
+            for cache_id, entry in list(manifest["entries"].items()):
+                if not self._pinned(entry):
+                    self._evict(manifest, cache_id)
+            self._write_manifest()
+
+    def info(self, include_directories: bool = True) -> Dict[str, Any]:
+        with self._locked() as manifest:
+            entries = manifest["entries"]
+            info = {
+                "total_caches": len(entries),
+                "total_size_mb": manifest["total_size_bytes"] / (1024 * 1024),
+                "budget_mb": self.budget_bytes / (1024 * 1024)
+            }
+            if include_directories:
+                info["cache_directories"] = [f"workflow_{cache_id}" for cache_id in entries]
+            return info
+
+
+_stores: Dict[str, WorkflowCacheStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_workflow_cache_store(base_dir, budget_mb: Optional[float] = None) -> WorkflowCacheStore:
+    """Process-wide store per cache directory; an explicit budget_mb updates the shared store's budget."""
+    key = os.path.realpath(base_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = WorkflowCacheStore(base_dir, budget_mb=budget_mb)
+        elif budget_mb is not None:
+            store.budget_bytes = int(budget_mb * 1024 * 1024)
+        return store
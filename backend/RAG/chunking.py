@@ -0,0 +1,109 @@
+import os
+import re
+import copy
+import time
+from typing import List, Tuple, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Same sentence split and breakpoint rule as langchain_experimental's SemanticChunker defaults.
+sentence_split_re = re.compile(r"(?<=[.?!])\s+")
+DEFAULT_BREAKPOINT_PERCENTILE = 95
+
+
+def get_chunking_mode() -> str:
+    """RAG_CHUNKING_MODE: "reuse" (default) or "semantic" for the SemanticChunker path."""
+    mode = os.getenv("RAG_CHUNKING_MODE", "reuse").lower()
+    if mode not in ("reuse", "semantic"):
+        print(f"Warning: Unknown RAG_CHUNKING_MODE '{mode}', using 'reuse'")
+        return "reuse"
+    return mode
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class EmbeddingReuseChunker:
+    """
+    Semantic chunker that embeds every sentence exactly once.
+
+    SemanticChunker embeds a window of neighbouring sentences per sentence to find breakpoints,
+    and the vector store then embeds each resulting chunk again. Here the sentences of all
+    documents are embedded in one embed_documents call, the window embeddings are the summed
+    unit sentence embeddings of the same window, breakpoints use the same percentile rule,
+    and each chunk's embedding is the L2-normalized mean of its unit sentence embeddings.
+    The chunk embeddings are returned with the chunks so the FAISS index can be built without
+    another pass.
+    """
+
+    def __init__(self, embeddings, buffer_size: int = 1, breakpoint_percentile: float = DEFAULT_BREAKPOINT_PERCENTILE):
+        self.embeddings = embeddings
+        self.buffer_size = buffer_size
+        self.breakpoint_percentile = breakpoint_percentile
+        self.last_stats = {}
+
+    @staticmethod
+    def split_sentences(text: str) -> List[str]:
+        return sentence_split_re.split(text)
+
+    def _window_embeddings(self, sentence_embeddings: np.ndarray) -> np.ndarray:
+        unit = _unit_rows(sentence_embeddings)
+        # Prefix sums give every [i - buffer, i + buffer] window sum in one pass.
+        prefix = np.vstack([np.zeros((1, unit.shape[1]), dtype=unit.dtype), np.cumsum(unit, axis=0)])
+        positions = np.arange(len(unit))
+        starts = np.maximum(positions - self.buffer_size, 0)
+        ends = np.minimum(positions + self.buffer_size + 1, len(unit))
+        return _unit_rows(prefix[ends] - prefix[starts])
+
+    def _breakpoints(self, sentence_embeddings: np.ndarray) -> List[int]:
+        """Indices i where a chunk ends after sentence i."""
+        if len(sentence_embeddings) < 2:
+            return []
+        windows = self._window_embeddings(sentence_embeddings)
+        distances = 1 - np.sum(windows[:-1] * windows[1:], axis=1)
+        threshold = np.percentile(distances, self.breakpoint_percentile)
+        return [int(i) for i in np.flatnonzero(distances > threshold)]
+
+    def split_documents_with_embeddings(self, documents: Sequence[Document]) -> Tuple[List[Document], List[List[float]]]:
+        start_time = time.time()
+        sentences_per_doc = [self.split_sentences(doc.page_content) for doc in documents]
+        all_sentences = [sentence for sentences in sentences_per_doc for sentence in sentences]
+        if not all_sentences:
+            self.last_stats = {"documents": len(documents), "sentences": 0, "chunks": 0, "embedded_texts": 0,
+                               "seconds": time.time() - start_time}
+            return [], []
+        sentence_embeddings = np.asarray(self.embeddings.embed_documents(all_sentences), dtype=np.float32)
+
+        chunks: List[Document] = []
+        chunk_embeddings: List[List[float]] = []
+        offset = 0
+        for doc, sentences in zip(documents, sentences_per_doc):
+            doc_embeddings = sentence_embeddings[offset:offset + len(sentences)]
+            offset += len(sentences)
+            start = 0
+            for end in self._breakpoints(doc_embeddings) + [len(sentences) - 1]:
+                chunks.append(Document(page_content=" ".join(sentences[start:end + 1]), metadata=copy.deepcopy(doc.metadata)))
+                # Mean of the unit sentence vectors, re-normalized: the mean of n unit vectors shrinks
+                # as n grows, and in the L2 index that would rank long chunks below short ones.
+                pooled = _unit_rows(doc_embeddings[start:end + 1]).mean(axis=0, keepdims=True)
+                chunk_embeddings.append(_unit_rows(pooled)[0].tolist())
+                start = end + 1
+
+        self.last_stats = {
+            "documents": len(documents),
+            "sentences": len(all_sentences),
+            "chunks": len(chunks),
+            "embedded_texts": len(all_sentences),
+            "seconds": time.time() - start_time
+        }
+        print(
+            f"Chunked {len(documents)} documents into {len(chunks)} chunks from "
+            f"{len(all_sentences)} sentence embeddings in {self.last_stats['seconds']:.2f}s"
+        )
+        return chunks, chunk_embeddings
+
+    def split_documents(self, documents: Sequence[Document]) -> List[Document]:
+        return self.split_documents_with_embeddings(documents)[0]
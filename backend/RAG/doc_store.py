@@ -0,0 +1,122 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import List, Iterator, Sequence, Union
+
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+
+
+def _json_default(value):
+    # numpy scalars (e.g. pandas row indexes) and paths end up in chunk metadata
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class DocumentStore:
+    """
+    SQLite table of chunk text and metadata keyed by chunk id (the position in doc_splits).
+
+    Replaces the doc_splits pickle: opening the store reads nothing, and get() fetches and
+    materializes only the requested rows as Document objects.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(path)
+
+    @classmethod
+    def create(cls, path: str, documents: Sequence[Document]) -> "DocumentStore":
+        """Write documents to a fresh store at path, ids following their order."""
+        tmp_path = path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        store = cls(tmp_path)
+        with store._lock, store._conn:
+            store._conn.executemany(
+                "INSERT INTO chunks (id, page_content, metadata) VALUES (?, ?, ?)",
+                (
+                    (doc_id, doc.page_content, json.dumps(doc.metadata, default=_json_default))
+                    for doc_id, doc in enumerate(documents)
+                )
+            )
+        store.close()
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def get(self, doc_ids: Sequence[int]) -> List[Document]:
+        """Documents for doc_ids, in the order given; unknown ids are skipped."""
+        doc_ids = [int(doc_id) for doc_id in doc_ids]
+        if not doc_ids:
+            return []
+        placeholders = ",".join("?" * len(doc_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, page_content, metadata FROM chunks WHERE id IN ({placeholders})", doc_ids
+            ).fetchall()
+        by_id = {}
+        for row_id, page_content, metadata in rows:
+            metadata = json.loads(metadata)
+            metadata.setdefault("doc_id", row_id)
+            by_id[row_id] = Document(page_content=page_content, metadata=metadata)
+        return [by_id[doc_id] for doc_id in doc_ids if doc_id in by_id]
+
+    def texts(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT page_content FROM chunks ORDER BY id").fetchall()
+        for row in rows:
+            yield row[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LazyDocuments(Sequence):
+    """Read-only list view over a DocumentStore; items are fetched when indexed."""
+
+    def __init__(self, store: DocumentStore):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.store.get(range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        documents = self.store.get([index])
+        if not documents:
+            raise IndexError(index)
+        return documents[0]
+
+
+class SQLiteDocstore(Docstore):
+    """
+    LangChain docstore view of a DocumentStore for FAISS indexes whose docstore ids are the
+    chunk ids, so a loaded vector store does not unpickle its own copy of every chunk.
+    """
+
+    def __init__(self, store: DocumentStore):
+        self.store = store
+
+    def search(self, search: str) -> Union[str, Document]:
+        documents = self.store.get([int(search)])
+        if not documents:
+            return f"ID {search} not found."
+        return documents[0]
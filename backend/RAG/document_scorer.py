@@ -2,11 +2,17 @@ import numpy as np
 import re
 from collections import Counter
 from typing import List, Dict, Tuple
+from functools import lru_cache
 import time
 from sentence_transformers import SentenceTransformer
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity as sk_cosine
 
+@lru_cache(maxsize=None)
+def load_sentence_model(model_name: str = 'all-MiniLM-L6-v2') -> SentenceTransformer:
+    """Process-wide SentenceTransformer instance so the scorer and FAQ index share one model."""
+    return SentenceTransformer(model_name)
+
 class FastQuerySummaryScorer:
     def __init__(self):
         self.word_pattern = re.compile(r'\b\w+\b')
@@ -16,7 +22,7 @@ class FastQuerySummaryScorer:
             'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did'
         }
         
-        self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.sentence_model = load_sentence_model()
         self.tfidf_vectorizer = TfidfVectorizer(
             max_features=2000,
             stop_words='english',
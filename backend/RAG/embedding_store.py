@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the store is then only safe within one process
+    fcntl = None
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+embedding_store_dir = os.path.join(current_dir, "cache", "embedding_cache")
+
+MAGIC = b"AGEMB\x00\x01\x00"
+HEADER = struct.Struct("<8sI4x")  # magic, dim, padding to 16 bytes
+DIGEST_BYTES = 16
+
+
+class EmbeddingStore:
+    """
+    Append-only float32 embedding store keyed by md5 hex digest.
+
+    vectors.bin holds a 16-byte header and fixed-size records of (16-byte digest, dim float32).
+    Appends are one write() of whole records under an exclusive flock on store.lock, so a put is
+    O(1) disk I/O and concurrent workers never interleave records. Readers take no lock: they
+    memory-map the file, count only complete records and pick up other workers' appends by
+    scanning the new tail when a key is missing. The last record of a key wins; compact()
+    rewrites the file without superseded records and swaps it in atomically.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "vectors.bin")
+        self.lock_path = os.path.join(directory, "store.lock")
+        self._thread_lock = threading.RLock()
+        self._index: Dict[bytes, int] = {}
+        self._rows = 0
+        self._inode = None
+        self._records = None
+        self.dim: Optional[int] = None
+        with self._thread_lock:
+            self._refresh()
+
+    # --- locking -----------------------------------------------------------------------
+
+    @contextmanager
+    def _exclusive(self):
+        """Held by writers only: excludes other threads and, via flock, other worker processes."""
+        with self._thread_lock:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)  # closing the descriptor releases the flock
+
+    # --- reading -----------------------------------------------------------------------
+
+    def _record_dtype(self):
+        return np.dtype([("digest", f"V{DIGEST_BYTES}"), ("vector", "<f4", (self.dim,))])
+
+    def _refresh(self):
+        """Map new complete records (and a compacted replacement file) into the index."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self._inode:
+            # First open, or another worker compacted the store: index from scratch.
+            self._index, self._rows, self._records = {}, 0, None
+            self._inode = stat.st_ino
+            with open(self.path, "rb") as f:
+                magic, dim = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} is not an embedding store")
+            self.dim = dim
+        record_size = self._record_dtype().itemsize
+        rows = (stat.st_size - HEADER.size) // record_size
+        if rows == self._rows and self._records is not None:
+            return
+        if rows == 0:
+            return
+        self._records = np.memmap(self.path, dtype=self._record_dtype(), mode="r", offset=HEADER.size, shape=(rows,))
+        digests = self._records["digest"][self._rows:rows]
+        for offset, digest in enumerate(digests):
+            self._index[bytes(digest)] = self._rows + offset
+        self._rows = rows
+
+    def _lookup(self, digest: bytes) -> Optional[List[float]]:
+        row = self._index.get(digest)
+        if row is None:
+            return None
+        return self._records["vector"][row].tolist()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        keys = list(keys)
+        found: Dict[str, List[float]] = {}
+        with self._thread_lock:
+            for attempt in range(2):
+                missing = []
+                for key in keys:
+                    vector = self._lookup(bytes.fromhex(key))
+                    if vector is not None:
+                        found[key] = vector
+                    else:
+                        missing.append(key)
+                if not missing or attempt:
+                    break
+                # Other workers may have appended them since the last refresh.
+                self._refresh()
+                keys = missing
+        return found
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        with self._thread_lock:
+            self._refresh()
+            return len(self._index)
+
+    # --- writing -----------------------------------------------------------------------
+
+    def put(self, key: str, vector: Sequence[float]):
+        self.put_many([(key, vector)])
+
+    def put_many(self, items: Iterable[Tuple[str, Sequence[float]]]):
+        items = list(items)
+        if not items:
+            return
+        vectors = np.asarray([vector for _, vector in items], dtype="<f4")
+        with self._exclusive():
+            if not os.path.exists(self.path):
+                with open(self.path, "wb") as f:
+                    f.write(HEADER.pack(MAGIC, vectors.shape[1]))
+            self._refresh()
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+            records = np.empty(len(items), dtype=self._record_dtype())
+            records["digest"] = [bytes.fromhex(key) for key, _ in items]
+            records["vector"] = vectors
+            self._truncate_partial_tail()
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, records.tobytes())
+            finally:
+                os.close(fd)
+            self._refresh()
+
+    def _truncate_partial_tail(self):
+        # A worker killed mid-write can leave a partial record; drop it before appending.
+        record_size = self._record_dtype().itemsize
+        size = os.path.getsize(self.path)
+        complete = HEADER.size + (size - HEADER.size) // record_size * record_size
+        if complete != size:
+            os.truncate(self.path, complete)
+
+    def compact(self) -> Dict[str, int]:
+        """Rewrite the store with only the latest record per key; returns row counts."""
+        with self._exclusive():
+            self._refresh()
+            before = self._rows
+            if self._records is None or len(self._index) == before:
+                return {"rows_before": before, "rows_after": before}
+            keep = np.fromiter(sorted(self._index.values()), dtype=np.int64)
+            tmp_path = self.path + ".compact"
+            with open(tmp_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, self.dim))
+                f.write(np.ascontiguousarray(self._records[keep]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._refresh()
+            return {"rows_before": before, "rows_after": self._rows}
+
+    def stats(self) -> Dict[str, int]:
+        with self._thread_lock:
+            self._refresh()
+            return {
+                "entries": len(self._index),
+                "rows": self._rows,
+                "superseded_rows": self._rows - len(self._index),
+                "dim": self.dim or 0,
+                "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            }
+
+
+def migrate_json_cache(json_path: str, store: EmbeddingStore) -> int:
+    """
+    Move a legacy {md5: [floats]} JSON cache into store; the JSON file is renamed afterwards.
+    The cache must come from the store's own model. When the store already has a dimension,
+    a cache whose vectors do not match it is left untouched.
+    """
+    try:
+        with open(json_path, "r") as f:
+            legacy = json.load(f)
+    except Exception as e:
+        print(f"Warning: Could not read legacy embedding cache {json_path}: {e}")
+        return 0
+    dim = store.dim
+    if dim and not any(isinstance(vector, list) and len(vector) == dim for vector in legacy.values()):
+        print(f"Warning: {os.path.basename(json_path)} holds no {dim}-dim vectors; not migrating it")
+        return 0
+    items = []
+    for key, vector in legacy.items():
+        if not isinstance(vector, list) or not vector:
+            continue
+        dim = dim or len(vector)
+        if len(vector) == dim:
+            items.append((key, vector))
+    for start in range(0, len(items), 1000):
+        store.put_many(items[start:start + 1000])
+    try:
+        os.replace(json_path, json_path + ".migrated")
+    except FileNotFoundError:
+        pass  # another worker migrated it concurrently; duplicate records are harmless
+    print(f"Migrated {len(items)} of {len(legacy)} cached embeddings from {os.path.basename(json_path)}")
+    return len(items)
+
+
+_stores: Dict[str, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+# Compact on open once superseded records (concurrent misses on the same text) pass this share.
+COMPACT_RATIO = 0.2
+
+
+def get_embedding_store(model: str) -> EmbeddingStore:
+    """Process-wide store per embedding model (vectors of different models never mix)."""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model)
+    with _stores_lock:
+        if slug not in _stores:
+            store = EmbeddingStore(os.path.join(embedding_store_dir, slug))
+            stats = store.stats()
+            if stats["superseded_rows"] > COMPACT_RATIO * stats["rows"]:
+                print(f"Compacting embedding store {slug}: {store.compact()}")
+            _stores[slug] = store
+        return _stores[slug]
+
+
+def get_embedding_store_stats() -> Dict[str, Dict[str, int]]:
+    with _stores_lock:
+        return {slug: store.stats() for slug, store in _stores.items()}
@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from agno.agent import Agent
+from agno.models.google import Gemini
+
+from .document_scorer import load_sentence_model
+from .query_classification import extract_entities
+
+load_dotenv()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+faq_cache_dir = os.path.join(current_dir, "cache", "faq_index")
+
+# (question column, answer column) pairs used by the Q&A shaped CSV families in Data/CSV
+QA_COLUMN_PAIRS = [
+    ("QUESTION.question", "ANSWER"),
+    ("instruction", "response"),
+    ("question", "answers"),
+]
+
+# Questions that only make sense next to the paragraph they were extracted from
+# ("What is the title of the document?") are never served as standalone answers.
+CONTEXT_BOUND_RE = re.compile(
+    r'\b(the|this|that)\s+(document|passage|paragraph|text|article|study|paper|report|table|figure|author|chapter|section)s?\b'
+)
+UNHELPFUL_ANSWER_RE = re.compile(
+    r"^(n/?a|nan|none|no answer|not available|unknown|i don'?t know|contact (the )?(kvk|agriculture officer|expert)s?\.?)$"
+)
+
+MIN_ANSWER_CHARS = 15
+MIN_QUESTION_WORDS = 3
+
+
+class FAQIndex:
+    """
+    Question-to-question similarity index over the Q&A shaped CSVs.
+
+    Stored questions are embedded once with the sentence model shared with the document
+    scorer and persisted under RAG/cache/faq_index; the index is rebuilt whenever the
+    CSV files change. A lookup returns the stored answer of the closest trusted question
+    when its cosine similarity clears the threshold, so near-duplicate questions skip
+    retrieval, grading and generation entirely.
+    """
+
+    def __init__(self, csv_dir, threshold: float = None, polish: bool = None, cache_dir: str = faq_cache_dir):
+        self.csv_dir = Path(csv_dir)
+        self.cache_dir = Path(cache_dir)
+        self.threshold = threshold if threshold is not None else float(os.getenv("RAG_FAQ_THRESHOLD", "0.92"))
+        if polish is None:
+            polish = os.getenv("RAG_FAQ_POLISH", "false").lower() in ("1", "true", "yes")
+        self.polish = polish
+        self._lock = threading.Lock()
+        self._entries: Optional[List[Dict[str, Any]]] = None
+        self._embeddings: Optional[np.ndarray] = None
+        self._polisher = None
+
+    def _csv_files(self) -> List[Path]:
+        return sorted(self.csv_dir.glob("*.csv")) if self.csv_dir.exists() else []
+
+    def _fingerprint(self, files: List[Path]) -> str:
+        hasher = hashlib.md5()
+        for file_path in files:
+            stat = file_path.stat()
+            hasher.update(f"{file_path.name}:{stat.st_size}:{stat.st_mtime}".encode())
+        return hasher.hexdigest()
+
+    @staticmethod
+    def is_trusted(question: str, answer: str) -> bool:
+        question_lower = question.lower()
+        answer_clean = answer.strip().lower()
+        if len(question_lower.split()) < MIN_QUESTION_WORDS:
+            return False
+        if len(answer_clean) < MIN_ANSWER_CHARS or UNHELPFUL_ANSWER_RE.match(answer_clean):
+            return False
+        if CONTEXT_BOUND_RE.search(question_lower):
+            return False
+        return True
+
+    def _collect_entries(self, files: List[Path]) -> List[Dict[str, Any]]:
+        entries = []
+        seen = set()
+        for file_path in files:
+            try:
+                df = pd.read_csv(file_path)
+            except Exception as e:
+                print(f"Warning: Could not read {file_path.name} for FAQ index: {e}")
+                continue
+            pair = next(((q, a) for q, a in QA_COLUMN_PAIRS if q in df.columns and a in df.columns), None)
+            if pair is None:
+                continue
+            question_col, answer_col = pair
+            qa = df[[question_col, answer_col]].dropna()
+            for row_index, question, answer in zip(qa.index, qa[question_col].astype(str), qa[answer_col].astype(str)):
+                question = " ".join(question.split())
+                key = question.lower()
+                # The first answer seen for a question wins; repeats add nothing to the index.
+                if key in seen or not self.is_trusted(question, answer):
+                    continue
+                seen.add(key)
+                entries.append({
+                    "question": question,
+                    "answer": answer.strip(),
+                    "source": file_path.name,
+                    "row_index": int(row_index)
+                })
+        return entries
+
+    def _load_or_build(self):
+        files = self._csv_files()
+        fingerprint = self._fingerprint(files)
+        meta_path = self.cache_dir / "faq_meta.json"
+        entries_path = self.cache_dir / "faq_entries.json"
+        embeddings_path = self.cache_dir / "faq_embeddings.npy"
+
+        if meta_path.exists() and entries_path.exists() and embeddings_path.exists():
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+                if meta.get("fingerprint") == fingerprint:
+                    with open(entries_path, 'r') as f:
+                        self._entries = json.load(f)
+                    self._embeddings = np.load(embeddings_path)
+                    print(f"📚 Loaded FAQ index with {len(self._entries)} questions")
+                    return
+            except Exception as e:
+                print(f"Warning: Could not load FAQ index, rebuilding: {e}")
+
+        start_time = time.time()
+        entries = self._collect_entries(files)
+        if entries:
+            embeddings = load_sentence_model().encode(
+                [entry["question"] for entry in entries],
+                batch_size=256,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            ).astype(np.float32)
+        else:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        np.save(embeddings_path, embeddings)
+        with open(entries_path, 'w') as f:
+            json.dump(entries, f)
+        with open(meta_path, 'w') as f:
+            json.dump({"fingerprint": fingerprint, "count": len(entries), "built_at": time.time()}, f)
+
+        self._entries = entries
+        self._embeddings = embeddings
+        print(f"📚 Built FAQ index with {len(entries)} questions in {time.time() - start_time:.1f}s")
+
+    def _ensure_loaded(self):
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._load_or_build()
+
+    @staticmethod
+    def _entities_compatible(question: str, stored_question: str) -> bool:
+        """A crop or state named in the new question must also appear in the stored one."""
+        asked = extract_entities(question)
+        stored = extract_entities(stored_question)
+        return set(asked.crops) <= set(stored.crops) and set(asked.states) <= set(stored.states)
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """Return the stored answer for the closest trusted question, or None below the threshold."""
+        self._ensure_loaded()
+        if not self._entries:
+            return None
+
+        query_embedding = load_sentence_model().encode([question], normalize_embeddings=True)[0].astype(np.float32)
+        similarities = self._embeddings @ query_embedding
+        best_idx = int(np.argmax(similarities))
+        similarity = float(similarities[best_idx])
+        entry = self._entries[best_idx]
+
+        if similarity < self.threshold or not self._entities_compatible(question, entry["question"]):
+            return None
+
+        answer = self.polish_answer(question, entry) if self.polish else entry["answer"]
+        return {
+            "answer": answer,
+            "matched_question": entry["question"],
+            "similarity": similarity,
+            "source": entry["source"],
+            "row_index": entry["row_index"],
+            "polished": self.polish
+        }
+
+    def polish_answer(self, question: str, entry: Dict[str, Any]) -> str:
+        if self._polisher is None:
+            self._polisher = Agent(
+                model=Gemini(id="gemini-2.0-flash"),
+                show_tool_calls=False,
+                markdown=True,
+                instructions="""You lightly edit a stored answer from an agricultural helpline so it reads as a direct reply to the farmer's question.
+Keep every fact, quantity and recommendation exactly as given and do not add new advice. Fix grammar and phrasing only. Reply with the edited answer alone."""
+            )
+        try:
+            response = self._polisher.run(
+                f"Farmer's question: {question}\nStored question: {entry['question']}\nStored answer: {entry['answer']}"
+            )
+            return response.content.strip() or entry["answer"]
+        except Exception as e:
+            print(f"Warning: FAQ answer polishing failed, using stored answer: {e}")
+            return entry["answer"]
+
+
+_faq_indexes: Dict[str, FAQIndex] = {}
+_faq_indexes_lock = threading.Lock()
+
+
+def get_faq_index(csv_dir) -> FAQIndex:
+    """Process-wide FAQIndex per CSV directory, so its questions and embeddings are loaded once."""
+    key = os.path.realpath(csv_dir)
+    with _faq_indexes_lock:
+        if key not in _faq_indexes:
+            _faq_indexes[key] = FAQIndex(csv_dir)
+        return _faq_indexes[key]
+
+
+def main():
+    faq_index = FAQIndex(Path(current_dir) / "Data" / "CSV")
+    for question in ["Name examples of compound fertilizers", "How do I control aphids on mustard?"]:
+        start_time = time.time()
+        hit = faq_index.lookup(question)
+        elapsed = time.time() - start_time
+        if hit:
+            print(f"{question} -> {hit['answer'][:100]} ({hit['source']}, similarity {hit['similarity']:.3f}, {elapsed:.3f}s)")
+        else:
+            print(f"{question} -> no FAQ match ({elapsed:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+from pydantic import BaseModel
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from langchain.globals import set_llm_cache
+
+from .document_scorer import load_sentence_model
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+llm_cache_path = os.path.join(current_dir, "cache", "llm_cache", "semantic_cache.sqlite")
+
+# Grader and classifier prompts have one correct structured answer, so a response
+# to a paraphrased question can be reused. Safe mode restricts semantic reuse to them.
+DETERMINISTIC_CALL_TYPES = {
+    "document_grader", "batch_document_grader", "answer_grader", "query_router"
+}
+# The hallucination grader's key text is the generation it judges: answers that differ only in a
+# dose, a number or a negation embed almost identically, so its verdicts are reused on exact repeats
+# only, even with safe mode off.
+EXACT_ONLY_CALL_TYPES = {"hallucination_grader"}
+
+DEFAULT_THRESHOLDS = {
+    "query_router": 0.92,
+    "document_grader": 0.95,
+    "batch_document_grader": 0.95,
+    "answer_grader": 0.95,
+    "generation": 0.98,
+}
+
+# Expired rows and the oldest rows over the entry cap are deleted on open and after every
+# PRUNE_EVERY inserts, so the table can exceed RAG_LLM_CACHE_MAX_ENTRIES by at most that many.
+PRUNE_EVERY = 200
+
+
+def normalize_prompt(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class SemanticLLMCache:
+    """
+    Embedding-indexed LLM response cache shared by the LangChain and agno call paths.
+
+    An entry is looked up by the normalized key text (usually the user question) within a
+    bucket of (call type, model, context digest): the context - documents or a generation
+    the prompt is about - must match exactly, while the key text only has to clear the
+    call type's cosine-similarity threshold. Exact repeats are served from the SQLite
+    table directly. With safe mode on (the default) only DETERMINISTIC_CALL_TYPES are
+    matched semantically; every other call type reuses exact repeats only. EXACT_ONLY_CALL_TYPES
+    are never matched semantically.
+
+    Entries expire after RAG_LLM_CACHE_TTL_HOURS (168, 0 keeps them forever) and at most
+    RAG_LLM_CACHE_MAX_ENTRIES (20000) are kept, oldest evicted first. The in-memory buckets
+    only mirror non-empty buckets of the table and are dropped whenever rows are evicted, so
+    they stay within the same cap.
+    """
+
+    def __init__(self, db_path: str = llm_cache_path, threshold: float = None, safe_mode: bool = None,
+                 max_entries: int = None, ttl_hours: float = None):
+        self.db_path = db_path
+        self.threshold = threshold if threshold is not None else float(os.getenv("RAG_LLM_CACHE_THRESHOLD", "0.95"))
+        if safe_mode is None:
+            safe_mode = os.getenv("RAG_LLM_CACHE_SAFE_MODE", "true").lower() in ("1", "true", "yes")
+        self.safe_mode = safe_mode
+        self.enabled = os.getenv("RAG_LLM_CACHE", "true").lower() in ("1", "true", "yes")
+        if max_entries is None:
+            max_entries = int(os.getenv("RAG_LLM_CACHE_MAX_ENTRIES", "20000"))
+        self.max_entries = max_entries
+        if ttl_hours is None:
+            ttl_hours = float(os.getenv("RAG_LLM_CACHE_TTL_HOURS", "168"))
+        self.ttl_seconds = ttl_hours * 3600
+        self._inserts = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._buckets: Dict[tuple, Dict[str, Any]] = {}
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY, call_type TEXT, namespace TEXT, context_digest TEXT, "
+            "exact_key TEXT UNIQUE, key_text TEXT, embedding BLOB, response TEXT, created_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_bucket ON entries (call_type, namespace, context_digest)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created_at)")
+        self.prune()
+
+    def threshold_for(self, call_type: str) -> float:
+        """RAG_LLM_CACHE_THRESHOLD_<CALL_TYPE> overrides the per-call-type default."""
+        override = os.getenv(f"RAG_LLM_CACHE_THRESHOLD_{call_type.upper()}")
+        if override:
+            return float(override)
+        return DEFAULT_THRESHOLDS.get(call_type, self.threshold)
+
+    def is_semantic(self, call_type: str) -> bool:
+        if call_type in EXACT_ONLY_CALL_TYPES:
+            return False
+        return not self.safe_mode or call_type in DETERMINISTIC_CALL_TYPES
+
+    @staticmethod
+    def _digest(*parts: str) -> str:
+        return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+
+    def _bucket(self, call_type: str, namespace: str, context_digest: str) -> Optional[Dict[str, Any]]:
+        """Semantic rows of one bucket, or None when it has none (empty buckets are not kept in memory)."""
+        key = (call_type, namespace, context_digest)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rows = self._conn.execute(
+                "SELECT embedding, response, created_at FROM entries WHERE call_type = ? AND namespace = ? "
+                "AND context_digest = ? AND embedding IS NOT NULL AND created_at >= ?",
+                (call_type, namespace, context_digest, self._cutoff())
+            ).fetchall()
+            if not rows:
+                return None
+            bucket = {
+                "embeddings": np.vstack([np.frombuffer(row[0], dtype=np.float32) for row in rows]),
+                "responses": [row[1] for row in rows],
+                "created_at": np.array([row[2] for row in rows], dtype=np.float64)
+            }
+            self._buckets[key] = bucket
+        return bucket
+
+    def prune(self) -> int:
+        """Delete expired entries and the oldest ones over max_entries; returns the number deleted."""
+        with self._lock:
+            return self._prune()
+
+    def _prune(self) -> int:
+        self._inserts = 0
+        with self._conn:
+            deleted = self._conn.execute("DELETE FROM entries WHERE created_at < ?", (self._cutoff(),)).rowcount
+            excess = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                deleted += self._conn.execute(
+                    "DELETE FROM entries WHERE id IN (SELECT id FROM entries ORDER BY created_at LIMIT ?)", (excess,)
+                ).rowcount
+        if deleted:
+            # Buckets are reloaded lazily from the pruned table.
+            self._buckets.clear()
+            self.evicted += deleted
+        return deleted
+
+    def lookup(self, call_type: str, key_text: str, context: str = "", namespace: str = "") -> Optional[str]:
+        if not self.enabled:
+            return None
+        normalized = normalize_prompt(key_text)
+        context_digest = self._digest(context)
+        exact_key = self._digest(call_type, namespace, context_digest, normalized)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM entries WHERE exact_key = ? AND created_at >= ?", (exact_key, self._cutoff())
+            ).fetchone()
+            if row is not None:
+                self.stats["exact_hits"] += 1
+                return row[0]
+            if not self.is_semantic(call_type):
+                self.stats["misses"] += 1
+                return None
+            bucket = self._bucket(call_type, namespace, context_digest)
+            if bucket is None:
+                self.stats["misses"] += 1
+                return None
+        query_embedding = load_sentence_model().encode([normalized], normalize_embeddings=True)[0].astype(np.float32)
+        with self._lock:
+            similarities = bucket["embeddings"] @ query_embedding
+            # Rows that expired since the bucket was loaded never match.
+            similarities[bucket["created_at"] < self._cutoff()] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold_for(call_type):
+                self.stats["semantic_hits"] += 1
+                return bucket["responses"][best]
+            self.stats["misses"] += 1
+            return None
+
+    def update(self, call_type: str, key_text: str, response: str, context: str = "", namespace: str = ""):
+        if not self.enabled:
+            return
+        normalized = normalize_prompt(key_text)
+        context_digest = self._digest(context)
+        exact_key = self._digest(call_type, namespace, context_digest, normalized)
+        embedding = None
+        if self.is_semantic(call_type):
+            embedding = load_sentence_model().encode([normalized], normalize_embeddings=True)[0].astype(np.float32)
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (call_type, namespace, context_digest, exact_key, key_text, embedding, response, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (call_type, namespace, context_digest, exact_key, normalized,
+                     embedding.tobytes() if embedding is not None else None, response, now)
+                )
+            bucket = self._buckets.get((call_type, namespace, context_digest))
+            if bucket is not None and embedding is not None:
+                bucket["embeddings"] = np.vstack([bucket["embeddings"], embedding])
+                bucket["responses"].append(response)
+                bucket["created_at"] = np.append(bucket["created_at"], now)
+            self._inserts += 1
+            if self._inserts >= PRUNE_EVERY:
+                self._prune()
+
+    def run_agent(self, agent, prompt: str, call_type: str, key_text: str = None, context: str = ""):
+        """
+        agno counterpart of the LangChain cache: returns agent.run(prompt).content, or the cached
+        content. key_text is what may be paraphrased (defaults to the prompt); context must match exactly.
+        """
+        namespace = getattr(getattr(agent, "model", None), "id", "") or ""
+        response_model = getattr(agent, "response_model", None)
+        cached = self.lookup(call_type, key_text or prompt, context=context, namespace=namespace)
+        if cached is not None:
+            try:
+                if response_model is not None:
+                    return response_model.model_validate_json(cached)
+                return cached
+            except Exception as e:
+                print(f"Warning: Ignoring unreadable cached response for {call_type}: {e}")
+
+        content = agent.run(prompt).content
+        if isinstance(content, BaseModel):
+            self.update(call_type, key_text or prompt, content.model_dump_json(), context=context, namespace=namespace)
+        elif isinstance(content, str):
+            self.update(call_type, key_text or prompt, content, context=context, namespace=namespace)
+        return content
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM entries")
+            self._buckets.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = sum(self.stats.values())
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            return {
+                **self.stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "safe_mode": self.safe_mode,
+                "entries": self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+                "max_entries": self.max_entries,
+                "ttl_hours": self.ttl_seconds / 3600,
+                "evicted": self.evicted
+            }
+
+
+class SemanticLangChainCache(BaseCache):
+    """LangChain LLM cache backed by SemanticLLMCache; every chain call is a "generation" call."""
+
+    def __init__(self, semantic_cache: SemanticLLMCache, call_type: str = "generation"):
+        self.semantic_cache = semantic_cache
+        self.call_type = call_type
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        cached = self.semantic_cache.lookup(self.call_type, prompt, namespace=llm_string)
+        if cached is None:
+            return None
+        try:
+            return [loads(generation) for generation in json.loads(cached)]
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable cached generation: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.semantic_cache.update(
+            self.call_type, prompt, json.dumps([dumps(generation) for generation in return_val]), namespace=llm_string
+        )
+
+    def clear(self, **kwargs: Any) -> None:
+        self.semantic_cache.clear()
+
+
+semantic_llm_cache = SemanticLLMCache()
+
+
+def install_langchain_cache():
+    set_llm_cache(SemanticLangChainCache(semantic_llm_cache))
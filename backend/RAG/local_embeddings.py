@@ -0,0 +1,136 @@
+import os
+import time
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from sentence_transformers import SentenceTransformer
+
+from .document_scorer import load_sentence_model
+from .embedding_store import get_embedding_store, embedding_store_dir
+
+RUNTIMES = ("torch", "onnx", "onnx-int8")
+# Quantized file published with the sentence-transformers hub models; built locally when missing.
+DEFAULT_INT8_FILE = "model_qint8_avx2.onnx"
+local_model_dir = os.path.join(os.path.dirname(embedding_store_dir), "local_models")
+
+
+def _onnx_kwargs(file_name: str, threads: Optional[int]) -> Dict:
+    import onnxruntime
+    session_options = onnxruntime.SessionOptions()
+    if threads:
+        session_options.intra_op_num_threads = threads
+        session_options.inter_op_num_threads = 1
+    return {"file_name": file_name, "provider": "CPUExecutionProvider", "session_options": session_options}
+
+
+def _int8_onnx_model(model_name: str, threads: Optional[int]) -> SentenceTransformer:
+    file_name = os.getenv("RAG_ONNX_INT8_FILE", DEFAULT_INT8_FILE)
+    try:
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs=_onnx_kwargs(file_name, threads))
+    except Exception as e:
+        print(f"No prebuilt {file_name} for {model_name} ({e}); quantizing it locally")
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+    local_path = os.path.join(local_model_dir, model_name.replace("/", "_") + "-onnx")
+    if not os.path.exists(os.path.join(local_path, "onnx", DEFAULT_INT8_FILE)):
+        model = SentenceTransformer(model_name, backend="onnx", model_kwargs=_onnx_kwargs("model.onnx", threads))
+        model.save(local_path)
+        export_dynamic_quantized_onnx_model(model, quantization_config="avx2", model_name_or_path=local_path)
+    return SentenceTransformer(local_path, backend="onnx", model_kwargs=_onnx_kwargs(DEFAULT_INT8_FILE, threads))
+
+
+@lru_cache(maxsize=None)
+def load_local_embedding_model(model_name: str, runtime: str, threads: Optional[int]) -> SentenceTransformer:
+    """One model instance per (model, runtime, threads) in the process."""
+    start_time = time.time()
+    if runtime == "onnx-int8":
+        model = _int8_onnx_model(model_name, threads)
+    elif runtime == "onnx":
+        model = SentenceTransformer(model_name, backend="onnx", model_kwargs=_onnx_kwargs("model.onnx", threads))
+    else:
+        if threads:
+            import torch
+            # Process-wide: also applies to the scorer/reranker models.
+            torch.set_num_threads(threads)
+        # Same instance as FastQuerySummaryScorer and the FAQ index when the model matches.
+        model = load_sentence_model(model_name)
+    print(f"Loaded local embedding model {model_name} ({runtime}) in {time.time() - start_time:.2f}s")
+    return model
+
+
+def _env_threads() -> Optional[int]:
+    value = os.getenv("RAG_EMBED_THREADS")
+    if not value:
+        return None
+    try:
+        threads = int(value)
+        if threads > 0:
+            return threads
+    except ValueError:
+        pass
+    print(f"Warning: Invalid RAG_EMBED_THREADS '{value}', using the runtime default")
+    return None
+
+
+class LocalEmbeddings:
+    """
+    CPU sentence-transformer embeddings with the same interface and store cache as MyEmbeddings.
+
+    Configured by RAG_LOCAL_EMBEDDING_MODEL (all-MiniLM-L6-v2), RAG_LOCAL_EMBEDDING_RUNTIME
+    (torch, onnx or onnx-int8), RAG_LOCAL_EMBED_BATCH_SIZE (64) and RAG_EMBED_THREADS. Vectors
+    are L2-normalized, so FAISS L2 ranking equals cosine ranking. Nothing leaves the machine once
+    the model files are in the Hugging Face cache (set HF_HUB_OFFLINE=1 when air-gapped).
+    """
+
+    def __init__(self, model: str = None, runtime: str = None, batch_size: int = None, threads: int = None):
+        self.model = model or os.getenv("RAG_LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+        self.runtime = (runtime or os.getenv("RAG_LOCAL_EMBEDDING_RUNTIME", "torch")).lower()
+        if self.runtime not in RUNTIMES:
+            print(f"Warning: Unknown RAG_LOCAL_EMBEDDING_RUNTIME '{self.runtime}', using 'torch'")
+            self.runtime = "torch"
+        self.batch_size = batch_size or int(os.getenv("RAG_LOCAL_EMBED_BATCH_SIZE", "64"))
+        self.threads = threads or _env_threads()
+        self.sentence_model = load_local_embedding_model(self.model, self.runtime, self.threads)
+        # int8 vectors differ slightly from fp32 ones, so each runtime caches separately.
+        self.store = get_embedding_store(f"local-{self.model}-{self.runtime}")
+
+    def __call__(self, text):
+        """Make the class callable for FAISS compatibility"""
+        return self.embed_query(text)
+
+    def describe(self) -> Dict[str, str]:
+        return {"backend": "local", "model": self.model, "runtime": self.runtime}
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        """Uncached batched inference."""
+        return self.sentence_model.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        ).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        start_time = time.time()
+        hashes = [hashlib.md5(text.encode()).hexdigest() for text in texts]
+        cached = self.store.get_many(set(hashes))
+        uncached = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached and text_hash not in uncached:
+                uncached[text_hash] = text
+
+        if uncached:
+            embeddings = self.encode(list(uncached.values()))
+            new = dict(zip(uncached, embeddings))
+            self.store.put_many(new.items())
+            cached.update(new)
+            elapsed = time.time() - start_time
+            print(f"Embedded {len(uncached)} new texts locally ({len(texts) - len(uncached)} cached) in "
+                  f"{elapsed:.2f}s: {len(uncached) / max(elapsed, 1e-9):.1f} texts/s")
+        return [cached[text_hash] for text_hash in hashes]
+
+    def embed_query(self, query: str) -> List[float]:
+        query_hash = hashlib.md5(query.encode()).hexdigest()
+        cached = self.store.get(query_hash)
+        if cached is not None:
+            return cached
+        embedding = self.encode([query])[0]
+        self.store.put(query_hash, embedding)
+        return embedding
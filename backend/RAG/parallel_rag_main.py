@@ -3,9 +3,10 @@ import sys
 import asyncio
 import concurrent.futures
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 import time
 import hashlib
+import threading
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
@@ -19,24 +20,50 @@ from .workflow import Workflow
 from agno.agent import Agent
 from agno.models.google import Gemini
 from .document_scorer import FastQuerySummaryScorer
+from .cache_store import get_workflow_cache_store
+from .query_classification import QueryClassification, query_classifier
+from .faq_index import get_faq_index
+from .Data.dedup import ensure_dedup_manifest, dedup_version
+from .retrieval_cache import retrieval_cache
+from .llm_cache import semantic_llm_cache
+from .Agents.agent_pool import agent_pool
+from .search_cache import web_search_cache
+from .vector_index import mapped_memory
+from .embedding_store import get_embedding_store_stats
 from pydantic import BaseModel  
 
 
 
 load_dotenv()
 
+OFF_TOPIC_MESSAGE = ("I specialize in agricultural assistance. I can help you with farming practices, crop management, "
+                     "weather, market prices and other agriculture-related topics.")
+
+_dedup_stats: Dict[str, Any] = {}
+_dedup_lock = threading.Lock()
+
 class GeneralQuestion(BaseModel):
     agriculture_related : bool
     generation : str
 
 class ParallelRAGSystem:
-    def __init__(self, model="gemini-2.0-flash", k=3):
+    def __init__(self, model="gemini-2.0-flash", k=3, max_fanout=3, fanout_score_gap=0.05, early_exit=True, cache_budget_mb=None, use_faq_index=True, dedup=True):
         self.model = model
         self.k = k
+        # Fan-out policy: files whose score is within fanout_score_gap of the best
+        # file are processed together (up to max_fanout), otherwise only the top one.
+        self.max_fanout = max_fanout
+        self.fanout_score_gap = fanout_score_gap
+        self.early_exit = early_exit
         self.api_key = os.getenv("GOOGLE_API_KEY")  
         self.data_dir = Path(current_dir) / "Data"
         self.cache_base = Path(cache_base_dir)
+        # Shared with every other ParallelRAGSystem in the process (and, via its manifest lock, other workers).
+        self.cache_store = get_workflow_cache_store(self.cache_base, budget_mb=cache_budget_mb)
         self.document_scorer = FastQuerySummaryScorer()
+        self.dedup_stats = self._prepare_dedup() if dedup else None
+        # Near-duplicates of stored Q&A questions are answered straight from the CSVs.
+        self.faq_index = get_faq_index(self.data_dir / "CSV") if use_faq_index else None
         
         self.query_router = Agent(
             model=Gemini(id="gemini-2.0-flash"),
@@ -92,6 +119,21 @@ When responding to questions, draw upon your extensive knowledge to provide clea
 Respond as a trusted advisor who understands both the science and the practical realities of farming operations."""
         )
     
+    def _prepare_dedup(self) -> Dict[str, Any]:
+        # Once per process and CSV directory: fingerprinting every CSV per system is wasted work.
+        csv_dir = str(self.data_dir / "CSV")
+        with _dedup_lock:
+            if csv_dir not in _dedup_stats:
+                try:
+                    manifest = ensure_dedup_manifest(csv_dir)
+                    stats = manifest["stats"]
+                    print(f"🧹 Dedup: {stats['total_rows']} rows -> {stats['canonical_rows']} ({stats['compression_ratio']:.2f}x)")
+                    _dedup_stats[csv_dir] = stats
+                except Exception as e:
+                    print(f"Warning: Near-duplicate pass failed, indexing all rows: {e}")
+                    _dedup_stats[csv_dir] = None
+            return _dedup_stats[csv_dir]
+    
     def get_data_files(self) -> List[Path]:
         supported_extensions = ['.csv', '.pdf']
         data_files = []
@@ -135,7 +177,7 @@ Respond as a trusted advisor who understands both the science and the practical
         except:
             return file_path.name
     
-    def score_and_select_files(self, question: str, data_files: List[Path], top_k: int = 2) -> List[Path]:
+    def score_files(self, question: str, data_files: List[Path]) -> List[tuple]:
         print(f"Scoring {len(data_files)} files against query...")
         
         file_summaries = []
@@ -143,7 +185,10 @@ Respond as a trusted advisor who understands both the science and the practical
             preview = self.get_file_preview(file_path)
             file_summaries.append(preview)
         
-        scores = self.document_scorer.batch_score_summaries(question, file_summaries, "ultimate")
+        return self.document_scorer.batch_score_summaries(question, file_summaries, "ultimate")
+    
+    def score_and_select_files(self, question: str, data_files: List[Path], top_k: int = 2) -> List[Path]:
+        scores = self.score_files(question, data_files)
         
         top_indices = [idx for idx, score in scores[:top_k]]
         selected_files = [data_files[i] for i in top_indices]
@@ -154,17 +199,38 @@ Respond as a trusted advisor who understands both the science and the practical
         
         return selected_files
     
+    def select_files_by_score_gap(self, question: str, data_files: List[Path]) -> List[Path]:
+        """Pick one file when the best one clearly wins, more when the top scores are close."""
+        scores = self.score_files(question, data_files)
+        if not scores:
+            return []
+        
+        top_score = scores[0][1]
+        selected = [
+            (idx, score) for idx, score in scores[:self.max_fanout]
+            if top_score - score <= self.fanout_score_gap
+        ]
+        selected_files = [data_files[idx] for idx, _ in selected]
+        
+        runner_up = f"{scores[1][1]:.3f}" if len(scores) > 1 else "n/a"
+        print(f"Adaptive fan-out: top score {top_score:.3f}, runner-up {runner_up}, gap threshold {self.fanout_score_gap:.3f}")
+        print(f"Selected {len(selected_files)} file(s):")
+        for i, (idx, score) in enumerate(selected):
+            print(f"   {i+1}. Score: {score:.3f} - {data_files[idx].name}")
+        
+        return selected_files
+    
     def get_file_cache_id(self, file_path: Path) -> str:
-        file_info = f"{file_path.name}_{file_path.stat().st_size}_{file_path.stat().st_mtime}"
+        # The dedup version changes whenever rows of this file are dropped or merged differently.
+        file_info = f"{file_path.name}_{file_path.stat().st_size}_{file_path.stat().st_mtime}_{dedup_version(file_path.name)}"
         return hashlib.md5(file_info.encode()).hexdigest()[:8]
     
     def setup_workflow_cache(self, file_path: Path) -> str:
         cache_id = self.get_file_cache_id(file_path)
-        workflow_cache_dir = self.cache_base / f"workflow_{cache_id}"
-        workflow_cache_dir.mkdir(exist_ok=True)
-        return str(workflow_cache_dir)
+        return self.cache_store.acquire(cache_id, file_path.name)
     
-    def run_single_workflow(self, file_path: Path, question: str) -> Dict[str, Any]:
+    def run_single_workflow(self, file_path: Path, question: str, cancel_event: threading.Event = None, classification: QueryClassification = None) -> Dict[str, Any]:
+        cache_id = self.get_file_cache_id(file_path)
         try:
             print(f"Processing: {file_path.name}")
             workflow_cache_dir = self.setup_workflow_cache(file_path)
@@ -175,11 +241,13 @@ Respond as a trusted advisor who understands both the science and the practical
                 file_path=str(file_path),
                 cache_dir=workflow_cache_dir  
             )
-            inputs = {"question": question}
+            inputs = {"question": question, "classification": classification}
             start_time = time.time()
-            result = workflow.run_workflow(inputs)
+            result = workflow.run_workflow(inputs, cancel_event=cancel_event)
             end_time = time.time()
             print("response: ", result)
+            if result.get('cancelled'):
+                raise RuntimeError("workflow cancelled after another file answered the question")
             response = result.get('generation', '')
             extractions = result.get('extractions', '') 
 
@@ -188,6 +256,9 @@ Respond as a trusted advisor who understands both the science and the practical
                 "file_path": str(file_path),
                 "file_type": file_path.suffix,
                 "success": True,
+                "grader_passed": result.get('grader_passed', False),
+                "grading_stats": result.get('grading_stats', {}),
+                "generation_grade": result.get('generation_grade'),
                 "response": response,
                 "processing_time": end_time - start_time,
                 "workflow_type": result.get('workflow_type', 'standard'),
@@ -202,6 +273,7 @@ Respond as a trusted advisor who understands both the science and the practical
                 "file_path": str(file_path),
                 "file_type": file_path.suffix,
                 "success": False,
+                "grader_passed": False,
                 "response": "",
                 "processing_time": 0,
                 "workflow_type": "failed",
@@ -209,19 +281,25 @@ Respond as a trusted advisor who understands both the science and the practical
                 "cache_dir": "",
                 "error": str(e)
             }
+        finally:
+            self.cache_store.release(cache_id)
     
-    def run_parallel_workflows(self, question: str, selected_files: List[Path], max_workers: int = None) -> List[Dict[str, Any]]:
+    def is_confident_result(self, result: Dict[str, Any]) -> bool:
+        return bool(result.get("success") and result.get("response") and result.get("grader_passed"))
+    
+    def iter_workflow_results(self, question: str, selected_files: List[Path], max_workers: int = None, classification: QueryClassification = None) -> Iterator[Dict[str, Any]]:
+        """Yield workflow results in completion order; closing the iterator cancels the rest."""
         if max_workers is None or max_workers > len(selected_files):
             max_workers = len(selected_files)
         
         print(f"\nStarting parallel processing with {max_workers} workers for {len(selected_files)} selected files...")
         
-        results = []
-        successful_count = 0
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        cancel_event = threading.Event()
+        completed = 0
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        try:
             future_to_file = {
-                executor.submit(self.run_single_workflow, file_path, question): file_path
+                executor.submit(self.run_single_workflow, file_path, question, cancel_event, classification): file_path
                 for file_path in selected_files
             }
             
@@ -229,25 +307,69 @@ Respond as a trusted advisor who understands both the science and the practical
                 file_path = future_to_file[future]
                 try:
                     result = future.result()
-                    results.append(result)
-                    
-                    if result["success"]:
-                        successful_count += 1
-                    
-                    status = "✅" if result["success"] else "❌"
-                    print(f"{status} Completed: {file_path.name} ({successful_count}/{len(selected_files)} processed)")
-                        
                 except Exception as e:
                     print(f"❌ Exception for {file_path.name}: {str(e)}")
-                    results.append({
+                    result = {
                         "file_name": file_path.name,
                         "success": False,
                         "error": str(e)
-                    })
+                    }
+                completed += 1
+                yield result
+        finally:
+            # Pending workflows are dropped; running ones stop at their next graph node.
+            if completed < len(selected_files):
+                cancel_event.set()
+            executor.shutdown(wait=not cancel_event.is_set(), cancel_futures=True)
+    
+    def run_parallel_workflows(self, question: str, selected_files: List[Path], max_workers: int = None, early_exit: bool = False, classification: QueryClassification = None) -> List[Dict[str, Any]]:
+        results = []
+        successful_count = 0
+        
+        result_iter = self.iter_workflow_results(question, selected_files, max_workers, classification)
+        try:
+            for result in result_iter:
+                results.append(result)
+                
+                if result["success"]:
+                    successful_count += 1
+                
+                status = "✅" if result["success"] else "❌"
+                print(f"{status} Completed: {result['file_name']} ({successful_count}/{len(selected_files)} processed)")
+                
+                remaining = len(selected_files) - len(results)
+                if early_exit and remaining and self.is_confident_result(result):
+                    print(f"Early exit: {result['file_name']} passed grading, cancelling {remaining} remaining workflow(s)")
+                    break
+        finally:
+            result_iter.close()
         
         print(f"✅ Processing completed with {successful_count} successful results out of {len(results)} processed files")
         return results
     
+    def classify_query(self, question: str, classification: QueryClassification = None) -> QueryClassification:
+        """Reuse the request's classification; the Gemini router only runs when no guardrail has decided the domain."""
+        if classification is None:
+            classification = query_classifier.classify(question)
+        if not classification.has_domain:
+            router_result = semantic_llm_cache.run_agent(self.query_router, question, "query_router")
+            query_classifier.apply_domain(classification, router_result)
+        if not classification.has_domain:
+            # Unparseable router verdict: answer from the corpus rather than refusing with no message.
+            print("Warning: Could not parse the query router verdict, treating the query as agriculture-related")
+            classification.is_agriculture_related = True
+            classification.domain = "agriculture"
+        return classification
+    
+    def lookup_faq(self, question: str) -> Dict[str, Any]:
+        if self.faq_index is None:
+            return None
+        try:
+            return self.faq_index.lookup(question)
+        except Exception as e:
+            print(f"Warning: FAQ lookup failed, continuing with retrieval: {e}")
+            return None
+    
     def synthesize_results(self, question: str, workflow_results: List[Dict[str, Any]]) -> str:
         successful_results = [r for r in workflow_results if r["success"] and r["response"]]
 
@@ -279,16 +401,89 @@ Respond as a trusted advisor who understands both the science and the practical
 
         return synthesized_response.content
     
-    def process_query(self, question: str, max_workers: int = None) -> Dict[str, Any]:
+    def synthesize_results_streaming(self, question: str, workflow_results: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Emit an answer from the first successful result, then refine it as later results arrive."""
+        current_answer = None
+        
+        for result in workflow_results:
+            if not (result.get("success") and result.get("response")):
+                continue
+            
+            information = [str(result['response'])]
+            if result.get('extractions'):
+                information.append(f"Key Points: {result['extractions']}")
+            information_str = "\n".join(information)
+            
+            if current_answer is None:
+                prompt = "\n".join([
+                    f"Based on your extensive agricultural knowledge and expertise, provide a comprehensive answer to this question: {question}",
+                    "",
+                    "Available information from research and field data:",
+                    information_str,
+                    "",
+                    "Present your response as if you are sharing your own knowledge and experience, without referencing any external sources or documents. Focus on practical guidance and actionable recommendations."
+                ])
+                print(f"Synthesizing initial answer from {result['file_name']}...")
+                content = self.synthesizer.run(prompt).content
+                current_answer = content
+                yield {"type": "initial", "file_name": result["file_name"], "content": content}
+                continue
+            
+            prompt = "\n".join([
+                f"You already gave this answer to the question \"{question}\":",
+                current_answer,
+                "",
+                "New information from research and field data has arrived:",
+                information_str,
+                "",
+                "Write only the additions or corrections that this new information brings, in the same voice, so they can be appended to the answer above.",
+                "If it adds nothing new, reply with exactly NO_UPDATE."
+            ])
+            print(f"Refining answer with {result['file_name']}...")
+            content = self.synthesizer.run(prompt).content
+            if not content or content.strip() == "NO_UPDATE":
+                continue
+            current_answer = f"{current_answer}\n\n{content}"
+            yield {"type": "refinement", "file_name": result["file_name"], "content": content}
+        
+        if current_answer is None:
+            yield {"type": "initial", "file_name": None, "content": "I don't have sufficient information to answer this question comprehensively."}
+    
+    def stream_query(self, question: str, max_workers: int = None, classification: QueryClassification = None) -> Iterator[Dict[str, Any]]:
+        """Streaming variant of process_query: clients get content after the fastest retrieval."""
+        classification = self.classify_query(question, classification)
+        
+        if not classification.is_agriculture_related:
+            yield {"type": "initial", "file_name": None, "content": classification.response_message or OFF_TOPIC_MESSAGE}
+            return
+        
+        faq_hit = self.lookup_faq(question)
+        if faq_hit:
+            yield {"type": "initial", "file_name": faq_hit["source"], "content": faq_hit["answer"]}
+            return
+        
+        all_data_files = self.get_data_files()
+        if not all_data_files:
+            yield {"type": "error", "file_name": None, "content": "No data files found"}
+            return
+        
+        selected_files = self.select_files_by_score_gap(question, all_data_files)
+        result_iter = self.iter_workflow_results(question, selected_files, max_workers, classification)
+        try:
+            yield from self.synthesize_results_streaming(question, result_iter)
+        finally:
+            result_iter.close()
+    
+    def process_query(self, question: str, max_workers: int = None, classification: QueryClassification = None) -> Dict[str, Any]:
         print("=" * 80)
         print("🌾 PARALLEL RAG SYSTEM WITH DOCUMENT SCORING")
         print("=" * 80)
         
         start_time = time.time()
         
-        router_result = self.query_router.run(question).content
+        classification = self.classify_query(question, classification)
         
-        if not router_result.agriculture_related:
+        if not classification.is_agriculture_related:
             end_time = time.time()
             total_time = end_time - start_time
             return {
@@ -298,19 +493,38 @@ Respond as a trusted advisor who understands both the science and the practical
                 "total_files_processed": 0,
                 "successful_workflows": 0,
                 "failed_workflows": 0,
+                "cancelled_workflows": 0,
                 "individual_results": [],
-                "synthesized_answer": router_result.generation,
+                "synthesized_answer": classification.response_message or OFF_TOPIC_MESSAGE,
                 "total_processing_time": total_time,
                 "average_time_per_file": 0
             }
         
+        faq_hit = self.lookup_faq(question)
+        if faq_hit:
+            print(f"⚡ FAQ match ({faq_hit['similarity']:.3f}) from {faq_hit['source']}: {faq_hit['matched_question']}")
+            return {
+                "question": question,
+                "total_files_available": 0,
+                "files_selected": 0,
+                "total_files_processed": 0,
+                "successful_workflows": 0,
+                "failed_workflows": 0,
+                "cancelled_workflows": 0,
+                "individual_results": [],
+                "synthesized_answer": faq_hit["answer"],
+                "faq_match": faq_hit,
+                "total_processing_time": time.time() - start_time,
+                "average_time_per_file": 0
+            }
+        
         all_data_files = self.get_data_files()
         if not all_data_files:
             return {"error": "No data files found"}
 
-        selected_files = self.score_and_select_files(question, all_data_files, top_k = 2)
+        selected_files = self.select_files_by_score_gap(question, all_data_files)
 
-        workflow_results = self.run_parallel_workflows(question, selected_files, max_workers)
+        workflow_results = self.run_parallel_workflows(question, selected_files, max_workers, early_exit=self.early_exit, classification=classification)
         
         synthesized_answer = self.synthesize_results(question, workflow_results)
         
@@ -327,6 +541,7 @@ Respond as a trusted advisor who understands both the science and the practical
             "total_files_processed": len(workflow_results),
             "successful_workflows": successful_count,
             "failed_workflows": failed_count,
+            "cancelled_workflows": len(selected_files) - len(workflow_results),
             "individual_results": workflow_results,
             "synthesized_answer": synthesized_answer,
             "total_processing_time": total_time,
@@ -334,28 +549,27 @@ Respond as a trusted advisor who understands both the science and the practical
         }
     
     def clear_all_caches(self):
-        import shutil
-        if self.cache_base.exists():
-            shutil.rmtree(self.cache_base)
-            print(f"🗑️ Cleared all parallel workflow caches")
+        self.cache_store.clear()
+        print(f"🗑️ Cleared all parallel workflow caches")
     
     def get_cache_info(self) -> Dict[str, Any]:
-        if not self.cache_base.exists():
-            return {"total_caches": 0, "total_size_mb": 0}
-        
-        cache_dirs = list(self.cache_base.glob("workflow_*"))
-        total_size = 0
-        
-        for cache_dir in cache_dirs:
-            for file_path in cache_dir.rglob("*"):
-                if file_path.is_file():
-                    total_size += file_path.stat().st_size
-        
-        return {
-            "total_caches": len(cache_dirs),
-            "total_size_mb": total_size / (1024 * 1024),
-            "cache_directories": [d.name for d in cache_dirs]
+        info = self.cache_store.info()
+        if self.dedup_stats:
+            info["dedup_compression_ratio"] = self.dedup_stats["compression_ratio"]
+        info["retrieval_cache"] = retrieval_cache.stats()
+        info["llm_cache"] = semantic_llm_cache.get_stats()
+        info["search_cache"] = web_search_cache.get_stats()
+        info["embedding_store"] = get_embedding_store_stats()
+        # Memory-mapped workflow FAISS indexes: resident pages are shared page cache, not heap.
+        index_memory = mapped_memory()
+        info["vector_index_memory"] = {
+            "mapped_indexes": len(index_memory),
+            "mapped_mb": sum(usage["mapped_mb"] for usage in index_memory.values()),
+            "resident_mb": sum(usage["resident_mb"] for usage in index_memory.values())
         }
+        # Constructions per agent class should level off at peak concurrency, not grow per query.
+        info["agent_pool"] = agent_pool.get_stats()
+        return info
 
 def main():
     parallel_rag = ParallelRAGSystem(
@@ -390,6 +604,13 @@ def main():
     print("="*80)
     print(f"Question: {result['question']}")
     
+    if result.get('faq_match'):
+        faq_match = result['faq_match']
+        print(f"FAQ answer from {faq_match['source']} (similarity {faq_match['similarity']:.3f}):")
+        print(result['synthesized_answer'])
+        print(f"Total Time: {result['total_processing_time']:.2f}s")
+        return
+    
     if result.get('total_files_available', 0) == 0 and result.get('files_selected', 0) == 0:
         print("Non-agriculture query - Direct response:")
         print(result['synthesized_answer'])
@@ -0,0 +1,357 @@
+import re
+import math
+from functools import lru_cache
+from typing import List, Optional, Any
+from pydantic import BaseModel, Field
+
+# Shared, per-request query classification. The guardrails agent, the parallel RAG
+# router, ADAPTIVE_RAG's complexity routing and the Deep Research planner all read
+# the same QueryClassification instead of classifying the query again.
+
+CROPS = [
+    'rice', 'paddy', 'wheat', 'maize', 'corn', 'barley', 'millet', 'bajra', 'jowar', 'sorghum', 'ragi',
+    'cotton', 'jute', 'sugarcane', 'soybean', 'groundnut', 'peanut', 'mustard', 'sunflower', 'sesame',
+    'chickpea', 'gram', 'lentil', 'pigeon pea', 'tur', 'moong', 'urad', 'pulses',
+    'potato', 'tomato', 'onion', 'brinjal', 'okra', 'cabbage', 'cauliflower', 'chilli', 'garlic', 'ginger',
+    'turmeric', 'banana', 'mango', 'grapes', 'apple', 'orange', 'pomegranate', 'papaya', 'coconut',
+    'tea', 'coffee', 'rubber', 'cardamom', 'pepper', 'cashew', 'arecanut'
+]
+
+STATES = [
+    'andhra pradesh', 'arunachal pradesh', 'assam', 'bihar', 'chhattisgarh', 'goa', 'gujarat', 'haryana',
+    'himachal pradesh', 'jharkhand', 'karnataka', 'kerala', 'madhya pradesh', 'maharashtra', 'manipur',
+    'meghalaya', 'mizoram', 'nagaland', 'odisha', 'orissa', 'punjab', 'rajasthan', 'sikkim', 'tamil nadu',
+    'telangana', 'tripura', 'uttar pradesh', 'uttarakhand', 'west bengal', 'jammu and kashmir', 'ladakh',
+    'delhi', 'puducherry', 'chandigarh', 'andaman and nicobar', 'lakshadweep'
+]
+
+COMMODITIES = [
+    'rice', 'paddy', 'wheat', 'maize', 'barley', 'bajra', 'jowar', 'cotton', 'jute', 'sugarcane', 'soybean',
+    'groundnut', 'mustard', 'sunflower', 'chickpea', 'gram', 'lentil', 'tur', 'moong', 'urad',
+    'potato', 'tomato', 'onion', 'garlic', 'ginger', 'turmeric', 'chilli', 'coriander', 'cumin',
+    'banana', 'apple', 'coconut', 'copra', 'tea', 'coffee', 'rubber', 'cardamom', 'pepper', 'cashew',
+    'milk', 'egg', 'fertilizer', 'urea', 'dap'
+]
+
+class QueryEntities(BaseModel):
+    crops: List[str] = Field(default_factory=list)
+    states: List[str] = Field(default_factory=list)
+    commodities: List[str] = Field(default_factory=list)
+
+class QueryClassification(BaseModel):
+    question: str
+    domain: str = Field(default="unknown", description="agriculture, greeting, general, inappropriate or unknown")
+    is_agriculture_related: Optional[bool] = Field(default=None, description="None until a guardrail or router has decided")
+    is_greeting: bool = False
+    response_message: Optional[str] = None
+    confidence_score: float = 0.0
+    intent: str = "informational"
+    complexity_vector: List[float] = Field(default_factory=list)
+    total_complexity: float = 0.0
+    complexity: float = 0.0
+    entities: QueryEntities = Field(default_factory=QueryEntities)
+
+    @property
+    def has_domain(self) -> bool:
+        return self.is_agriculture_related is not None
+
+
+INTENT_PATTERNS = {
+    'diagnostic': [r'diagnose\b', r'identify.*problem\b', r'symptoms\b', r'deficiency\b'],
+    'optimization': [r'optimize\b', r'maximize.*yield\b', r'improve.*productivity\b'],
+    'planning': [r'plan.*cultivation\b', r'schedule.*planting\b', r'timing\b'],
+    'comparative': [r'compare.*varieties\b', r'best.*cultivar\b', r'versus\b'],
+    'predictive': [r'predict.*yield\b', r'forecast.*weather\b', r'estimate.*production\b'],
+    'management': [r'manage\b', r'control\b', r'prevent\b', r'strategy\b']
+}
+
+INTENT_WEIGHTS = {
+    'diagnostic': 3.0, 'optimization': 2.8, 'predictive': 2.5,
+    'planning': 2.0, 'management': 1.8, 'comparative': 1.5
+}
+
+
+LINGUISTIC_HIGH_WORDS = ['explain', 'analyze', 'evaluate', 'assess', 'discuss', 'examine', 'critique',
+                         'justify', 'demonstrate', 'synthesize', 'interpret']
+LINGUISTIC_MEDIUM_WORDS = ['how', 'why', 'compare', 'contrast', 'describe', 'identify', 'summarize']
+LINGUISTIC_SIMPLE_WORDS = ['what', 'when', 'where', 'who', 'which']
+COMPARATIVE_WORDS = ['more', 'less', 'better', 'worse', 'most', 'least']
+CONDITIONAL_WORDS = ['if', 'suppose', 'assuming', 'given that', 'provided that']
+CLAUSE_INDICATORS = [',', ';', ':', ' and ', ' or ', ' but ', ' however ', ' therefore ']
+
+AGRICULTURE_DOMAINS = {
+    'crop_science': ['crop', 'cultivation', 'planting', 'harvest', 'yield', 'seeds', 'germination'],
+    'soil_science': ['soil', 'fertility', 'nutrients', 'nitrogen', 'phosphorus', 'potassium', 'ph'],
+    'pest_management': ['pest', 'disease', 'insect', 'fungus', 'virus', 'bacteria', 'weed'],
+    'water_management': ['irrigation', 'water', 'drought', 'rainfall', 'precipitation'],
+    'climate_weather': ['climate', 'weather', 'temperature', 'humidity', 'frost'],
+    'technology_precision': ['precision agriculture', 'gps', 'remote sensing', 'drones', 'sensors'],
+    'economics_policy': ['subsidy', 'market', 'price', 'cost', 'profit', 'economics'],
+    'livestock_animal': ['livestock', 'cattle', 'dairy', 'poultry', 'pig', 'sheep'],
+    'post_harvest': ['storage', 'processing', 'packaging', 'transportation']
+}
+DOMAIN_WEIGHTS = {
+    'technology_precision': 3.0, 'soil_science': 2.5, 'pest_management': 2.5,
+    'climate_weather': 2.0, 'water_management': 2.0, 'economics_policy': 2.0,
+    'crop_science': 1.5, 'livestock_animal': 1.5, 'post_harvest': 1.5
+}
+TECHNICAL_TERMS = ['agroecology', 'biotechnology', 'genomics', 'phenotyping', 'bioinformatics']
+TECHNICAL_INDICATORS = [
+    'physiological', 'biochemical', 'molecular', 'cellular', 'genetic',
+    'morphological', 'phenotypic', 'genotypic', 'metabolic', 'enzymatic'
+]
+CONCEPT_SEPARATORS = ['crop and soil', 'pest and disease', 'irrigation and fertilization']
+PROCESS_WORDS = ['preparation', 'planting', 'maintenance', 'harvesting', 'post-harvest']
+MEASUREMENT_PATTERNS = [
+    r'\d+\s*(kg|ton|hectare|acre|liter|ml|ppm|ph|°c|°f)',
+    r'\d+%\s*(moisture|protein|fat|fiber)',
+    r'\d+\s*(days|weeks|months)\s*(after|before)'
+]
+
+
+class QueryFeatureExtractor:
+    """
+    Precompiled extraction of every lexical feature the complexity score uses, in one call.
+
+    - whole-word cues are looked up in the query's token set;
+    - substring cues are plain `in` checks over the lowercased query (a C-level scan per
+      term, far cheaper than one alternation regex over all of them);
+    - each intent pattern runs only when all of its literal words occur in the query, and
+      the measurement patterns only when the query has a digit, so most queries run at most
+      a few of the precompiled regexes instead of all of them.
+
+    This roughly halves the cost of a first-time query compared with the old per-call
+    re.search loops; the much larger gain on repeated queries comes from the lru_cache on
+    _query_features, not from the extraction itself.
+    """
+
+    _token_re = re.compile(r'\w+')
+    _digit_re = re.compile(r'\d')
+
+    def __init__(self):
+        # Intent patterns are literal words joined by '.*' and ended by '\b': each word must occur.
+        self.intent_patterns = [
+            (pattern, pattern.replace(r'\b', '').split('.*'), re.compile(pattern))
+            for patterns in INTENT_PATTERNS.values() for pattern in patterns
+        ]
+        self.measurement_patterns = [(pattern, re.compile(pattern)) for pattern in MEASUREMENT_PATTERNS]
+        self.terms = sorted(set(
+            CONDITIONAL_WORDS + TECHNICAL_TERMS + TECHNICAL_INDICATORS + CONCEPT_SEPARATORS + PROCESS_WORDS +
+            [term for domain_terms in AGRICULTURE_DOMAINS.values() for term in domain_terms]
+        ))
+
+    def extract(self, question):
+        question_lower = question.lower()
+        matched_patterns = {
+            pattern for pattern, literals, compiled in self.intent_patterns
+            if all(literal in question_lower for literal in literals) and compiled.search(question_lower)
+        }
+        if self._digit_re.search(question_lower):
+            matched_patterns.update(
+                pattern for pattern, compiled in self.measurement_patterns if compiled.search(question_lower)
+            )
+        return {
+            "question_lower": question_lower,
+            "words": question.split(),
+            "tokens": set(self._token_re.findall(question_lower)),
+            "substrings": {term for term in self.terms if term in question_lower},
+            "patterns": matched_patterns
+        }
+
+
+feature_extractor = QueryFeatureExtractor()
+
+
+def _count_in(terms, found):
+    return sum(1 for term in terms if term in found)
+
+def _length_complexity(question, features):
+    word_count = len(features["words"])
+    char_count = len(question)
+
+    length_factor = math.log(1 + word_count) / math.log(20)
+    avg_word_length = char_count / max(word_count, 1)
+    complexity_factor = math.tanh((avg_word_length - 4) / 2)
+
+    return min(length_factor + complexity_factor, 1.0)
+
+def _structural_complexity(question, features):
+    question_lower = features["question_lower"]
+    clause_density = sum(question_lower.count(indicator) for indicator in CLAUSE_INDICATORS) / max(len(question), 1)
+
+    question_marks = question.count('?')
+    parentheses = (question.count('(') + question.count(')')) / 2
+    quotes = (question.count('"') + question.count("'")) / 2
+
+    weighted_score = clause_density * 100 * 0.4 + question_marks * 0.3 + parentheses * 0.15 + quotes * 0.15
+    return math.tanh(weighted_score / 2)
+
+def _linguistic_complexity(features):
+    tokens = features["tokens"]
+    complexity_score = (
+        _count_in(LINGUISTIC_HIGH_WORDS, tokens) * 3 +
+        _count_in(LINGUISTIC_MEDIUM_WORDS, tokens) * 2 -
+        _count_in(LINGUISTIC_SIMPLE_WORDS, tokens) * 0.5
+    )
+    conditional_boost = _count_in(CONDITIONAL_WORDS, features["substrings"]) * 0.5
+    comparative_boost = _count_in(COMPARATIVE_WORDS, tokens) * 0.3
+
+    total_score = complexity_score + conditional_boost + comparative_boost
+    return 1 / (1 + math.exp(-total_score + 1))
+
+def _domain_complexity(features):
+    substrings = features["substrings"]
+    domain_scores = []
+    for domain, terms in AGRICULTURE_DOMAINS.items():
+        matches = _count_in(terms, substrings)
+        if matches > 0:
+            domain_scores.append(math.log(1 + matches) * DOMAIN_WEIGHTS.get(domain, 1.0))
+
+    if not domain_scores:
+        return 0.0
+
+    diversity_penalty = len(domain_scores) / len(AGRICULTURE_DOMAINS)
+    tech_boost = _count_in(TECHNICAL_TERMS, substrings) * 0.5
+
+    total_score = max(domain_scores) + diversity_penalty + tech_boost
+    return math.tanh(total_score / 3)
+
+def _semantic_complexity(features):
+    words = features["words"]
+    word_count = max(len(words), 1)
+    substrings = features["substrings"]
+
+    tech_density = _count_in(TECHNICAL_INDICATORS, substrings) / word_count
+    measurement_factor = math.log(1 + _count_in(MEASUREMENT_PATTERNS, features["patterns"]))
+    entity_density = sum(1 for word in words if word[0].isupper() and len(word) > 3) / word_count
+    concept_complexity = _count_in(CONCEPT_SEPARATORS, substrings)
+
+    semantic_score = tech_density * 10 * 0.4 + measurement_factor * 0.2 + entity_density * 10 * 0.2 + concept_complexity * 0.2
+    return math.tanh(semantic_score)
+
+def _intent_scores(features):
+    """log-scaled, weighted score of every intent with at least one matching pattern, in INTENT_PATTERNS order."""
+    scores = {}
+    for intent_type, patterns in INTENT_PATTERNS.items():
+        matches = _count_in(patterns, features["patterns"])
+        if matches > 0:
+            scores[intent_type] = math.log(1 + matches) * INTENT_WEIGHTS.get(intent_type, 1.0)
+    return scores
+
+def _intent_complexity(features):
+    intent_scores = _intent_scores(features)
+    if not intent_scores:
+        return 0.0
+
+    process_factor = math.sqrt(_count_in(PROCESS_WORDS, features["substrings"])) * 0.3
+    total_score = max(intent_scores.values()) + process_factor
+    return math.tanh(total_score / 3)
+
+
+def _compile_terms(terms):
+    return re.compile(r'\b(' + '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)) + r')\b')
+
+_CROP_RE = _compile_terms(CROPS)
+_STATE_RE = _compile_terms(STATES)
+_COMMODITY_RE = _compile_terms(COMMODITIES)
+
+
+def extract_entities(question):
+    question_lower = question.lower()
+    return QueryEntities(
+        crops=sorted(set(_CROP_RE.findall(question_lower))),
+        states=sorted(set(_STATE_RE.findall(question_lower))),
+        commodities=sorted(set(_COMMODITY_RE.findall(question_lower)))
+    )
+
+def normalize_query(question):
+    """Collapse whitespace; case is kept because capitalised words count as entities."""
+    return " ".join(question.split())
+
+_SUB_QUESTION_SPLIT_RE = re.compile(
+    r'(?<=[?;])\s+|\s+(?:and|also)\s+(?=(?:how|what|which|when|where|why|should|can|is|are|do|does)\b)',
+    re.IGNORECASE
+)
+
+def split_sub_questions(question, max_parts=4):
+    """Independent parts of a compound question; [] when it is a single question."""
+    parts = [part.strip(" ,") for part in _SUB_QUESTION_SPLIT_RE.split(normalize_query(question))]
+    parts = [part for part in parts if len(part.split()) >= 3]
+    return parts[:max_parts] if len(parts) > 1 else []
+
+@lru_cache(maxsize=2048)
+def _query_features(normalized_question):
+    features = feature_extractor.extract(normalized_question)
+    complexity_vector = (
+        _length_complexity(normalized_question, features),
+        _linguistic_complexity(features),
+        _semantic_complexity(features),
+        _structural_complexity(normalized_question, features),
+        _domain_complexity(features),
+        _intent_complexity(features)
+    )
+    intent_scores = _intent_scores(features)
+    return complexity_vector, intent_scores, frozenset(features["tokens"])
+
+def detect_intent(question):
+    _, intent_scores, tokens = _query_features(normalize_query(question))
+    best_intent, best_score = None, 0.0
+    for intent_type, score in intent_scores.items():
+        if score > best_score:
+            best_intent, best_score = intent_type, score
+    if best_intent:
+        return best_intent
+    if tokens & {'price', 'prices', 'market', 'mandi', 'rate', 'rates'}:
+        return 'market'
+    return 'informational'
+
+def compute_query_complexity(question):
+    """Query-only part of ADAPTIVE_RAG's complexity routing: (complexity vector, total, normalized).
+
+    Memoized per normalized query, so transform_query loops and repeat questions are free.
+    """
+    complexity_vector, _, _ = _query_features(normalize_query(question))
+    weights = (0.1, 0.25, 0.2, 0.15, 0.15, 0.15)
+
+    total_complexity = float(sum(score * weight for score, weight in zip(complexity_vector, weights)))
+    normalized_complexity = 1 / (1 + math.exp(-2 * (total_complexity - 2.5)))
+    return list(complexity_vector), total_complexity, normalized_complexity
+
+
+class QueryClassifier:
+    """Builds one QueryClassification per request from local features plus an optional guardrails verdict."""
+
+    def classify(self, question: str, guardrails_result: Any = None) -> QueryClassification:
+        complexity_vector, total_complexity, complexity = compute_query_complexity(question)
+        classification = QueryClassification(
+            question=question,
+            intent=detect_intent(question),
+            complexity_vector=complexity_vector,
+            total_complexity=total_complexity,
+            complexity=complexity,
+            entities=extract_entities(question)
+        )
+        if guardrails_result is not None:
+            self.apply_domain(classification, guardrails_result)
+        return classification
+
+    def apply_domain(self, classification: QueryClassification, verdict: Any) -> QueryClassification:
+        """Fill the domain fields from a guardrails/router verdict (pydantic model, agno response or dict)."""
+        verdict = getattr(verdict, "content", verdict)
+        if isinstance(verdict, BaseModel):
+            verdict = verdict.model_dump()
+        elif not isinstance(verdict, dict):
+            verdict = dict(getattr(verdict, "__dict__", {}))
+
+        is_agriculture_related = verdict.get("is_agriculture_related", verdict.get("agriculture_related"))
+        if is_agriculture_related is None:
+            return classification
+        classification.is_agriculture_related = bool(is_agriculture_related)
+        classification.is_greeting = bool(verdict.get("is_greeting", False))
+        classification.response_message = verdict.get("response_message") or verdict.get("generation")
+        classification.confidence_score = float(verdict.get("confidence_score", 1.0) or 0.0)
+        classification.domain = verdict.get("category") or ("agriculture" if is_agriculture_related else "general")
+        return classification
+
+
+query_classifier = QueryClassifier()
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import threading
+from functools import lru_cache
+from typing import Optional, Sequence, Dict, Any
+
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import Document
+from langchain_core.documents.compressor import BaseDocumentCompressor
+from pydantic import ConfigDict
+from sentence_transformers import CrossEncoder
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+rerank_log_path = os.path.join(current_dir, "cache", "rerank_logs", "queries.jsonl")
+
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L6-v2"
+DEFAULT_ONNX_FILE = "onnx/model_qint8_avx512.onnx"
+
+
+class RerankLatency:
+    """Thread-safe latency counters, one per reranker backend."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.documents = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float, num_documents: int):
+        with self._lock:
+            self.calls += 1
+            self.documents += num_documents
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "documents": self.documents,
+                "avg_ms": self.total_ms / self.calls if self.calls else 0.0,
+                "max_ms": self.max_ms
+            }
+
+
+_latency: Dict[str, RerankLatency] = {}
+_latency_lock = threading.Lock()
+_log_lock = threading.Lock()
+
+
+def latency_for(backend: str) -> RerankLatency:
+    with _latency_lock:
+        if backend not in _latency:
+            _latency[backend] = RerankLatency()
+        return _latency[backend]
+
+
+def get_rerank_latency() -> Dict[str, Dict[str, Any]]:
+    with _latency_lock:
+        backends = list(_latency.items())
+    return {backend: stats.summary() for backend, stats in backends}
+
+
+def log_rerank_query(query: str, documents: Sequence[Document]):
+    """Append the query and its candidates to the rerank log used by the reranker benchmark."""
+    if os.getenv("RAG_RERANK_LOG", "false").lower() not in ("1", "true", "yes"):
+        return
+    try:
+        with _log_lock:
+            os.makedirs(os.path.dirname(rerank_log_path), exist_ok=True)
+            with open(rerank_log_path, 'a') as f:
+                f.write(json.dumps({
+                    "query": query,
+                    "documents": [doc.page_content for doc in documents],
+                    "logged_at": time.time()
+                }) + "\n")
+    except Exception as e:
+        print(f"Warning: Could not log rerank query: {e}")
+
+
+@lru_cache(maxsize=None)
+def load_cross_encoder(model_name: str = DEFAULT_CROSS_ENCODER, use_onnx: bool = False) -> CrossEncoder:
+    """Process-wide cross-encoder; the ONNX int8 variant needs optimum[onnxruntime] installed."""
+    if use_onnx:
+        try:
+            return CrossEncoder(
+                model_name,
+                backend="onnx",
+                model_kwargs={"file_name": os.getenv("RAG_RERANKER_ONNX_FILE", DEFAULT_ONNX_FILE)}
+            )
+        except Exception as e:
+            print(f"Warning: ONNX cross-encoder unavailable, using the torch model: {e}")
+    return CrossEncoder(model_name)
+
+
+class CrossEncoderReranker(BaseDocumentCompressor):
+    """Local CPU reranker: scores (query, document) pairs in batches with a cross-encoder."""
+
+    model_name: str = DEFAULT_CROSS_ENCODER
+    top_n: int = 3
+    batch_size: int = 32
+    use_onnx: bool = False
+
+    model_config = ConfigDict(arbitrary_types_allowed=True, extra="forbid")
+
+    @property
+    def backend_name(self) -> str:
+        return "cross-encoder-onnx" if self.use_onnx else "cross-encoder"
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+    ) -> Sequence[Document]:
+        if not documents:
+            return []
+        start_time = time.perf_counter()
+        model = load_cross_encoder(self.model_name, self.use_onnx)
+        scores = model.predict(
+            [(query, doc.page_content) for doc in documents],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        ranked = sorted(zip(documents, scores), key=lambda pair: float(pair[1]), reverse=True)[:self.top_n]
+        results = []
+        for doc, score in ranked:
+            metadata = dict(doc.metadata)
+            metadata["relevance_score"] = float(score)
+            results.append(Document(page_content=doc.page_content, metadata=metadata))
+        latency_for(self.backend_name).record((time.perf_counter() - start_time) * 1000, len(documents))
+        log_rerank_query(query, documents)
+        return results
+
+
+class TimedReranker(BaseDocumentCompressor):
+    """Wraps a remote compressor (Cohere) so its latency is reported like the local backend."""
+
+    base_compressor: BaseDocumentCompressor
+    backend_name: str = "cohere"
+
+    model_config = ConfigDict(arbitrary_types_allowed=True, extra="forbid")
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+    ) -> Sequence[Document]:
+        start_time = time.perf_counter()
+        results = self.base_compressor.compress_documents(documents, query, callbacks=callbacks)
+        latency_for(self.backend_name).record((time.perf_counter() - start_time) * 1000, len(documents))
+        log_rerank_query(query, documents)
+        return results
+
+
+def get_reranker(top_n: int = 3, backend: str = None) -> BaseDocumentCompressor:
+    """
+    Reranker selected by RAG_RERANKER: "cross-encoder" (default), "cross-encoder-onnx" or "cohere".
+    The cross-encoder model is shared by every ADAPTIVE_RAG instance in the process.
+    """
+    backend = (backend or os.getenv("RAG_RERANKER", "cross-encoder")).lower()
+    if backend == "cohere":
+        from langchain_cohere import CohereRerank
+        return TimedReranker(base_compressor=CohereRerank(model="rerank-english-v3.0", top_n=top_n))
+    if backend not in ("cross-encoder", "cross-encoder-onnx"):
+        print(f"Warning: Unknown reranker '{backend}', using cross-encoder")
+    return CrossEncoderReranker(
+        model_name=os.getenv("RAG_RERANKER_MODEL", DEFAULT_CROSS_ENCODER),
+        top_n=top_n,
+        use_onnx=backend == "cross-encoder-onnx"
+    )
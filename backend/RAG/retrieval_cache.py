@@ -0,0 +1,63 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Dict, Any
+
+
+def normalize_retrieval_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class RetrievalCache:
+    """
+    Process-wide LRU of retrieval results keyed on (index build id, normalized query, k).
+
+    Only (doc_id, relevance score) pairs are kept; callers re-materialize documents from their
+    document store. A rebuilt index gets a new build id, so its stale entries are never hit
+    and simply age out (or are dropped at once with invalidate()).
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or int(os.getenv("RAG_RETRIEVAL_CACHE_SIZE", "1024"))
+        self._entries: "OrderedDict[Tuple[str, str, int], List[Tuple[int, Optional[float]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, index_version: str, query: str, k: int) -> Optional[List[Tuple[int, Optional[float]]]]:
+        key = (index_version, normalize_retrieval_query(query), k)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, index_version: str, query: str, k: int, results: List[Tuple[int, Optional[float]]]):
+        key = (index_version, normalize_retrieval_query(query), k)
+        with self._lock:
+            self._entries[key] = list(results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, index_version: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == index_version]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+retrieval_cache = RetrievalCache()
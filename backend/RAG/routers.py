@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional
+import json
+import threading
+
+from .parallel_rag_main import ParallelRAGSystem
+from .rerankers import get_rerank_latency
+from .Agents.agent_pool import agent_pool
+from .search_cache import web_search_cache
+
+router = APIRouter(prefix="/api/v1/rag", tags=["RAG"])
+
+rag_system_instance = None
+_rag_system_lock = threading.Lock()
+
+def get_rag_system() -> ParallelRAGSystem:
+    """Dependency to get the shared parallel RAG system (also used by the main workflow)"""
+    global rag_system_instance
+    with _rag_system_lock:
+        if rag_system_instance is None:
+            rag_system_instance = ParallelRAGSystem(model="gemini-2.0-flash", k=3)
+    return rag_system_instance
+
+class RAGStreamRequest(BaseModel):
+    query: str = Field(..., description="The agricultural question to answer")
+    max_workers: Optional[int] = Field(default=None, description="Maximum number of files processed in parallel")
+
+@router.post("/stream")
+async def stream_rag_answer(request: RAGStreamRequest, rag_system: ParallelRAGSystem = Depends(get_rag_system)):
+    """
+    Stream the synthesized answer as newline-delimited JSON.
+
+    The first chunk (`type: "initial"`) is produced from the fastest file that answered;
+    later chunks (`type: "refinement"`) add what slower files contributed. Every chunk
+    carries the `file_name` it came from.
+    """
+    def chunk_lines():
+        try:
+            for chunk in rag_system.stream_query(request.query, request.max_workers):
+                yield json.dumps(chunk) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "file_name": None, "content": str(e)}) + "\n"
+
+    return StreamingResponse(chunk_lines(), media_type="application/x-ndjson")
+
+@router.get("/cache")
+async def get_rag_cache_info(rag_system: ParallelRAGSystem = Depends(get_rag_system)):
+    """Workflow cache usage against the configured disk budget (served from the cache manifest)."""
+    return rag_system.get_cache_info()
+
+@router.get("/rerank")
+async def get_rerank_stats():
+    """Per-backend reranker call counts and latency since startup."""
+    return get_rerank_latency()
+
+@router.get("/agents")
+async def get_agent_pool_stats():
+    """Sub-agent constructions, checkouts and reuse per agent class since startup."""
+    return agent_pool.get_stats()
+
+@router.get("/search-cache")
+async def get_search_cache_stats():
+    """Web search cache hits, searches sent to the provider and live entries per query kind."""
+    return web_search_cache.get_stats()
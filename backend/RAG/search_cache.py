@@ -0,0 +1,164 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+search_cache_path = os.path.join(current_dir, "cache", "search_cache", "search_cache.sqlite")
+
+_token_re = re.compile(r"\w+")
+# Request phrasing stripped from the start of a query only; inner words keep their meaning and order.
+_leading_filler = {
+    "please", "search", "for", "find", "look", "up", "tell", "me", "about", "give", "show",
+    "can", "could", "you", "i", "want", "need", "to", "know", "information", "on"
+}
+
+NEWS_TERMS = {
+    "news", "latest", "recent", "today", "current", "currently", "now", "update", "updates",
+    "announced", "announcement", "forecast", "weather", "rainfall", "monsoon", "week", "yesterday", "tomorrow"
+}
+MARKET_TERMS = {"price", "prices", "mandi", "rate", "rates", "msp", "market", "markets", "export", "import"}
+
+# Seconds a result stays valid per query kind; RAG_SEARCH_TTL_<KIND> overrides.
+DEFAULT_TTLS = {
+    "news": 60 * 60,
+    "market": 6 * 60 * 60,
+    "fact": 7 * 24 * 60 * 60,
+}
+
+
+def normalize_search_query(query: str) -> str:
+    """
+    Lowercased words in their original order, minus leading request filler ("please search for",
+    "tell me about"). Word order is kept: "export from india to pakistan" and "export from
+    pakistan to india" are different questions and must not share a cached result.
+    """
+    tokens = _token_re.findall(query.lower())
+    start = 0
+    while start < len(tokens) - 1 and tokens[start] in _leading_filler:
+        start += 1
+    return " ".join(tokens[start:])
+
+
+def classify_search_query(query: str) -> str:
+    tokens = set(_token_re.findall(query.lower()))
+    if tokens & NEWS_TERMS:
+        return "news"
+    if tokens & MARKET_TERMS:
+        return "market"
+    return "fact"
+
+
+class SearchCache:
+    """
+    SQLite cache of web search results keyed on (provider, normalized query).
+
+    Agronomy facts stay valid for days, prices for hours and news/weather for an hour, so
+    each entry expires according to the kind of query it answers. Expired entries are
+    replaced on the next search and purged on startup.
+    """
+
+    def __init__(self, db_path: str = search_cache_path):
+        self.db_path = db_path
+        self.enabled = os.getenv("RAG_SEARCH_CACHE", "true").lower() in ("1", "true", "yes")
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "searches": 0, "search_seconds": 0.0}
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, provider TEXT, query TEXT, kind TEXT, result TEXT, "
+                "created_at REAL, expires_at REAL, hits INTEGER DEFAULT 0)"
+            )
+        self.purge_expired()
+
+    @staticmethod
+    def ttl_for(kind: str) -> float:
+        override = os.getenv(f"RAG_SEARCH_TTL_{kind.upper()}")
+        if override:
+            return float(override)
+        return DEFAULT_TTLS.get(kind, DEFAULT_TTLS["fact"])
+
+    @staticmethod
+    def _key(provider: str, normalized_query: str) -> str:
+        # v2: keys of the earlier bag-of-words normalization are never matched again.
+        return hashlib.sha256(f"v2\x1f{provider}\x1f{normalized_query}".encode()).hexdigest()
+
+    def get(self, provider: str, query: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        key = self._key(provider, normalize_search_query(query))
+        with self._lock:
+            row = self._conn.execute("SELECT result, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            if row[1] < time.time():
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            with self._conn:
+                self._conn.execute("UPDATE results SET hits = hits + 1 WHERE key = ?", (key,))
+            return row[0]
+
+    def put(self, provider: str, query: str, result: str):
+        if not self.enabled:
+            return
+        kind = classify_search_query(query)
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (key, provider, query, kind, result, created_at, expires_at, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                    (self._key(provider, normalize_search_query(query)), provider, query, kind, result,
+                     now, now + self.ttl_for(kind))
+                )
+
+    def cached_search(self, provider: str, query: str, search: Callable[[str], str]) -> str:
+        """search(query) on a miss; empty or non-string results are returned but not cached."""
+        cached = self.get(provider, query)
+        if cached is not None:
+            return cached
+        start_time = time.time()
+        result = search(query)
+        with self._lock:
+            self.stats["searches"] += 1
+            self.stats["search_seconds"] += time.time() - start_time
+        if isinstance(result, str) and result.strip():
+            self.put(provider, query, result)
+        return result
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            with self._conn:
+                return self._conn.execute("DELETE FROM results WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM results")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries_by_kind = dict(self._conn.execute(
+                "SELECT kind, COUNT(*) FROM results WHERE expires_at >= ? GROUP BY kind", (time.time(),)
+            ).fetchall())
+            lookups = self.stats["hits"] + self.stats["misses"]
+            searches = self.stats["searches"]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "avg_search_seconds": self.stats["search_seconds"] / searches if searches else 0.0,
+                "entries_by_kind": entries_by_kind,
+                "ttl_seconds": {kind: self.ttl_for(kind) for kind in DEFAULT_TTLS},
+                "enabled": self.enabled
+            }
+
+
+web_search_cache = SearchCache()
@@ -0,0 +1,158 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+from collections import Counter
+from typing import List, Dict, Any, Callable
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+_token_re = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    return _token_re.findall(text.lower())
+
+
+class SparseBM25Index:
+    """
+    BM25 index stored as term-major CSR arrays (indptr/indices/data .npy files).
+
+    The BM25 weight of every (term, document) pair is precomputed at build time, so a query
+    is scored by gathering the rows of its terms and summing them per document. The arrays
+    are opened with mmap_mode='r': loading is near-instant and the pages are shared through
+    the OS page cache by every process that serves the same workflow cache.
+    """
+
+    VERSION = 1
+    FILES = ("indptr.npy", "indices.npy", "data.npy", "vocab.json", "meta.json")
+
+    def __init__(self, index_dir, indptr, indices, data, vocab: Dict[str, int], meta: Dict[str, Any]):
+        self.index_dir = index_dir
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.vocab = vocab
+        self.meta = meta
+        self.num_docs = meta["num_docs"]
+
+    @classmethod
+    def exists(cls, index_dir) -> bool:
+        return all(os.path.exists(os.path.join(index_dir, name)) for name in cls.FILES)
+
+    @classmethod
+    def build(cls, texts: List[str], index_dir, k1: float = 1.5, b: float = 0.75) -> "SparseBM25Index":
+        start_time = time.time()
+        vocab: Dict[str, int] = {}
+        term_ids, doc_ids, term_freqs = [], [], []
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                term_freqs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        term_freqs = np.asarray(term_freqs, dtype=np.float32)
+
+        num_docs = len(texts)
+        avgdl = float(doc_lengths.mean()) if num_docs else 0.0
+        doc_freq = np.bincount(term_ids, minlength=len(vocab)).astype(np.float32)
+        idf = np.log1p((num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        norm = k1 * (1 - b + b * doc_lengths[doc_ids] / max(avgdl, 1e-9))
+        weights = (idf[term_ids] * term_freqs * (k1 + 1) / (term_freqs + norm)).astype(np.float32)
+
+        order = np.lexsort((doc_ids, term_ids))
+        indices = doc_ids[order]
+        data = weights[order]
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=indptr[1:])
+
+        meta = {"version": cls.VERSION, "num_docs": num_docs, "num_terms": len(vocab), "k1": k1, "b": b, "avgdl": avgdl}
+        # Written to a fresh directory and swapped in: other workers (and this process's previous
+        # index) may have the old .npy files mapped, and rewriting them in place would truncate
+        # live mappings. Unlinked old files stay valid for whoever still maps them.
+        index_dir = os.path.abspath(index_dir)
+        tmp_dir = f"{index_dir}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(tmp_dir)
+        np.save(os.path.join(tmp_dir, "indptr.npy"), indptr)
+        np.save(os.path.join(tmp_dir, "indices.npy"), indices)
+        np.save(os.path.join(tmp_dir, "data.npy"), data)
+        with open(os.path.join(tmp_dir, "vocab.json"), 'w') as f:
+            json.dump(vocab, f)
+        with open(os.path.join(tmp_dir, "meta.json"), 'w') as f:
+            json.dump(meta, f)
+        old_dir = None
+        if os.path.exists(index_dir):
+            old_dir = f"{index_dir}.old-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            os.replace(index_dir, old_dir)
+        os.replace(tmp_dir, index_dir)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+        print(f"Built sparse BM25 index: {num_docs} docs, {len(vocab)} terms in {time.time() - start_time:.2f}s")
+        return cls.load(index_dir)
+
+    @classmethod
+    def load(cls, index_dir) -> "SparseBM25Index":
+        with open(os.path.join(index_dir, "meta.json"), 'r') as f:
+            meta = json.load(f)
+        if meta.get("version") != cls.VERSION:
+            raise ValueError(f"Unsupported BM25 index version {meta.get('version')}")
+        with open(os.path.join(index_dir, "vocab.json"), 'r') as f:
+            vocab = json.load(f)
+        return cls(
+            index_dir,
+            np.load(os.path.join(index_dir, "indptr.npy"), mmap_mode='r'),
+            np.load(os.path.join(index_dir, "indices.npy"), mmap_mode='r'),
+            np.load(os.path.join(index_dir, "data.npy"), mmap_mode='r'),
+            vocab,
+            meta
+        )
+
+    def score(self, query: str) -> np.ndarray:
+        """BM25 score of every document for query (repeated query terms count once per occurrence)."""
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        term_ids = [self.vocab[term] for term in tokenize(query) if term in self.vocab]
+        if not term_ids:
+            return scores
+        starts = np.asarray([self.indptr[t] for t in term_ids], dtype=np.int64)
+        ends = np.asarray([self.indptr[t + 1] for t in term_ids], dtype=np.int64)
+        # Only the CSR rows of the query terms are touched (and paged in).
+        postings = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+        if postings.size:
+            scores += np.bincount(self.indices[postings], weights=self.data[postings], minlength=self.num_docs).astype(np.float32)
+        return scores
+
+    def top_k(self, query: str, k: int) -> List[int]:
+        scores = self.score(query)
+        if not scores.size:
+            return []
+        k = min(k, scores.size)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [int(doc_id) for doc_id in ranked if scores[doc_id] > 0]
+
+
+class SparseBM25Retriever(BaseRetriever):
+    """LangChain retriever over a SparseBM25Index; documents are materialized by id on demand."""
+
+    index: SparseBM25Index
+    get_documents: Callable[[List[int]], List[Document]]
+    k: int = 3
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.get_documents(self.index.top_k(query, self.k))
@@ -1,6 +1,7 @@
-from typing import List
+from typing import List, Optional, Dict, Any
 
 from typing_extensions import TypedDict
+from .query_classification import QueryClassification
 
 class GraphState(TypedDict):
     """
@@ -10,9 +11,28 @@ class GraphState(TypedDict):
         question: question
         generation: LLM generation
         documents: list of documents
+        classification: request-level QueryClassification shared by every node
+        grading_stats: counters from the last document grading stage
+        started_at: time of the first retrieve, the start of the query's time budget
+        attempts: generations graded so far
+        candidates: every graded generation with its grades and score
+        best_candidate: scores of the candidate returned when the budget ran out
+        query_variants: the question and its reformulations, newest first
+        retrieval_diagnostics: per-variant hit counts from the last multi-query retrieval
+        grader_passed: set by the grading nodes; True only when the returned generation passed both graders
     """
 
     question: str
     generation: str
     extractions: str
-    documents: List[str]  
\ No newline at end of file
+    documents: List[str]
+    classification: Optional[QueryClassification]
+    grading_stats: Dict[str, Any]
+    started_at: float
+    attempts: int
+    candidates: List[Dict[str, Any]]
+    best_candidate: Optional[Dict[str, Any]]
+    query_variants: List[str]
+    retrieval_diagnostics: Optional[List[Dict[str, Any]]]
+    grader_passed: bool
+  
\ No newline at end of file
@@ -0,0 +1,218 @@
+import os
+import math
+import time
+import uuid
+import pickle
+import shutil
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def get_index_params() -> Dict[str, Any]:
+    """
+    Build/search parameters from the environment:
+        RAG_VECTOR_INDEX            flat (default), hnsw or ivfpq
+        RAG_ANN_MIN_VECTORS         below this many vectors an exact flat index is built anyway
+        RAG_HNSW_M, RAG_HNSW_EF_CONSTRUCTION, RAG_HNSW_EF_SEARCH
+        RAG_IVF_NLIST, RAG_IVF_NPROBE, RAG_PQ_M, RAG_PQ_NBITS (nlist/m default from corpus size/dim)
+    """
+    index_type = os.getenv("RAG_VECTOR_INDEX", "flat").lower()
+    if index_type not in INDEX_TYPES:
+        print(f"Warning: Unknown RAG_VECTOR_INDEX '{index_type}', using 'flat'")
+        index_type = "flat"
+    return {
+        "index_type": index_type,
+        "min_vectors": _env_int("RAG_ANN_MIN_VECTORS", 5000),
+        "hnsw_m": _env_int("RAG_HNSW_M", 32),
+        "ef_construction": _env_int("RAG_HNSW_EF_CONSTRUCTION", 200),
+        "ef_search": _env_int("RAG_HNSW_EF_SEARCH", 64),
+        "nlist": _env_int("RAG_IVF_NLIST", None),
+        "nprobe": _env_int("RAG_IVF_NPROBE", 16),
+        "pq_m": _env_int("RAG_PQ_M", None),
+        "pq_nbits": _env_int("RAG_PQ_NBITS", 8),
+    }
+
+
+def _pq_subquantizers(dim: int, requested: Optional[int]) -> int:
+    # PQ needs m to divide the dimension; aim for ~8 dimensions per sub-quantizer.
+    if requested and dim % requested == 0:
+        return requested
+    target = max(dim // 8, 1)
+    return max(m for m in range(1, target + 1) if dim % m == 0)
+
+
+def create_faiss_index(vectors: np.ndarray, **overrides) -> Tuple[faiss.Index, Dict[str, Any]]:
+    """
+    An empty (trained where needed) L2 index of the configured type for vectors. Small corpora
+    get a flat index: ANN saves nothing there, and IVF-PQ cannot be trained on a few points.
+    """
+    params = {**get_index_params(), **overrides}
+    if vectors.ndim != 2 or not len(vectors):
+        raise ValueError("Cannot build a FAISS index without vectors")
+    num_vectors, dim = vectors.shape
+    index_type = params["index_type"]
+    if index_type != "flat" and num_vectors < params["min_vectors"]:
+        print(f"{num_vectors} vectors is below RAG_ANN_MIN_VECTORS={params['min_vectors']}; using a flat index")
+        index_type = "flat"
+
+    start_time = time.time()
+    info: Dict[str, Any] = {"index_type": index_type, "requested_index_type": params["index_type"], "dim": dim}
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["hnsw_m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+        index.hnsw.efSearch = params["ef_search"]
+        info.update(hnsw_m=params["hnsw_m"], ef_construction=params["ef_construction"], ef_search=params["ef_search"])
+    elif index_type == "ivfpq":
+        # Rule of thumb nlist ~ 4*sqrt(n), capped so every list gets enough training points.
+        nlist = params["nlist"] or int(4 * math.sqrt(num_vectors))
+        nlist = max(1, min(nlist, num_vectors // 39))
+        pq_m = _pq_subquantizers(dim, params["pq_m"])
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, pq_m, params["pq_nbits"])
+        index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+        index.nprobe = min(params["nprobe"], nlist)
+        info.update(nlist=nlist, nprobe=index.nprobe, pq_m=pq_m, pq_nbits=params["pq_nbits"])
+    else:
+        index = faiss.IndexFlatL2(dim)
+    info["train_seconds"] = time.time() - start_time
+    return index, info
+
+
+def configure_search(index: faiss.Index):
+    """Apply the current RAG_HNSW_EF_SEARCH / RAG_IVF_NPROBE to a loaded index."""
+    params = get_index_params()
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = params["ef_search"]
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(params["nprobe"], index.nlist)
+
+
+def describe_index(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfpq"
+    return "flat"
+
+
+def build_vectorstore(texts: Sequence[str], embeddings: Sequence[Sequence[float]], metadatas: List[dict],
+                      embedding_function, ids: Optional[List[str]] = None, **overrides) -> Tuple[FAISS, Dict[str, Any]]:
+    """LangChain FAISS store over precomputed embeddings, backed by the configured index type."""
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    index, info = create_faiss_index(vectors, **overrides)
+    store = FAISS(
+        embedding_function=embedding_function,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={}
+    )
+    start_time = time.time()
+    store.add_embeddings(list(zip(texts, vectors.tolist())), metadatas=metadatas, ids=ids)
+    info["add_seconds"] = time.time() - start_time
+    info["num_vectors"] = int(index.ntotal)
+    print(f"Built {info['index_type']} FAISS index over {info['num_vectors']} vectors "
+          f"in {info['train_seconds'] + info['add_seconds']:.2f}s")
+    return store, info
+
+
+def _read_index(path: str, mmap: bool) -> Tuple[faiss.Index, Optional[str]]:
+    """Read an index file, memory-mapped when this faiss build supports it for the index type."""
+    if mmap:
+        # IO_FLAG_MMAP_IFC maps flat codes in place (faiss >= 1.10); IO_FLAG_MMAP covers IVF lists.
+        for flag_name in ("IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"):
+            flag = getattr(faiss, flag_name, None)
+            if flag is None:
+                continue
+            try:
+                return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY), flag_name
+            except RuntimeError:
+                continue
+    return faiss.read_index(path), None
+
+
+def mapped_memory(path_suffix: str = "index.faiss", path: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Mapped (Size) and resident (Rss) MB per file mapping of this process, from /proc/self/smaps,
+    for one file or every file ending in path_suffix. Resident pages of a shared read-only mapping
+    live in the page cache once for all processes mapping the file. Empty off Linux.
+    """
+    target = os.path.realpath(path) if path else None
+    usage: Dict[str, Dict[str, float]] = {}
+    current = None
+    try:
+        with open("/proc/self/smaps", "r") as f:
+            for line in f:
+                fields = line.split(None, 5)
+                if fields and "-" in fields[0] and len(fields) >= 5 and not fields[0].endswith(":"):
+                    pathname = fields[5].strip() if len(fields) == 6 else ""
+                    matches = pathname == target if target else pathname.endswith(path_suffix)
+                    current = usage.setdefault(pathname, {"mapped_mb": 0.0, "resident_mb": 0.0}) if matches else None
+                elif current is not None and fields[0] in ("Size:", "Rss:"):
+                    key = "mapped_mb" if fields[0] == "Size:" else "resident_mb"
+                    current[key] += int(fields[1]) / 1024
+    except OSError:
+        return {}
+    return usage
+
+
+def save_vectorstore(store: FAISS, folder: str):
+    """
+    save_local into a fresh directory that is then swapped in. Other workers map index.faiss
+    read-only, so overwriting it in place would truncate their live mappings; the replaced
+    files are only unlinked and stay valid for whoever still maps them.
+    """
+    folder = os.path.abspath(folder)
+    tmp_folder = f"{folder}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    store.save_local(tmp_folder)
+    old_folder = None
+    if os.path.exists(folder):
+        old_folder = f"{folder}.old-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        os.replace(folder, old_folder)
+    os.replace(tmp_folder, folder)
+    if old_folder:
+        shutil.rmtree(old_folder, ignore_errors=True)
+
+
+def load_vectorstore(folder: str, embedding_function, docstore=None, index_to_docstore_id: Dict[int, str] = None,
+                     mmap: bool = None) -> Tuple[FAISS, Dict[str, Any]]:
+    """
+    Load folder/index.faiss (memory-mapped and read-only unless RAG_FAISS_MMAP=false) into a
+    LangChain FAISS store. Without docstore, the docstore and id map come from folder/index.pkl
+    as in FAISS.load_local; with one and no id map, docstore ids are the index positions.
+    Returns the store and a memory report for the index file.
+    """
+    if mmap is None:
+        mmap = os.getenv("RAG_FAISS_MMAP", "true").lower() in ("1", "true", "yes")
+    index_path = os.path.join(folder, "index.faiss")
+    index, mmap_flag = _read_index(index_path, mmap)
+    configure_search(index)
+    if docstore is None:
+        with open(os.path.join(folder, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    elif index_to_docstore_id is None:
+        index_to_docstore_id = {position: str(position) for position in range(index.ntotal)}
+    store = FAISS(
+        embedding_function=embedding_function,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id
+    )
+    memory = mapped_memory(path=index_path).get(os.path.realpath(index_path), {"mapped_mb": 0.0, "resident_mb": 0.0})
+    report = {
+        "index_path": index_path,
+        "file_mb": os.path.getsize(index_path) / (1024 * 1024),
+        "mmap": mmap_flag is not None and memory["mapped_mb"] > 0,
+        "mmap_flag": mmap_flag,
+        **memory
+    }
+    return store, report
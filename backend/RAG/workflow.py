@@ -35,6 +35,8 @@ class Workflow:
         self.workflow.add_node("transform_query", self.adaptive_rag.transform_query)
         self.workflow.add_node("web_search", self.adaptive_rag.web_search)
         self.workflow.add_node("introspective_agent_response", self.adaptive_rag.introspective_agent_response)
+        self.workflow.add_node("grade_generation", self.adaptive_rag.grade_generation_v_documents_and_question)
+        self.workflow.add_node("select_best_candidate", self.adaptive_rag.select_best_candidate)
         
         self.workflow.add_edge(START, "retrieve")
         
@@ -54,13 +56,26 @@ class Workflow:
         
         self.workflow.add_edge("complex_query_handler", END)
         
+        self.workflow.add_edge("moderate_query_handler", "grade_generation")
+        
+        # Failed generations are retried through transform_query until the attempt or time
+        # budget runs out; then the best-scoring candidate is returned.
         self.workflow.add_conditional_edges(
-            "moderate_query_handler",
-            self.adaptive_rag.grade_generation_v_documents_and_question,
+            "grade_generation",
+            self.adaptive_rag.decide_after_generation_grade,
             {
-                "not supported": "introspective_agent_response",
                 "useful": END,
-                "not useful": "transform_query",
+                "retry": "transform_query",
+                "budget exhausted": "select_best_candidate",
+            },
+        )
+        
+        self.workflow.add_conditional_edges(
+            "select_best_candidate",
+            self.adaptive_rag.decide_after_best_candidate,
+            {
+                "accept": END,
+                "not supported": "introspective_agent_response",
             },
         )
         
@@ -72,19 +87,44 @@ class Workflow:
     def build_workflow(self):
         pass
 
-    def run_workflow(self, inputs):
+    def run_workflow(self, inputs, cancel_event=None):
         workflow_path = []
         final_result = None
+        cancelled = False
+        grading_stats = {}
+        candidates = []
+        best_candidate = None
+        retrieval_diagnostics = None
+        grader_passed = False
         
-        for output in self.app.stream(inputs):
+        # Each attempt is at most five nodes; keep LangGraph's step limit above the attempt budget.
+        config = {"recursion_limit": 5 * self.adaptive_rag.max_attempts + 10}
+        for output in self.app.stream(inputs, config):
             for key, value in output.items():
                 workflow_path.append(key)
                 pprint(f"Node '{key}':")
-                if key in ["simple_query_handler", "moderate_query_handler", "complex_query_handler", "introspective_agent_response"]:
+                if key == "grade_documents" and value.get("grading_stats"):
+                    # transform_query loops back through grading, so counters are summed.
+                    for stat, count in value["grading_stats"].items():
+                        grading_stats[stat] = grading_stats.get(stat, 0) + count
+                if key == "retrieve" and value.get("retrieval_diagnostics"):
+                    retrieval_diagnostics = value["retrieval_diagnostics"]
+                if key == "grade_generation":
+                    candidates = value.get("candidates", candidates)
+                # Grading nodes set grader_passed explicitly; the latest one decides.
+                if value and "grader_passed" in value:
+                    grader_passed = value["grader_passed"]
+                if key == "select_best_candidate":
+                    best_candidate = value.get("best_candidate")
+                if key in ["simple_query_handler", "moderate_query_handler", "complex_query_handler", "select_best_candidate", "introspective_agent_response"]:
                     final_result = value
                     if key == "complex_query_handler" and value.get("used_introspective_agent"):
                         print("✓ Introspective agent was used for quality improvement")
             pprint("\n---\n")
+            if cancel_event is not None and cancel_event.is_set():
+                print("Workflow cancelled, stopping before the next node.")
+                cancelled = True
+                break
 
         print(f"Workflow path taken: {' -> '.join(workflow_path)}")
         
@@ -98,5 +138,17 @@ class Workflow:
             "workflow_type": final_result.get("workflow_type", "moderate"),
             "workflow_path": workflow_path,
             "used_introspective_agent": final_result.get("used_introspective_agent", False),
-            "initial_generation": final_result.get("initial_generation", None)
+            "initial_generation": final_result.get("initial_generation", None),
+            "grader_passed": grader_passed and not cancelled,
+            "grading_stats": grading_stats,
+            # Last hallucination/answer grading: grades, decision and the grader that decided.
+            "generation_grade": self.adaptive_rag.last_generation_grade,
+            # Scores of every graded generation; best_candidate is set when the budget ran out.
+            "candidates": [
+                {key: value for key, value in candidate.items() if key not in ("documents", "extractions")}
+                for candidate in candidates
+            ],
+            "best_candidate": best_candidate,
+            "retrieval_diagnostics": final_result.get("retrieval_diagnostics") or retrieval_diagnostics,
+            "cancelled": cancelled
         }
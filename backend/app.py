@@ -33,6 +33,7 @@ from Agents.Chart_Agent.routers import router as chart_agent_router
 from Deep_Research.routers import router as deep_research_router
 from Agents.Fertilizer_Recommender.routers import router as fertilizer_recommender_router
 from Tools.tool_apis_router import router as tool_apis_router
+from RAG.routers import router as rag_router
 
 from workflow import run_workflow
 
@@ -90,6 +91,7 @@ app.include_router(deep_research_router)
 app.include_router(personalisation_router)
 app.include_router(chart_agent_router)
 app.include_router(tool_apis_router)
+app.include_router(rag_router)
 
 @app.get("/health", tags=["Health"])
 async def health_check():
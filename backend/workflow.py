@@ -6,7 +6,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from langgraph.graph import StateGraph, END, START
 
 from RAG.workflow import Workflow
-from RAG.parallel_rag_main import ParallelRAGSystem
+from RAG.routers import get_rag_system
 from Agents.Router import RouterAgent
 from Agents.Crop_Recommender.agent import CropRecommenderAgent
 from Agents.Weather_forcast.agent import WeatherForecastAgent
@@ -86,10 +86,12 @@ class MainWorkflowState(TypedDict):
     guardrails_result: Dict[str, Any]
     is_agriculture_related: bool
     guardrails_response: str
+    query_classification: Any
 
-def run_adaptive_rag(query: str) -> str:
-    rag_system = ParallelRAGSystem(model="gemini-2.0-flash", k=3)
-    result = rag_system.process_query(query)
+def run_adaptive_rag(query: str, classification=None) -> str:
+    # One shared system per process, so requests share its workflow cache store.
+    rag_system = get_rag_system()
+    result = rag_system.process_query(query, classification=classification)
     return result.get("synthesized_answer", "")
 
 def run_router_agent(query: str, image_path: str = None) -> Dict[str, Any]:
@@ -206,19 +208,20 @@ def grade_answer(question: str, answer: str) -> Dict[str, Any]:
 
 def guardrails_node(state: MainWorkflowState):
     try:
-        guardrails_result = guardrails_agent.evaluate_query(state["query"])
-        print(f"Guardrails evaluation: {guardrails_result}")
+        classification = guardrails_agent.classify_query(state["query"])
+        print(f"Guardrails evaluation: {classification}")
         
         return {
             "guardrails_result": {
-                "is_agriculture_related": guardrails_result.is_agriculture_related,
-                "is_greeting": guardrails_result.is_greeting,
-                "response_message": guardrails_result.response_message,
-                "confidence_score": guardrails_result.confidence_score,
-                "category": guardrails_result.category
+                "is_agriculture_related": classification.is_agriculture_related,
+                "is_greeting": classification.is_greeting,
+                "response_message": classification.response_message,
+                "confidence_score": classification.confidence_score,
+                "category": classification.domain
             },
-            "is_agriculture_related": guardrails_result.is_agriculture_related,
-            "guardrails_response": guardrails_result.response_message or ""
+            "is_agriculture_related": classification.is_agriculture_related,
+            "guardrails_response": classification.response_message or "",
+            "query_classification": classification
         }
     except Exception as e:
         print(f"Error in guardrails_node: {str(e)}")
@@ -231,11 +234,12 @@ def guardrails_node(state: MainWorkflowState):
                 "category": "greeting"
             },
             "is_agriculture_related": False,
-            "guardrails_response": "Hello! I'm here to help you with all your agricultural needs."
+            "guardrails_response": "Hello! I'm here to help you with all your agricultural needs.",
+            "query_classification": None
         }
 
 def rag_node(state: MainWorkflowState):
-    rag_response = run_adaptive_rag(state["query"])
+    rag_response = run_adaptive_rag(state["query"], state.get("query_classification"))
     documents = []
     extractions = ""
     if isinstance(rag_response, dict):
@@ -494,7 +498,8 @@ def run_workflow(query: str, mode: str = "rag", image_path: str = None) -> Dict[
         chart_extra_message="",
         guardrails_result={},
         is_agriculture_related=False,
-        guardrails_response=""
+        guardrails_response="",
+        query_classification=None
     )
     
     if mode.lower() not in ["rag", "tooling"]: